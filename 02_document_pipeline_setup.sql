@@ -32,8 +32,13 @@ CREATE OR REPLACE TABLE document_db.s3_documents.document_classifications (
   document_type VARCHAR(50),
   parsed_content VARIANT,
   document_class VARCHAR(100),
-  classification_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+  classification_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  classification_method VARCHAR(20),  -- 'rule' (classification_rules fast path) or 'ai_classify'
+  rule_id VARCHAR(50)  -- classification_rules row that assigned the class, for the 'rule' method
 );
+-- Upgrading an existing deployment without recreating the table:
+-- ALTER TABLE document_db.s3_documents.document_classifications ADD COLUMN IF NOT EXISTS classification_method VARCHAR(20);
+-- ALTER TABLE document_db.s3_documents.document_classifications ADD COLUMN IF NOT EXISTS rule_id VARCHAR(50);
 
 -- document_extractions
 CREATE OR REPLACE TABLE document_db.s3_documents.document_extractions (
@@ -45,20 +50,48 @@ CREATE OR REPLACE TABLE document_db.s3_documents.document_extractions (
   attribute_value STRING,
   confidence_score FLOAT,
   extraction_json VARIANT,
-  extraction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
-);
+  extraction_input_mode VARCHAR(10),  -- 'text' (parsed content_text) or 'file' (staged file)
+  extraction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  reviewed_timestamp TIMESTAMP,  -- Set when approved/denied in the dashboard review, cleared on re-extraction
+  prompt_hash VARCHAR(64)  -- SHA2 of the question_text that produced the value, compared by backfill_changed_attributes()
+)
+CLUSTER BY (document_id, attribute_name);
+-- Upgrading an existing deployment without recreating the table:
+-- ALTER TABLE document_db.s3_documents.document_extractions ADD COLUMN IF NOT EXISTS reviewed_timestamp TIMESTAMP;
+-- ALTER TABLE document_db.s3_documents.document_extractions ADD COLUMN IF NOT EXISTS prompt_hash VARCHAR(64);
+-- Then stamp existing values with their current prompt, so only prompts changed later are backfilled:
+-- UPDATE document_db.s3_documents.document_extractions de
+-- SET prompt_hash = SHA2(ep.question_text, 256)
+-- FROM document_db.s3_documents.extraction_prompts ep
+-- WHERE de.prompt_hash IS NULL
+--   AND de.attribute_name = ep.attribute_name
+--   AND LOWER(REPLACE(REPLACE(TRIM(ep.document_class),' ','_'),'-','_')) =
+--       LOWER(REPLACE(REPLACE(TRIM(COALESCE(TRY_PARSE_JSON(de.document_class):labels[0]::STRING, de.document_class)),' ','_'),'-','_'));
 
 -- extraction_prompts
+-- Prompts are versioned per attribute: backfill_changed_attributes() stamps prompt_hash with the SHA2 of
+-- question_text and bumps prompt_version whenever the text changed (new prompts start at version 1).
+-- To add or reword an attribute, insert or update its row; only that attribute is then re-extracted, e.g.:
+--   UPDATE document_db.s3_documents.extraction_prompts
+--   SET question_text = 'What is the total value of the contract, including all fees? Include currency.'
+--   WHERE document_class = 'vendor_contract' AND attribute_name = 'total_contract_value';
 CREATE OR REPLACE TABLE document_db.s3_documents.extraction_prompts (
   document_class VARCHAR(100),
   attribute_name VARCHAR(200),
   question_text STRING,
+  prompt_hash VARCHAR(64),
+  prompt_version INTEGER DEFAULT 1,
+  updated_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
   PRIMARY KEY (document_class, attribute_name)
 );
+-- Upgrading an existing deployment without recreating the table:
+-- ALTER TABLE document_db.s3_documents.extraction_prompts ADD COLUMN IF NOT EXISTS prompt_hash VARCHAR(64);
+-- ALTER TABLE document_db.s3_documents.extraction_prompts ADD COLUMN IF NOT EXISTS prompt_version INTEGER DEFAULT 1;
+-- ALTER TABLE document_db.s3_documents.extraction_prompts ADD COLUMN IF NOT EXISTS updated_timestamp TIMESTAMP;
 
 -- Seed all extraction prompts (79 total attributes across 9 document classes)
 -- Updated to match demo_docs folder structure with comprehensive business-relevant attributes
-INSERT INTO document_db.s3_documents.extraction_prompts
+INSERT INTO document_db.s3_documents.extraction_prompts (document_class, attribute_name, question_text)
 
 -- ======================
 -- W2 TAX FORM (10 attributes)
@@ -179,27 +212,405 @@ SELECT 'strategy_document', 'document_date', 'When was this strategy document cr
 SELECT 'other', 'document_title', 'What is the title of this document?' UNION ALL
 SELECT 'other', 'document_date', 'What is the document''s date or most relevant date?';
 
+-- Version 1 of every seeded prompt
+UPDATE document_db.s3_documents.extraction_prompts
+SET prompt_hash = SHA2(question_text, 256);
+
+
+-- =============================
+-- PARSE WORK QUEUE
+-- =============================
+-- Durable work queue for parsing. Each parse run snapshots the stream into this table and then
+-- parses a bounded batch, checkpointing every file, so large backlogs drain across many short runs
+-- and a failed run only loses the file it was working on
+CREATE OR REPLACE TABLE document_db.s3_documents.parse_work_queue (
+  file_path VARCHAR(1000) PRIMARY KEY,
+  file_size NUMBER,
+  file_url VARCHAR(1000),
+  status VARCHAR(20) DEFAULT 'pending',  -- pending, processing, done, failed
+  attempts INTEGER DEFAULT 0,
+  batch_id VARCHAR(100),
+  document_id VARCHAR(100),
+  error_message STRING,
+  enqueued_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  claimed_timestamp TIMESTAMP,
+  completed_timestamp TIMESTAMP
+)
+COMMENT = 'Durable queue of files awaiting AI_PARSE_DOCUMENT, drained in micro-batches';
+
+-- One row per parse run that left work in the queue. The stream on this table re-triggers
+-- parse_documents_task until the queue is drained
+CREATE OR REPLACE TABLE document_db.s3_documents.parse_queue_continuations (
+  batch_id VARCHAR(100),
+  files_processed INTEGER,
+  files_remaining INTEGER,
+  continuation_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Continuation signals written by parse_new_documents() while the parse queue is not empty';
+
+CREATE OR REPLACE STREAM document_db.s3_documents.parse_queue_continuation_stream
+ON TABLE document_db.s3_documents.parse_queue_continuations
+APPEND_ONLY = TRUE
+COMMENT = 'Triggers the next parse batch while parse_work_queue still has pending files';
+
+-- =============================
+-- PIPELINE QUERY LOG
+-- =============================
+-- One row per AI function query issued by the pipeline procedures, recorded with LAST_QUERY_ID()
+-- right after the call. attribute_document_costs() joins these query IDs to the ACCOUNT_USAGE
+-- Cortex usage views to allocate credits to documents and pipeline stages
+CREATE OR REPLACE TABLE document_db.s3_documents.pipeline_query_log (
+  query_id VARCHAR(100),
+  document_id VARCHAR(100),
+  pipeline_stage VARCHAR(20),  -- parse, classify, extract
+  logged_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Query IDs of AI function calls made by the pipeline, per document and stage';
+
+-- =============================
+-- EXTRACTION REVIEW AUDIT
+-- =============================
+-- One row per reviewed extraction. The dashboard writes a review session's audit rows and the MERGE
+-- that applies it to document_extractions in the same transaction, one batch ID per save
+CREATE OR REPLACE TABLE document_db.s3_documents.extraction_review_audit (
+  review_batch_id VARCHAR(36),
+  document_id VARCHAR(100),
+  attribute_name VARCHAR(200),
+  review_action VARCHAR(10),  -- approve, deny
+  previous_value STRING,
+  previous_confidence FLOAT,
+  new_value STRING,
+  new_confidence FLOAT,
+  reviewed_by VARCHAR(200) DEFAULT CURRENT_USER(),
+  reviewed_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Approvals and denials of extracted attributes made in the dashboard review';
+
+-- =============================
+-- BATCH Q&A RESULTS
+-- =============================
+-- Answers from the dashboard's Batch Q&A page: one row per question and document of a run, written
+-- as the run progresses. Failed rows keep the error of the last attempt
+CREATE OR REPLACE TABLE document_db.s3_documents.batch_qa_results (
+  run_id VARCHAR(36),
+  document_id VARCHAR(100),
+  file_name VARCHAR(500),
+  document_class VARCHAR(100),
+  question STRING,
+  answer STRING,
+  status VARCHAR(20),  -- answered, failed
+  attempts INTEGER,
+  error_message STRING,
+  elapsed_ms INTEGER,
+  model_name VARCHAR(100),
+  answered_by VARCHAR(200) DEFAULT CURRENT_USER(),
+  answered_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Batch question answering results per run, question and document';
+
+-- =============================
+-- LARGE PDF PARSING
+-- =============================
+-- Counts PDF pages from a scoped stage file URL without parsing the document
+CREATE OR REPLACE FUNCTION document_db.s3_documents.pdf_page_count(scoped_file_url STRING)
+RETURNS INTEGER
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+PACKAGES = ('snowflake-snowpark-python', 'pypdfium2')
+HANDLER = 'page_count'
+COMMENT = 'Returns the number of pages in a staged PDF (pypdfium2)'
+AS
+$$
+import pypdfium2 as pdfium
+from snowflake.snowpark.files import SnowflakeFile
+
+def page_count(scoped_file_url):
+    # pdfium reads the file object on demand, so only the cross-reference data is fetched
+    with SnowflakeFile.open(scoped_file_url, 'rb') as f:
+        pdf = pdfium.PdfDocument(f)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+$$;
+
+-- Renders one PDF page (0-based) to PNG at the requested DPI, for low-resolution previews
+-- Only the requested page is rendered, so a preview costs one small image instead of the full file
+CREATE OR REPLACE FUNCTION document_db.s3_documents.render_pdf_page_png(
+  scoped_file_url STRING,
+  page_index INTEGER,
+  dpi INTEGER
+)
+RETURNS BINARY
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+PACKAGES = ('snowflake-snowpark-python', 'pypdfium2', 'pillow')
+HANDLER = 'render_page'
+COMMENT = 'Renders a single staged PDF page to PNG bytes (pypdfium2)'
+AS
+$$
+import io
+import pypdfium2 as pdfium
+from snowflake.snowpark.files import SnowflakeFile
+
+def render_page(scoped_file_url, page_index, dpi):
+    with SnowflakeFile.open(scoped_file_url, 'rb') as f:
+        pdf = pdfium.PdfDocument(f)
+        try:
+            page_index = min(max(page_index or 0, 0), len(pdf) - 1)
+            image = pdf[page_index].render(scale=(dpi or 72) / 72).to_pil()
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG', optimize=True)
+            return buffer.getvalue()
+        finally:
+            pdf.close()
+$$;
+
+-- Parses a PDF as concurrent page ranges and stitches the ranges back into one document
+-- All ranges are parsed by a single set-based statement, so Snowflake runs the AI_PARSE_DOCUMENT
+-- calls in parallel and wall time is bounded by the slowest range. Ranges that fail in LAYOUT mode
+-- are retried in OCR mode; ranges that still fail are listed in metadata.failedPageRanges
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.parse_document_in_page_ranges(
+  p_file_path STRING,
+  p_page_count INTEGER,
+  p_pages_per_range INTEGER DEFAULT 10
+)
+RETURNS VARIANT
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_content STRING;
+  v_range_count INTEGER;
+  v_failed_ranges ARRAY;
+  v_query_ids ARRAY := ARRAY_CONSTRUCT();  -- AI_PARSE_DOCUMENT query IDs, for cost attribution
+BEGIN
+  -- Parse every page range in one statement (page_filter start is 0-based, end is exclusive)
+  CREATE OR REPLACE TEMPORARY TABLE temp_page_range_parse AS
+  WITH page_ranges AS (
+    SELECT 
+      r.value::INTEGER AS start_page,
+      LEAST(r.value::INTEGER + :p_pages_per_range, :p_page_count) AS end_page
+    FROM TABLE(FLATTEN(INPUT => ARRAY_GENERATE_RANGE(0, :p_page_count, :p_pages_per_range))) r
+  )
+  SELECT 
+    start_page,
+    end_page,
+    AI_PARSE_DOCUMENT(
+      TO_FILE('@document_db.s3_documents.document_stage', :p_file_path),
+      OBJECT_CONSTRUCT(
+        'mode', 'LAYOUT',
+        'page_split', TRUE,
+        'page_filter', ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('start', start_page, 'end', end_page))
+      )
+    ) AS parsed_range
+  FROM page_ranges;
+  v_query_ids := ARRAY_APPEND(v_query_ids, LAST_QUERY_ID());
+
+  -- Retry failed ranges with OCR mode
+  UPDATE temp_page_range_parse
+  SET parsed_range = AI_PARSE_DOCUMENT(
+    TO_FILE('@document_db.s3_documents.document_stage', :p_file_path),
+    OBJECT_CONSTRUCT(
+      'mode', 'OCR',
+      'page_split', TRUE,
+      'page_filter', ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('start', start_page, 'end', end_page))
+    )
+  )
+  WHERE parsed_range:pages IS NULL;
+  IF (SQLROWCOUNT > 0) THEN
+    v_query_ids := ARRAY_APPEND(v_query_ids, LAST_QUERY_ID());
+  END IF;
+
+  -- Stitch pages in order with page markers (page numbers are 1-based)
+  SELECT 
+    LISTAGG('--- Page ' || (t.start_page + p.index + 1) || ' ---' || CHR(10) || p.value:content::STRING, CHR(10) || CHR(10))
+      WITHIN GROUP (ORDER BY t.start_page, p.index)
+  INTO :v_content
+  FROM temp_page_range_parse t,
+       LATERAL FLATTEN(INPUT => t.parsed_range:pages) p;
+
+  SELECT 
+    COUNT(*),
+    ARRAY_AGG(CASE WHEN parsed_range:pages IS NULL THEN OBJECT_CONSTRUCT('start', start_page, 'end', end_page) END)
+  INTO :v_range_count, :v_failed_ranges
+  FROM temp_page_range_parse;
+
+  DROP TABLE temp_page_range_parse;
+
+  RETURN OBJECT_CONSTRUCT(
+    'content', v_content,
+    'metadata', OBJECT_CONSTRUCT(
+      'pageCount', p_page_count,
+      'pageRanges', v_range_count,
+      'pagesPerRange', p_pages_per_range,
+      'failedPageRanges', v_failed_ranges,
+      'queryIds', v_query_ids
+    )
+  );
+END;
+$$;
+
+-- extraction_settings: AI_EXTRACT input mode per document class ('default' applies to all other classes)
+-- 'text' feeds the already parsed content_text to AI_EXTRACT, avoiding a second read of the file from S3
+-- 'file' re-reads the staged file and is kept for image-heavy classes where layout and visuals matter
+CREATE OR REPLACE TABLE document_db.s3_documents.extraction_settings (
+  document_class VARCHAR(100) PRIMARY KEY,
+  input_mode VARCHAR(10) DEFAULT 'text',
+  max_text_chars INTEGER DEFAULT 100000,  -- Longer documents fall back to file input instead of truncating
+  COMMENT STRING
+)
+COMMENT = 'Per-class AI_EXTRACT input mode: parsed text or staged file';
+
+INSERT INTO document_db.s3_documents.extraction_settings (document_class, input_mode, max_text_chars, comment)
+SELECT 'default', 'text', 100000, 'Born-digital documents: extract from parsed text' UNION ALL
+SELECT 'financial_infographic', 'file', NULL, 'Values live in charts and graphics' UNION ALL
+SELECT 'w2', 'file', NULL, 'Scanned forms: box layout matters for field attribution';
+
+-- classification_rules: deterministic fast path of classify_parsed_documents(), checked before AI_CLASSIFY
+-- 'path_prefix' rules match the start of the staged file path, 'keyword' rules match a phrase in the first
+-- match_chars characters of the parsed text (both case-insensitive). A document is classified by rule when
+-- every matching rule at or above the confidence cutoff (0.9 by default) names the same class; documents
+-- with no such match, or with matches for different classes, go to AI_CLASSIFY
+CREATE OR REPLACE TABLE document_db.s3_documents.classification_rules (
+  rule_id VARCHAR(50) PRIMARY KEY,
+  document_class VARCHAR(100) NOT NULL,
+  rule_type VARCHAR(20) NOT NULL,  -- 'path_prefix' or 'keyword'
+  pattern STRING NOT NULL,
+  match_chars INTEGER DEFAULT 2000,  -- Leading characters of content_text searched by keyword rules
+  confidence FLOAT NOT NULL,
+  enabled BOOLEAN DEFAULT TRUE,
+  COMMENT STRING
+)
+COMMENT = 'Path and keyword rules that classify templated documents without AI_CLASSIFY';
+
+-- Seed rules for the demo_docs folders and forms with fixed titles. Folders holding more than one
+-- class (sales/) have no path rule, and rules below the cutoff stay inactive until it is lowered
+INSERT INTO document_db.s3_documents.classification_rules (rule_id, document_class, rule_type, pattern, match_chars, confidence, comment)
+SELECT 'w2_path', 'w2', 'path_prefix', 'w2s/', NULL, 0.95, 'W-2 upload folder' UNION ALL
+SELECT 'w2_form_title', 'w2', 'keyword', 'wage and tax statement', 1000, 0.98, 'Printed title of Form W-2' UNION ALL
+SELECT 'vendor_contract_path', 'vendor_contract', 'path_prefix', 'vendor_contracts/', NULL, 0.95, 'Vendor contract upload folder' UNION ALL
+SELECT 'vendor_contract_msa_title', 'vendor_contract', 'keyword', 'master services agreement', 1000, 0.9, 'MSA title on the first page' UNION ALL
+SELECT 'financial_infographic_path', 'financial_infographic', 'path_prefix', 'financial filings/', NULL, 0.9, 'Financial infographic folder' UNION ALL
+SELECT 'hr_policy_path', 'hr_policy', 'path_prefix', 'hr/', NULL, 0.8, 'HR folder also holds non-policy documents' UNION ALL
+SELECT 'corporate_policy_path', 'corporate_policy', 'path_prefix', 'policies/', NULL, 0.85, 'Policy folder';
+
+-- Classification input sampling: AI_CLASSIFY only needs enough text to recognize the document type,
+-- so long documents are classified from a sample of content_text instead of the full text.
+-- Sample modes ('full' sends content_text unchanged; documents up to max_chars are never sampled):
+--   'prefix'            the first max_chars characters
+--   'first_last_pages'  the first and last edge_pages pages ('--- Page N ---' markers from page-range
+--                       parsing), max_chars in total; text without markers uses its head and tail
+--   'head_middle_tail'  three equal slices from the start, middle and end, max_chars in total
+CREATE OR REPLACE FUNCTION document_db.s3_documents.sample_classification_input(
+  content_text STRING,
+  sample_mode STRING,
+  max_chars INTEGER,
+  edge_pages INTEGER
+)
+RETURNS STRING
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+HANDLER = 'sample'
+COMMENT = 'Samples parsed document text for AI_CLASSIFY: prefix, first/last pages or head/middle/tail'
+AS
+$$
+import re
+
+PAGE_MARKER = re.compile(r'^--- Page \d+ ---$', re.MULTILINE)
+GAP = '\n\n[...]\n\n'
+
+def sample(content_text, sample_mode, max_chars, edge_pages):
+    text = content_text or ''
+    max_chars = max_chars or 8000
+    if sample_mode == 'full' or len(text) <= max_chars:
+        return text
+    if sample_mode == 'first_last_pages':
+        starts = [m.start() for m in PAGE_MARKER.finditer(text)]
+        edge_pages = max(edge_pages or 1, 1)
+        budget = max_chars // 2
+        if len(starts) > 2 * edge_pages:
+            pages = [text[s:e] for s, e in zip(starts, starts[1:] + [len(text)])]
+            head, tail = ''.join(pages[:edge_pages]), ''.join(pages[-edge_pages:])
+            return head[:budget].rstrip() + GAP + tail[:budget].strip()
+        return text[:budget].rstrip() + GAP + text[-budget:].strip()
+    if sample_mode == 'head_middle_tail':
+        budget = max_chars // 3
+        middle = (len(text) - budget) // 2
+        return GAP.join([text[:budget].rstrip(), text[middle:middle + budget].strip(), text[-budget:].strip()])
+    return text[:max_chars]
+$$;
+
+-- classification_sampling_profiles: sampler per document_type (file type), with 'default' for all others.
+-- The document class is what is being predicted, so the override is keyed by what is known before
+-- classification. Use 05_classification_sampler_eval.sql to compare samplers against full-text labels
+-- before changing a profile
+CREATE OR REPLACE TABLE document_db.s3_documents.classification_sampling_profiles (
+  document_type VARCHAR(50) PRIMARY KEY,
+  sample_mode VARCHAR(20) DEFAULT 'prefix',  -- 'full', 'prefix', 'first_last_pages' or 'head_middle_tail'
+  max_chars INTEGER DEFAULT 8000,
+  edge_pages INTEGER DEFAULT 2,  -- Pages kept from each end by 'first_last_pages'
+  COMMENT STRING
+)
+COMMENT = 'Per-document-type text sampling for AI_CLASSIFY input';
+
+INSERT INTO document_db.s3_documents.classification_sampling_profiles (document_type, sample_mode, max_chars, edge_pages, comment)
+SELECT 'default', 'prefix', 8000, NULL, 'Title and opening sections identify most documents' UNION ALL
+SELECT 'pdf', 'first_last_pages', 12000, 2, 'Cover, contents and closing pages (signature blocks, appendices)' UNION ALL
+SELECT 'pptx', 'head_middle_tail', 9000, NULL, 'Title and agenda slides plus a sample of the body and summary' UNION ALL
+SELECT 'png', 'full', NULL, NULL, 'OCR text of a single image is short' UNION ALL
+SELECT 'jpeg', 'full', NULL, NULL, 'OCR text of a single image is short';
 
 -- =============================
 -- PROCEDURES
 -- =============================
 -- Step 1: Parse new documents using AI_PARSE_DOCUMENT
--- Processes files from the stream and extracts text content using LAYOUT mode (fallback to OCR)
-CREATE OR REPLACE PROCEDURE document_db.s3_documents.parse_new_documents()
+-- Snapshots new files from the stream into parse_work_queue, then parses at most batch_size queued
+-- files using LAYOUT mode (fallback to OCR). Files are retried up to 3 times before being marked failed
+-- PDFs with more than large_pdf_min_pages pages are parsed as concurrent page ranges
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.parse_new_documents(batch_size INTEGER DEFAULT 100)
 RETURNS STRING
 LANGUAGE SQL
 EXECUTE AS CALLER
 AS
 $$
 DECLARE
-  -- Cursor to get new documents from stream (only supported file types)
-  doc_cursor CURSOR FOR
+  -- Variables for processing each document
+  file_path STRING;
+  parsed_content VARIANT;
+  content_text STRING;
+  processed_count INTEGER := 0;
+  failed_count INTEGER := 0;
+  remaining_count INTEGER := 0;
+  file_name STRING;
+  file_size NUMBER;
+  file_url STRING;
+  file_extension STRING;
+  document_type STRING;
+  document_id STRING;
+  attempts INTEGER;
+  page_count INTEGER;
+  batch_id STRING := UUID_STRING();
+  max_attempts INTEGER := 3;
+  large_pdf_min_pages INTEGER := 20;  -- PDFs above this page count are split into page ranges
+  pages_per_range INTEGER := 10;      -- Pages per concurrently parsed range
+  empty_parse_result EXCEPTION (-20001, 'Page range parsing returned no content');
+BEGIN
+  
+  -- Snapshot new files (only supported file types) from the stream into the work queue.
+  -- The MERGE consumes the stream, so the offset advances as soon as files are queued.
+  -- Re-uploaded files are queued again.
+  MERGE INTO document_db.s3_documents.parse_work_queue q
+  USING (
     SELECT 
       relative_path,
       size,
       file_url
     FROM document_db.s3_documents.new_documents_stream
     WHERE METADATA$ACTION = 'INSERT'
+      AND relative_path IS NOT NULL
+      AND relative_path != ''
       AND (
         UPPER(relative_path) LIKE '%.PDF' 
         OR UPPER(relative_path) LIKE '%.DOCX'
@@ -211,32 +622,69 @@ DECLARE
         OR UPPER(relative_path) LIKE '%.TIF'
         OR UPPER(relative_path) LIKE '%.HTML'
         OR UPPER(relative_path) LIKE '%.TXT'
-      );
-  
-  -- Variables for processing each document
-  file_path STRING;
-  parsed_content VARIANT;
-  content_text STRING;
-  processed_count INTEGER := 0;
-  file_name STRING;
-  file_size NUMBER;
-  file_url STRING;
-  file_extension STRING;
-  document_type STRING;
-BEGIN
+      )
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY relative_path ORDER BY size DESC) = 1
+  ) s
+  ON q.file_path = s.relative_path
+  WHEN MATCHED AND q.status IN ('done', 'failed') THEN UPDATE SET
+    q.file_size = s.size,
+    q.file_url = s.file_url,
+    q.status = 'pending',
+    q.attempts = 0,
+    q.batch_id = NULL,
+    q.error_message = NULL,
+    q.enqueued_timestamp = CURRENT_TIMESTAMP(),
+    q.claimed_timestamp = NULL,
+    q.completed_timestamp = NULL
+  WHEN NOT MATCHED THEN INSERT (file_path, file_size, file_url)
+  VALUES (s.relative_path, s.size, s.file_url);
+
+  -- Acknowledge the continuation signal that triggered this run (if any).
+  -- Consuming a stream requires a DML statement that references it.
+  CREATE OR REPLACE TEMPORARY TABLE temp_continuation_consume AS 
+  SELECT * FROM document_db.s3_documents.parse_queue_continuation_stream;
+  DROP TABLE temp_continuation_consume;
+
+  -- Release files claimed by a run that died before checkpointing them. A claim counts as an attempt,
+  -- so a file that keeps killing its run (a timeout or a poison file) fails after max_attempts claims
+  UPDATE document_db.s3_documents.parse_work_queue
+  SET status = IFF(attempts >= :max_attempts, 'failed', 'pending'),
+      batch_id = NULL,
+      error_message = IFF(attempts >= :max_attempts,
+        'Parse run ended without checkpointing this file after ' || attempts || ' attempts', error_message),
+      completed_timestamp = IFF(attempts >= :max_attempts, CURRENT_TIMESTAMP(), NULL)
+  WHERE status = 'processing'
+    AND claimed_timestamp < DATEADD('hour', -1, CURRENT_TIMESTAMP());
+
+  -- Claim the next batch, oldest first
+  UPDATE document_db.s3_documents.parse_work_queue
+  SET status = 'processing',
+      batch_id = :batch_id,
+      attempts = attempts + 1,
+      claimed_timestamp = CURRENT_TIMESTAMP()
+  WHERE file_path IN (
+    SELECT file_path
+    FROM document_db.s3_documents.parse_work_queue
+    WHERE status = 'pending'
+    QUALIFY ROW_NUMBER() OVER (ORDER BY enqueued_timestamp, file_path) <= :batch_size
+  );
+
+  LET batch_rs RESULTSET := (
+    SELECT file_path, file_size, file_url, attempts
+    FROM document_db.s3_documents.parse_work_queue
+    WHERE batch_id = :batch_id
+    ORDER BY enqueued_timestamp, file_path
+  );
+  LET doc_cursor CURSOR FOR batch_rs;
   
   FOR doc_record IN doc_cursor DO
     BEGIN
-      -- Skip empty file paths
-      IF (doc_record.relative_path IS NULL OR doc_record.relative_path = '') THEN
-        CONTINUE;
-      END IF;
-      
       -- Extract file metadata
-      file_path := doc_record.relative_path;
+      file_path := doc_record.file_path;
       file_name := REGEXP_SUBSTR(file_path, '[^/]+$');
-      file_size := doc_record.size;
+      file_size := doc_record.file_size;
       file_url := doc_record.file_url;
+      attempts := doc_record.attempts;
       file_extension := UPPER(REGEXP_SUBSTR(file_name, '\.[^.]+$'));
       document_type := CASE 
         WHEN file_extension = '.PDF' THEN 'pdf'
@@ -249,19 +697,49 @@ BEGIN
         WHEN file_extension = '.TXT' THEN 'txt'
         ELSE 'unknown'
       END;
+      document_id := CONCAT('DOC_', REPLACE(REPLACE(CURRENT_TIMESTAMP()::STRING,' ', '_'), ':',''), '_', ABS(HASH(:file_path)));
       
-      -- Try parsing with LAYOUT mode first (best for structured documents)
-      parsed_content := AI_PARSE_DOCUMENT(
-        TO_FILE('@document_db.s3_documents.document_stage', file_path),
-        PARSE_JSON('{"mode": "LAYOUT"}')
-      );
+      -- Count PDF pages to decide between a single call and page-range parsing
+      page_count := NULL;
+      IF (document_type = 'pdf') THEN
+        BEGIN
+          page_count := (
+            SELECT document_db.s3_documents.pdf_page_count(
+              BUILD_SCOPED_FILE_URL(@document_db.s3_documents.document_stage, :file_path)
+            )
+          );
+        EXCEPTION
+          WHEN OTHER THEN
+            page_count := NULL;  -- Unreadable page count: parse as a single document
+        END;
+      END IF;
+      
+      IF (page_count > large_pdf_min_pages) THEN
+        -- Large PDF: parse page ranges concurrently and stitch them with page markers
+        CALL document_db.s3_documents.parse_document_in_page_ranges(:file_path, :page_count, :pages_per_range)
+          INTO :parsed_content;
+        INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+        SELECT q.value::STRING, :document_id, 'parse'
+        FROM TABLE(FLATTEN(INPUT => :parsed_content:metadata:queryIds)) q;
+        IF (parsed_content:content IS NULL) THEN
+          RAISE empty_parse_result;  -- Every range failed: fall back to whole-document OCR below
+        END IF;
+      ELSE
+        -- Try parsing with LAYOUT mode first (best for structured documents)
+        parsed_content := AI_PARSE_DOCUMENT(
+          TO_FILE('@document_db.s3_documents.document_stage', file_path),
+          PARSE_JSON('{"mode": "LAYOUT"}')
+        );
+        INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+        SELECT LAST_QUERY_ID(), :document_id, 'parse';
+      END IF;
       content_text := parsed_content:content::STRING;
       
       -- Store parsed document with generated unique ID
       INSERT INTO document_db.s3_documents.parsed_documents 
       (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, content_text)
       SELECT
-        CONCAT('DOC_', REPLACE(REPLACE(CURRENT_TIMESTAMP()::STRING,' ', '_'), ':',''), '_', ABS(HASH(:file_path))),
+        :document_id,
         :file_name,
         :file_path,
         :file_size,
@@ -270,6 +748,11 @@ BEGIN
         :parsed_content,
         :content_text;
       
+      -- Checkpoint: this file will not be parsed again by later batches
+      UPDATE document_db.s3_documents.parse_work_queue
+      SET status = 'done', document_id = :document_id, completed_timestamp = CURRENT_TIMESTAMP()
+      WHERE file_path = :file_path;
+      
       processed_count := processed_count + 1;
       
     EXCEPTION
@@ -280,12 +763,14 @@ BEGIN
             TO_FILE('@document_db.s3_documents.document_stage', :file_path),
             PARSE_JSON('{"mode": "OCR"}')
           );
+          INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+          SELECT LAST_QUERY_ID(), :document_id, 'parse';
           content_text := parsed_content:content::STRING;
           
           INSERT INTO document_db.s3_documents.parsed_documents 
           (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, content_text)
           SELECT
-            CONCAT('DOC_', REPLACE(REPLACE(CURRENT_TIMESTAMP()::STRING,' ', '_'), ':',''), '_', ABS(HASH(:file_path))),
+            :document_id,
             :file_name,
             :file_path,
             :file_size,
@@ -294,61 +779,93 @@ BEGIN
             :parsed_content,
             :content_text;
           
+          UPDATE document_db.s3_documents.parse_work_queue
+          SET status = 'done', document_id = :document_id, completed_timestamp = CURRENT_TIMESTAMP()
+          WHERE file_path = :file_path;
+          
           processed_count := processed_count + 1;
         EXCEPTION
           WHEN OTHER THEN
-            -- Final fallback: Log parsing failure but continue processing
-            INSERT INTO document_db.s3_documents.parsed_documents 
-            (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, content_text)
-            SELECT
-              CONCAT('ERR_DOC_', REPLACE(REPLACE(CURRENT_TIMESTAMP()::STRING,' ', '_'), ':',''), '_', ABS(HASH(COALESCE(:file_path,'UNKNOWN')))),
-              COALESCE(:file_name, COALESCE(:file_path,'UNKNOWN')),
-              COALESCE(:file_path,'UNKNOWN'),
-              :file_size,
-              COALESCE(:file_url, ''),
-              COALESCE(:document_type, 'error'),
-              PARSE_JSON('{"error":"Document parsing failed in both modes","timestamp":"' || CURRENT_TIMESTAMP()::STRING || '"}'),
-              'parsing_failed';
+            failed_count := failed_count + 1;
+            IF (attempts < max_attempts) THEN
+              -- Return the file to the queue for a later batch
+              UPDATE document_db.s3_documents.parse_work_queue
+              SET status = 'pending', batch_id = NULL, error_message = :SQLERRM
+              WHERE file_path = :file_path;
+            ELSE
+              -- Final fallback: Log parsing failure but continue processing
+              INSERT INTO document_db.s3_documents.parsed_documents 
+              (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, content_text)
+              SELECT
+                CONCAT('ERR_DOC_', REPLACE(REPLACE(CURRENT_TIMESTAMP()::STRING,' ', '_'), ':',''), '_', ABS(HASH(COALESCE(:file_path,'UNKNOWN')))),
+                COALESCE(:file_name, COALESCE(:file_path,'UNKNOWN')),
+                COALESCE(:file_path,'UNKNOWN'),
+                :file_size,
+                COALESCE(:file_url, ''),
+                COALESCE(:document_type, 'error'),
+                PARSE_JSON('{"error":"Document parsing failed in both modes","timestamp":"' || CURRENT_TIMESTAMP()::STRING || '"}'),
+                'parsing_failed';
+              
+              UPDATE document_db.s3_documents.parse_work_queue
+              SET status = 'failed', error_message = :SQLERRM, completed_timestamp = CURRENT_TIMESTAMP()
+              WHERE file_path = :file_path;
+            END IF;
         END;
     END;
   END FOR;
   
-  -- Advance the stream offset so files are not reprocessed.
-  -- Consuming the stream requires a DML statement that references the stream.
-  -- Creating and dropping a temporary table fulfills this and moves the offset.
-  CREATE OR REPLACE TEMPORARY TABLE temp_stream_consume AS 
-  SELECT * FROM document_db.s3_documents.new_documents_stream;
-  DROP TABLE temp_stream_consume;
-
-  RETURN 'SUCCESS: Processed ' || processed_count || ' files';
+  -- Re-trigger parse_documents_task (via the continuation stream) while work remains
+  remaining_count := (
+    SELECT COUNT(*) FROM document_db.s3_documents.parse_work_queue WHERE status = 'pending'
+  );
+  IF (remaining_count > 0) THEN
+    INSERT INTO document_db.s3_documents.parse_queue_continuations (batch_id, files_processed, files_remaining)
+    SELECT :batch_id, :processed_count, :remaining_count;
+  END IF;
+
+  RETURN 'SUCCESS: Processed ' || processed_count || ' files, Failed: ' || failed_count 
+         || ', Remaining in queue: ' || remaining_count;
 END;
 $$;
 
 -- Step 2: Classify parsed documents using AI_CLASSIFY
 -- Categorizes documents into 9 business document types: w2, vendor_contract, sales_report, 
 -- marketing_report, hr_policy, corporate_policy, financial_infographic, case_study, strategy_document, or other
-CREATE OR REPLACE PROCEDURE document_db.s3_documents.classify_parsed_documents()
+-- Documents matched by classification_rules at or above rule_confidence_cutoff are classified first,
+-- in one statement, and only the remaining documents are sent to AI_CLASSIFY
+-- AI_CLASSIFY receives a sample of content_text chosen by classification_sampling_profiles
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.classify_parsed_documents(rule_confidence_cutoff FLOAT DEFAULT 0.9)
 RETURNS STRING
 LANGUAGE SQL
 EXECUTE AS CALLER
 AS
 $$
 DECLARE
-  -- Cursor to get successfully parsed documents ready for classification
+  -- Cursor to get successfully parsed documents ready for classification, with the text sample
+  -- AI_CLASSIFY will see (the document type's sampling profile, else the 'default' profile)
   doc_cursor CURSOR FOR 
     SELECT 
-      document_id,
-      file_name,
-      file_path,
-      file_size,
-      file_url,
-      document_type,
-      parsed_content,
-      content_text
-    FROM document_db.s3_documents.parsed_documents
-    WHERE status = 'parsed'
-      AND content_text IS NOT NULL
-      AND LENGTH(TRIM(content_text)) > 0;
+      pd.document_id,
+      pd.file_name,
+      pd.file_path,
+      pd.file_size,
+      pd.file_url,
+      pd.document_type,
+      pd.parsed_content,
+      document_db.s3_documents.sample_classification_input(
+        pd.content_text,
+        IFF(tp.document_type IS NOT NULL, tp.sample_mode, dp.sample_mode),
+        IFF(tp.document_type IS NOT NULL, tp.max_chars, dp.max_chars),
+        IFF(tp.document_type IS NOT NULL, tp.edge_pages, dp.edge_pages)
+      ) AS classification_input
+    FROM document_db.s3_documents.parsed_documents pd
+    LEFT JOIN document_db.s3_documents.classification_sampling_profiles tp
+      ON tp.document_type = pd.document_type
+    LEFT JOIN document_db.s3_documents.classification_sampling_profiles dp
+      ON dp.document_type = 'default'
+    WHERE pd.status = 'parsed'
+      AND pd.content_text IS NOT NULL
+      AND LENGTH(TRIM(pd.content_text)) > 0;
   
   -- Variables for processing each document
   v_document_id STRING;
@@ -358,12 +875,51 @@ DECLARE
   v_file_url STRING;
   v_document_type STRING;
   v_parsed_content VARIANT;
-  v_content_text STRING;
+  v_classification_input STRING;
   doc_class STRING;
   processed_count INTEGER := 0;
+  rule_count INTEGER := 0;
   error_count INTEGER := 0;
 BEGIN
-  
+  -- Fast path: documents whose matching rules all agree on one class
+  CREATE OR REPLACE TEMPORARY TABLE rule_classified_documents AS
+  SELECT 
+    pd.document_id,
+    MAX_BY(r.document_class, r.confidence) AS document_class,
+    MAX_BY(r.rule_id, r.confidence) AS rule_id
+  FROM document_db.s3_documents.parsed_documents pd
+  JOIN document_db.s3_documents.classification_rules r
+    ON r.enabled
+   AND r.confidence >= :rule_confidence_cutoff
+   AND CASE r.rule_type
+         WHEN 'path_prefix' THEN STARTSWITH(LOWER(pd.file_path), LOWER(r.pattern))
+         WHEN 'keyword' THEN CONTAINS(LOWER(LEFT(pd.content_text, COALESCE(r.match_chars, 2000))), LOWER(r.pattern))
+         ELSE FALSE
+       END
+  WHERE pd.status = 'parsed'
+    AND pd.content_text IS NOT NULL
+    AND LENGTH(TRIM(pd.content_text)) > 0
+  GROUP BY pd.document_id
+  HAVING COUNT(DISTINCT r.document_class) = 1;  -- Rules naming different classes leave the document to AI_CLASSIFY
+
+  -- Stored in AI_CLASSIFY's {"labels": [...]} format, so readers of document_class need no changes
+  INSERT INTO document_db.s3_documents.document_classifications 
+  (document_id, file_name, file_path, file_size, file_url, document_type, 
+   parsed_content, document_class, classification_method, rule_id)
+  SELECT pd.document_id, pd.file_name, pd.file_path, pd.file_size, pd.file_url, pd.document_type,
+         pd.parsed_content, OBJECT_CONSTRUCT('labels', ARRAY_CONSTRUCT(rc.document_class))::STRING, 'rule', rc.rule_id
+  FROM rule_classified_documents rc
+  JOIN document_db.s3_documents.parsed_documents pd
+    ON rc.document_id = pd.document_id;
+  rule_count := SQLROWCOUNT;
+
+  UPDATE document_db.s3_documents.parsed_documents 
+  SET status = 'classified' 
+  WHERE document_id IN (SELECT document_id FROM rule_classified_documents);
+
+  DROP TABLE rule_classified_documents;
+
+  -- The cursor is opened here, so it only returns the documents no rule classified
   FOR doc_record IN doc_cursor DO
     BEGIN
       -- Extract document data from cursor
@@ -374,22 +930,24 @@ BEGIN
       v_file_url := doc_record.file_url;
       v_document_type := doc_record.document_type;
       v_parsed_content := doc_record.parsed_content;
-      v_content_text := doc_record.content_text;
+      v_classification_input := doc_record.classification_input;
 
       -- Classify document into one of 9 business categories using AI
       -- Categories aligned with demo_docs folder structure
       doc_class := AI_CLASSIFY(
-        :v_content_text,
+        :v_classification_input,
         ['w2', 'vendor_contract', 'sales_report', 'marketing_report', 'hr_policy', 
          'corporate_policy', 'financial_infographic', 'case_study', 'strategy_document', 'other']
       );
+      INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+      SELECT LAST_QUERY_ID(), :v_document_id, 'classify';
       
       -- Store classification result
       INSERT INTO document_db.s3_documents.document_classifications 
       (document_id, file_name, file_path, file_size, file_url, document_type, 
-       parsed_content, document_class)
+       parsed_content, document_class, classification_method)
       SELECT :v_document_id, :v_file_name, :v_file_path, :v_file_size, :v_file_url, :v_document_type,
-             :v_parsed_content, :doc_class;
+             :v_parsed_content, :doc_class, 'ai_classify';
       
       -- Mark document as classified to prevent reprocessing
       UPDATE document_db.s3_documents.parsed_documents 
@@ -420,12 +978,16 @@ BEGIN
     END;
   END FOR;
   
-  RETURN 'Classification completed. Processed: ' || processed_count || ', Errors: ' || error_count;
+  RETURN 'Classification completed. Processed: ' || (rule_count + processed_count) || ' (rules: ' || rule_count
+         || ', AI_CLASSIFY: ' || processed_count || '), Errors: ' || error_count;
 END;
 $$;
 
 -- Step 3: Extract specific attributes using AI_EXTRACT
 -- Uses document class to lookup relevant prompts and extract structured data
+-- Only documents with no extractions yet are processed, so each parse micro-batch extracts only its
+-- new documents; new or reworded prompts are applied by backfill_changed_attributes()
+-- Input is the parsed content_text or the staged file, per extraction_settings (text falls back to file)
 CREATE OR REPLACE PROCEDURE document_db.s3_documents.extract_attributes_for_classified_documents()
 RETURNS STRING
 LANGUAGE SQL
@@ -433,7 +995,7 @@ EXECUTE AS CALLER
 AS
 $$
 DECLARE
-  -- Cursor to get classified documents and normalize class labels
+  -- Cursor to get classified documents without extractions and normalize class labels
   doc_cursor CURSOR FOR
     SELECT 
       dc.document_id, 
@@ -444,8 +1006,15 @@ DECLARE
         WHEN TRY_PARSE_JSON(dc.document_class) IS NOT NULL THEN 
           TRY_PARSE_JSON(dc.document_class):labels[0]::STRING
         ELSE dc.document_class
-      END AS document_class_norm
-    FROM document_db.s3_documents.document_classifications dc;
+      END AS document_class_norm,
+      pd.content_text
+    FROM document_db.s3_documents.document_classifications dc
+    LEFT JOIN document_db.s3_documents.parsed_documents pd
+      ON dc.document_id = pd.document_id
+    WHERE NOT EXISTS (                         -- Skip documents already extracted (prompt changes are backfilled)
+      SELECT 1 FROM document_db.s3_documents.document_extractions de
+      WHERE de.document_id = dc.document_id
+    );
 
   -- Variables for processing each document
   v_document_id STRING;
@@ -453,9 +1022,13 @@ DECLARE
   v_file_path STRING;
   v_document_class STRING;
   v_document_class_norm STRING;
+  v_content_text STRING;
   v_prompt_obj VARIANT;  -- JSON object containing attribute->question mappings
   v_result VARIANT;      -- AI_EXTRACT response with extracted values
+  v_input_mode STRING;   -- 'text' or 'file'
+  v_max_text_chars INTEGER;
   processed_count INTEGER := 0;
+  text_input_count INTEGER := 0;
   error_count INTEGER := 0;
 BEGIN
   FOR doc_record IN doc_cursor DO
@@ -466,6 +1039,7 @@ BEGIN
       v_file_path := doc_record.file_path;
       v_document_class := doc_record.document_class;
       v_document_class_norm := doc_record.document_class_norm;
+      v_content_text := doc_record.content_text;
 
       -- Skip documents with missing file paths
       IF (v_file_path IS NULL OR v_file_path = '') THEN
@@ -484,13 +1058,49 @@ BEGIN
         CONTINUE;
       END IF;
 
+      -- Resolve the input mode for this class, falling back to the 'default' setting
+      SELECT input_mode, max_text_chars
+      INTO :v_input_mode, :v_max_text_chars
+      FROM document_db.s3_documents.extraction_settings
+      WHERE LOWER(REPLACE(REPLACE(TRIM(document_class),' ','_'),'-','_')) IN (
+              LOWER(REPLACE(REPLACE(TRIM(:v_document_class_norm),' ','_'),'-','_')), 'default')
+      ORDER BY IFF(document_class = 'default', 1, 0)
+      LIMIT 1;
+
+      -- Use the file when there is no usable parsed text or the text is too long for a single call
+      IF (v_input_mode IS NULL OR v_input_mode != 'text'
+          OR v_content_text IS NULL OR LENGTH(TRIM(v_content_text)) < 100
+          OR LENGTH(v_content_text) > COALESCE(v_max_text_chars, 100000)) THEN
+        v_input_mode := 'file';
+      END IF;
+
       -- Extract structured data using AI with class-specific prompts
       -- Include output_details config to get confidence scores
-      v_result := AI_EXTRACT(
-        file => TO_FILE('@document_db.s3_documents.document_stage', :v_file_path),
-        responseFormat => :v_prompt_obj,
-        config => {'output_details': 'True'}
-      );
+      IF (v_input_mode = 'text') THEN
+        BEGIN
+          -- Text input: reuse the parsed content instead of re-reading the file from S3
+          v_result := AI_EXTRACT(
+            text => :v_content_text,
+            responseFormat => :v_prompt_obj,
+            config => {'output_details': 'True'}
+          );
+          INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+          SELECT LAST_QUERY_ID(), :v_document_id, 'extract';
+        EXCEPTION
+          WHEN OTHER THEN
+            v_input_mode := 'file';  -- Fall back to file input below
+        END;
+      END IF;
+
+      IF (v_input_mode = 'file') THEN
+        v_result := AI_EXTRACT(
+          file => TO_FILE('@document_db.s3_documents.document_stage', :v_file_path),
+          responseFormat => :v_prompt_obj,
+          config => {'output_details': 'True'}
+        );
+        INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+        SELECT LAST_QUERY_ID(), :v_document_id, 'extract';
+      END IF;
 
       -- Store extracted attributes using MERGE for idempotent updates
       MERGE INTO document_db.s3_documents.document_extractions t
@@ -502,7 +1112,9 @@ BEGIN
                f.key::STRING AS attribute_name,
                f.value::STRING AS attribute_value,
                TRY_CAST(:v_result:output_details:scores[f.key]::STRING AS FLOAT) AS confidence_score,
-               :v_result AS extraction_json
+               :v_result AS extraction_json,
+               :v_input_mode AS extraction_input_mode,
+               SHA2(:v_prompt_obj[f.key]::STRING, 256) AS prompt_hash  -- Version of the question that was asked
         FROM LATERAL FLATTEN(INPUT => :v_result:response) f  -- Flatten the response object (not the full result)
       ) s
       ON t.document_id = s.document_id AND t.attribute_name = s.attribute_name
@@ -510,11 +1122,19 @@ BEGIN
         t.attribute_value = s.attribute_value,
         t.confidence_score = s.confidence_score,
         t.extraction_json = s.extraction_json,
-        t.extraction_timestamp = CURRENT_TIMESTAMP()
-      WHEN NOT MATCHED THEN INSERT (document_id, file_name, file_path, document_class, attribute_name, attribute_value, confidence_score, extraction_json)
-      VALUES (s.document_id, s.file_name, s.file_path, s.document_class, s.attribute_name, s.attribute_value, s.confidence_score, s.extraction_json);
+        t.extraction_input_mode = s.extraction_input_mode,
+        t.extraction_timestamp = CURRENT_TIMESTAMP(),
+        -- A changed value needs a new review; an unchanged one keeps its Approve/Deny
+        t.reviewed_timestamp = IFF(t.attribute_value IS DISTINCT FROM s.attribute_value, NULL, t.reviewed_timestamp),
+        t.prompt_hash = s.prompt_hash
+      WHEN NOT MATCHED THEN INSERT (document_id, file_name, file_path, document_class, attribute_name, attribute_value, confidence_score, extraction_json, extraction_input_mode, prompt_hash)
+      VALUES (s.document_id, s.file_name, s.file_path, s.document_class, s.attribute_name, s.attribute_value, s.confidence_score, s.extraction_json, s.extraction_input_mode, s.prompt_hash);
 
       processed_count := processed_count + 1;
+      -- Counted only once the MERGE succeeded, with the input mode that was finally used
+      IF (v_input_mode = 'text') THEN
+        text_input_count := text_input_count + 1;
+      END IF;
     EXCEPTION
       WHEN OTHER THEN
         -- Handle extraction errors gracefully and continue processing
@@ -522,7 +1142,229 @@ BEGIN
     END;
   END FOR;
 
-  RETURN 'Extraction completed. Processed: ' || processed_count || ', Errors: ' || error_count;
+  RETURN 'Extraction completed. Processed: ' || processed_count || ' (text input: ' || text_input_count 
+         || ', file input: ' || (processed_count - text_input_count) || '), Errors: ' || error_count;
+END;
+$$;
+
+-- Failed backfill attempts per stale attribute and prompt version. A document whose AI_EXTRACT
+-- returns no response in either input mode is recorded here; backfill_changed_attributes() tries
+-- documents with fewer failures first and skips attributes that failed max_attempts times with the
+-- current prompt, so a few unreadable files cannot hold up the rest of the backfill
+CREATE OR REPLACE TABLE document_db.s3_documents.attribute_backfill_failures (
+  document_id VARCHAR(100),
+  attribute_name VARCHAR(200),
+  prompt_hash VARCHAR(64),
+  attempts INTEGER DEFAULT 0,
+  last_attempt_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  PRIMARY KEY (document_id, attribute_name, prompt_hash)
+)
+COMMENT = 'Attribute backfill failures per document, attribute and prompt version';
+
+-- Step 3.1: Re-extract only the attributes whose prompt is new or changed
+-- Compares each extracted value's prompt_hash with its current prompt, then calls AI_EXTRACT for at
+-- most batch_size documents with a prompt object holding only their stale attributes. Each input mode
+-- is extracted by one set-based statement, so Snowflake runs the batch's AI_EXTRACT calls in parallel.
+-- Only the re-extracted attributes are merged; the document's other attributes are left untouched
+-- Attributes that failed max_attempts times with the current prompt are skipped until the prompt changes
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.backfill_changed_attributes(
+  batch_size INTEGER DEFAULT 50,
+  max_attempts INTEGER DEFAULT 3
+)
+RETURNS STRING
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_changed_prompts INTEGER := 0;
+  v_document_count INTEGER := 0;
+  v_attribute_count INTEGER := 0;
+  v_remaining_count INTEGER := 0;
+  v_file_input_count INTEGER := 0;
+  v_error_count INTEGER := 0;
+  v_skipped_count INTEGER := 0;
+BEGIN
+  -- Version prompts whose question text is new or changed since the last run
+  UPDATE document_db.s3_documents.extraction_prompts
+  SET prompt_hash = SHA2(question_text, 256),
+      prompt_version = IFF(prompt_hash IS NULL, COALESCE(prompt_version, 1), prompt_version + 1),
+      updated_timestamp = CURRENT_TIMESTAMP()
+  WHERE prompt_hash IS DISTINCT FROM SHA2(question_text, 256);
+  v_changed_prompts := SQLROWCOUNT;
+
+  -- (document, attribute) pairs with no value yet or a value produced by another version of the prompt
+  CREATE OR REPLACE TEMPORARY TABLE stale_document_attributes AS
+  WITH classified_documents AS (
+    SELECT 
+      dc.document_id,
+      dc.file_name,
+      dc.file_path,
+      dc.document_class,
+      LOWER(REPLACE(REPLACE(TRIM(
+        COALESCE(TRY_PARSE_JSON(dc.document_class):labels[0]::STRING, dc.document_class)
+      ),' ','_'),'-','_')) AS class_key
+    FROM document_db.s3_documents.document_classifications dc
+    WHERE dc.file_path IS NOT NULL AND dc.file_path != ''
+  )
+  SELECT 
+    cd.document_id,
+    cd.file_name,
+    cd.file_path,
+    cd.document_class,
+    cd.class_key,
+    ep.attribute_name,
+    ep.question_text,
+    ep.prompt_hash,
+    COALESCE(bf.attempts, 0) AS failed_attempts
+  FROM classified_documents cd
+  JOIN document_db.s3_documents.extraction_prompts ep
+    ON LOWER(REPLACE(REPLACE(TRIM(ep.document_class),' ','_'),'-','_')) = cd.class_key
+  LEFT JOIN document_db.s3_documents.document_extractions de
+    ON de.document_id = cd.document_id AND de.attribute_name = ep.attribute_name
+  LEFT JOIN document_db.s3_documents.attribute_backfill_failures bf
+    ON bf.document_id = cd.document_id AND bf.attribute_name = ep.attribute_name AND bf.prompt_hash = ep.prompt_hash
+  WHERE de.prompt_hash IS DISTINCT FROM ep.prompt_hash;
+
+  -- Attributes that keep failing with the current prompt wait for a prompt change
+  DELETE FROM stale_document_attributes WHERE failed_attempts >= :max_attempts;
+  v_skipped_count := SQLROWCOUNT;
+
+  -- One row per document in this batch, with a prompt object of its stale attributes only
+  -- and the input mode resolved from extraction_settings as in extract_attributes_for_classified_documents()
+  CREATE OR REPLACE TEMPORARY TABLE attribute_backfill_batch AS
+  WITH batch_documents AS (
+    SELECT 
+      document_id,
+      ANY_VALUE(file_name) AS file_name,
+      ANY_VALUE(file_path) AS file_path,
+      ANY_VALUE(document_class) AS document_class,
+      ANY_VALUE(class_key) AS class_key,
+      OBJECT_AGG(attribute_name, TO_VARIANT(question_text)) AS prompt_obj,
+      COUNT(*) AS attribute_count,
+      MAX(failed_attempts) AS failed_attempts
+    FROM stale_document_attributes
+    GROUP BY document_id
+    -- Documents that failed before go last, so healthy documents keep advancing
+    QUALIFY ROW_NUMBER() OVER (ORDER BY MAX(failed_attempts), document_id) <= :batch_size
+  )
+  SELECT 
+    bd.*,
+    pd.content_text,
+    CASE
+      WHEN COALESCE(cs.input_mode, ds.input_mode) = 'text'
+        AND pd.content_text IS NOT NULL AND LENGTH(TRIM(pd.content_text)) >= 100
+        AND LENGTH(pd.content_text) <= COALESCE(IFF(cs.document_class IS NOT NULL, cs.max_text_chars, ds.max_text_chars), 100000)
+      THEN 'text'
+      ELSE 'file'
+    END AS input_mode,
+    NULL::VARIANT AS extraction_result
+  FROM batch_documents bd
+  LEFT JOIN document_db.s3_documents.parsed_documents pd
+    ON bd.document_id = pd.document_id
+  LEFT JOIN document_db.s3_documents.extraction_settings cs
+    ON LOWER(REPLACE(REPLACE(TRIM(cs.document_class),' ','_'),'-','_')) = bd.class_key
+  LEFT JOIN document_db.s3_documents.extraction_settings ds
+    ON ds.document_class = 'default';
+
+  -- Text input for the whole batch in one statement
+  UPDATE attribute_backfill_batch
+  SET extraction_result = AI_EXTRACT(
+    text => content_text,
+    responseFormat => prompt_obj,
+    config => {'output_details': 'True'}
+  )
+  WHERE input_mode = 'text';
+  IF (SQLROWCOUNT > 0) THEN
+    -- One query bills the whole batch: log it for every document in it, and attribute_document_costs()
+    -- splits its credits across them
+    INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+    SELECT LAST_QUERY_ID(), document_id, 'extract' FROM attribute_backfill_batch WHERE input_mode = 'text';
+  END IF;
+
+  -- File input for file-mode classes and for text extractions that returned no response
+  UPDATE attribute_backfill_batch
+  SET input_mode = 'file',
+      extraction_result = AI_EXTRACT(
+        file => TO_FILE('@document_db.s3_documents.document_stage', file_path),
+        responseFormat => prompt_obj,
+        config => {'output_details': 'True'}
+      )
+  WHERE extraction_result:response IS NULL;
+  v_file_input_count := SQLROWCOUNT;
+  IF (v_file_input_count > 0) THEN
+    INSERT INTO document_db.s3_documents.pipeline_query_log (query_id, document_id, pipeline_stage)
+    SELECT LAST_QUERY_ID(), document_id, 'extract' FROM attribute_backfill_batch WHERE input_mode = 'file';
+  END IF;
+
+  -- Merge only the re-extracted attributes, stamped with the prompt version they answer
+  MERGE INTO document_db.s3_documents.document_extractions t
+  USING (
+    SELECT 
+      b.document_id,
+      b.file_name,
+      b.file_path,
+      b.document_class,
+      f.key::STRING AS attribute_name,
+      f.value::STRING AS attribute_value,
+      TRY_CAST(b.extraction_result:output_details:scores[f.key]::STRING AS FLOAT) AS confidence_score,
+      b.extraction_result AS extraction_json,
+      b.input_mode AS extraction_input_mode,
+      SHA2(b.prompt_obj[f.key]::STRING, 256) AS prompt_hash
+    FROM attribute_backfill_batch b,
+         LATERAL FLATTEN(INPUT => b.extraction_result:response) f
+  ) s
+  ON t.document_id = s.document_id AND t.attribute_name = s.attribute_name
+  WHEN MATCHED THEN UPDATE SET
+    t.attribute_value = s.attribute_value,
+    t.confidence_score = s.confidence_score,
+    t.extraction_json = s.extraction_json,
+    t.extraction_input_mode = s.extraction_input_mode,
+    t.extraction_timestamp = CURRENT_TIMESTAMP(),
+    t.reviewed_timestamp = NULL,  -- A new extraction needs a new review
+    t.prompt_hash = s.prompt_hash
+  WHEN NOT MATCHED THEN INSERT (document_id, file_name, file_path, document_class, attribute_name, attribute_value, confidence_score, extraction_json, extraction_input_mode, prompt_hash)
+  VALUES (s.document_id, s.file_name, s.file_path, s.document_class, s.attribute_name, s.attribute_value, s.confidence_score, s.extraction_json, s.extraction_input_mode, s.prompt_hash);
+  v_attribute_count := SQLROWCOUNT;
+
+  -- Count a failed attempt for each stale attribute of documents that got no response in either mode,
+  -- and forget the failures of documents that succeeded
+  MERGE INTO document_db.s3_documents.attribute_backfill_failures t
+  USING (
+    SELECT sa.document_id, sa.attribute_name, sa.prompt_hash
+    FROM stale_document_attributes sa
+    JOIN attribute_backfill_batch b ON b.document_id = sa.document_id
+    WHERE b.extraction_result:response IS NULL
+  ) s
+  ON t.document_id = s.document_id AND t.attribute_name = s.attribute_name AND t.prompt_hash = s.prompt_hash
+  WHEN MATCHED THEN UPDATE SET
+    t.attempts = t.attempts + 1,
+    t.last_attempt_timestamp = CURRENT_TIMESTAMP()
+  WHEN NOT MATCHED THEN INSERT (document_id, attribute_name, prompt_hash, attempts)
+  VALUES (s.document_id, s.attribute_name, s.prompt_hash, 1);
+
+  DELETE FROM document_db.s3_documents.attribute_backfill_failures
+  WHERE document_id IN (
+    SELECT document_id FROM attribute_backfill_batch WHERE extraction_result:response IS NOT NULL
+  );
+
+  SELECT 
+    COUNT(*),
+    COUNT_IF(extraction_result:response IS NULL)
+  INTO :v_document_count, :v_error_count
+  FROM attribute_backfill_batch;
+
+  SELECT COUNT(DISTINCT document_id) - :v_document_count
+  INTO :v_remaining_count
+  FROM stale_document_attributes;
+
+  DROP TABLE attribute_backfill_batch;
+  DROP TABLE stale_document_attributes;
+
+  RETURN 'Attribute backfill completed. Changed prompts: ' || v_changed_prompts || ', Documents: ' || v_document_count
+         || ' (file input: ' || v_file_input_count || '), Attributes: ' || v_attribute_count
+         || ', Errors: ' || v_error_count || ', Remaining: ' || v_remaining_count
+         || ', Skipped after ' || max_attempts || ' failures: ' || v_skipped_count;
 END;
 $$;
 
@@ -539,13 +1381,197 @@ CREATE OR REPLACE TABLE document_db.s3_documents.document_chunks (
   chunk_index INTEGER,
   chunk_text STRING,
   chunk_size INTEGER,
+  chunk_profile_class VARCHAR(100),   -- chunking_profiles row used ('default' when no class-specific profile)
+  chunk_profile_version INTEGER,      -- profile_version that produced this chunk
   created_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
   FOREIGN KEY (document_id) REFERENCES document_db.s3_documents.document_classifications(document_id)
 )
+CLUSTER BY (document_id, chunk_index)
 COMMENT = 'Table storing chunked document content for semantic search and RAG applications';
 
--- Step 3.5: Chunk documents using SPLIT_TEXT_RECURSIVE_CHARACTER
--- Creates searchable chunks from classified documents for semantic search
+-- =============================
+-- ACCESS PATH OPTIMIZATION
+-- =============================
+-- The Streamlit explorer, approve/deny updates and detail views look up extractions and chunks
+-- by document_id (plus attribute_name). Clustering keys (declared on the tables above) keep each
+-- document's rows in few micro-partitions; search optimization adds point-lookup pruning on top.
+-- Search optimization requires Enterprise Edition or higher.
+-- See 04_access_path_benchmarks.sql to verify partition pruning on these access paths.
+ALTER TABLE document_db.s3_documents.document_extractions
+  ADD SEARCH OPTIMIZATION ON EQUALITY(document_id, attribute_name);
+
+ALTER TABLE document_db.s3_documents.document_chunks
+  ADD SEARCH OPTIMIZATION ON EQUALITY(document_id);
+
+-- The dashboard review queue reads unreviewed extractions across all documents by confidence range
+-- (confidence_score < threshold, keyset-paginated in confidence order). The base table is clustered
+-- by document, so a range predicate on confidence would scan every micro-partition; this
+-- materialized view keeps the unreviewed rows clustered by confidence instead.
+-- Materialized views require Enterprise Edition or higher.
+CREATE OR REPLACE MATERIALIZED VIEW document_db.s3_documents.extraction_review_queue
+  CLUSTER BY (confidence_score, document_id)
+  COMMENT = 'Unreviewed extractions clustered by confidence, for the dashboard review queue'
+AS
+SELECT
+    document_id,
+    file_name,
+    document_class,
+    attribute_name,
+    attribute_value,
+    confidence_score,
+    extraction_timestamp
+FROM document_db.s3_documents.document_extractions
+WHERE reviewed_timestamp IS NULL;
+
+-- Chunking profiles: chunk size, overlap, separators and text format per document class
+-- The 'default' profile applies to any class without its own row
+-- To change a profile, update it and increment profile_version; rechunk_stale_documents()
+-- then re-chunks only the documents whose chunks were produced by an older profile, e.g.:
+--   UPDATE document_db.s3_documents.chunking_profiles
+--   SET chunk_size = 300, profile_version = profile_version + 1, updated_timestamp = CURRENT_TIMESTAMP()
+--   WHERE document_class = 'w2';
+CREATE OR REPLACE TABLE document_db.s3_documents.chunking_profiles (
+  document_class VARCHAR(100) PRIMARY KEY,
+  chunk_size INTEGER NOT NULL,
+  chunk_overlap INTEGER NOT NULL,
+  separators ARRAY,
+  text_format VARCHAR(20) DEFAULT 'none',  -- 'none' or 'markdown' (AI_PARSE_DOCUMENT LAYOUT output is markdown)
+  profile_version INTEGER DEFAULT 1,
+  updated_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+COMMENT = 'Class-aware chunking parameters for SPLIT_TEXT_RECURSIVE_CHARACTER, versioned for incremental re-chunking';
+
+-- Seed chunking profiles: short chunks for templated forms, long chunks for handbooks and policies
+INSERT INTO document_db.s3_documents.chunking_profiles
+  (document_class, chunk_size, chunk_overlap, separators, text_format)
+SELECT 'default', 1000, 200, ARRAY_CONSTRUCT('\n\n', '\n', ' ', ''), 'none' UNION ALL
+SELECT 'w2', 400, 50, ARRAY_CONSTRUCT('\n\n', '\n', ' ', ''), 'none' UNION ALL
+SELECT 'financial_infographic', 500, 100, ARRAY_CONSTRUCT('\n\n', '\n', ' ', ''), 'none' UNION ALL
+SELECT 'vendor_contract', 1500, 250, ARRAY_CONSTRUCT('\n\n', '\n', '. ', ' ', ''), 'markdown' UNION ALL
+SELECT 'hr_policy', 2000, 300, ARRAY_CONSTRUCT('\n\n', '\n', '. ', ' ', ''), 'markdown' UNION ALL
+SELECT 'corporate_policy', 2000, 300, ARRAY_CONSTRUCT('\n\n', '\n', '. ', ' ', ''), 'markdown';
+
+-- Step 3.5a: Chunk a single document using its class chunking profile
+-- Replaces any existing chunks for the document atomically and returns the number of chunks written
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.chunk_document(p_document_id STRING)
+RETURNS INTEGER
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  -- Variables for the document being chunked
+  v_file_name STRING;
+  v_file_path STRING;
+  v_document_class STRING;
+  v_document_class_norm STRING;
+  v_content_text STRING;
+  -- Variables for the resolved chunking profile
+  v_profile_class STRING;
+  v_chunk_size INTEGER;
+  v_chunk_overlap INTEGER;
+  v_separators ARRAY;
+  v_text_format STRING;
+  v_profile_version INTEGER;
+  v_chunk_count INTEGER := 0;
+BEGIN
+  SELECT 
+    dc.file_name,
+    dc.file_path,
+    dc.document_class,
+    COALESCE(TRY_PARSE_JSON(dc.document_class):labels[0]::STRING, dc.document_class),
+    pd.content_text
+  INTO :v_file_name, :v_file_path, :v_document_class, :v_document_class_norm, :v_content_text
+  FROM document_db.s3_documents.document_classifications dc
+  JOIN document_db.s3_documents.parsed_documents pd 
+    ON dc.document_id = pd.document_id
+  WHERE dc.document_id = :p_document_id;
+
+  -- Resolve the class-specific profile, falling back to 'default'
+  SELECT document_class, chunk_size, chunk_overlap, separators, text_format, profile_version
+  INTO :v_profile_class, :v_chunk_size, :v_chunk_overlap, :v_separators, :v_text_format, :v_profile_version
+  FROM document_db.s3_documents.chunking_profiles
+  WHERE document_class IN (LOWER(TRIM(:v_document_class_norm)), 'default')
+  ORDER BY IFF(document_class = 'default', 1, 0)
+  LIMIT 1;
+
+  BEGIN TRANSACTION;
+
+  -- Remove chunks produced by an older profile (no-op for new documents)
+  DELETE FROM document_db.s3_documents.document_chunks WHERE document_id = :p_document_id;
+
+  -- Try Cortex chunking first, fallback to manual chunking if it fails
+  BEGIN
+    -- Split text into chunks with the profile settings and insert them in one statement
+    INSERT INTO document_db.s3_documents.document_chunks
+    (chunk_id, document_id, file_name, file_path, document_class, chunk_index, chunk_text, chunk_size,
+     chunk_profile_class, chunk_profile_version)
+    WITH chunks AS (
+      SELECT f.index AS split_index, f.value::STRING AS chunk_text
+      FROM TABLE(FLATTEN(INPUT => SNOWFLAKE.CORTEX.SPLIT_TEXT_RECURSIVE_CHARACTER(
+        :v_content_text,
+        :v_text_format,
+        :v_chunk_size,
+        :v_chunk_overlap,
+        :v_separators
+      ))) f
+      WHERE LENGTH(TRIM(f.value::STRING)) > 50  -- Only store chunks with meaningful content
+    )
+    SELECT
+      CONCAT(:p_document_id, '_CHUNK_', ROW_NUMBER() OVER (ORDER BY split_index) - 1),
+      :p_document_id,
+      :v_file_name,
+      :v_file_path,
+      :v_document_class,
+      ROW_NUMBER() OVER (ORDER BY split_index) - 1,
+      chunk_text,
+      LENGTH(chunk_text),
+      :v_profile_class,
+      :v_profile_version
+    FROM chunks;
+    v_chunk_count := SQLROWCOUNT;
+
+  EXCEPTION
+    WHEN OTHER THEN
+      -- Fallback: Fixed-size windows with the profile size and overlap
+      INSERT INTO document_db.s3_documents.document_chunks
+      (chunk_id, document_id, file_name, file_path, document_class, chunk_index, chunk_text, chunk_size,
+       chunk_profile_class, chunk_profile_version)
+      WITH chunks AS (
+        SELECT g.index AS split_index, SUBSTR(:v_content_text, g.value::INTEGER + 1, :v_chunk_size) AS chunk_text
+        FROM TABLE(FLATTEN(INPUT => ARRAY_GENERATE_RANGE(
+          0, LENGTH(:v_content_text), GREATEST(:v_chunk_size - :v_chunk_overlap, 1)
+        ))) g
+      )
+      SELECT
+        CONCAT(:p_document_id, '_CHUNK_', ROW_NUMBER() OVER (ORDER BY split_index) - 1),
+        :p_document_id,
+        :v_file_name,
+        :v_file_path,
+        :v_document_class,
+        ROW_NUMBER() OVER (ORDER BY split_index) - 1,
+        chunk_text,
+        LENGTH(chunk_text),
+        :v_profile_class,
+        :v_profile_version
+      FROM chunks
+      WHERE LENGTH(TRIM(chunk_text)) > 50;  -- Only store chunks with meaningful content
+      v_chunk_count := SQLROWCOUNT;
+  END;
+
+  COMMIT;
+  RETURN v_chunk_count;
+
+EXCEPTION
+  WHEN OTHER THEN
+    -- Keep the previous chunks if re-chunking failed part way
+    ROLLBACK;
+    RAISE;
+END;
+$$;
+
+-- Step 3.5: Chunk newly classified documents
+-- Creates searchable chunks from classified documents that have not been chunked yet
 CREATE OR REPLACE PROCEDURE document_db.s3_documents.chunk_classified_documents()
 RETURNS STRING
 LANGUAGE SQL
@@ -553,31 +1579,23 @@ EXECUTE AS CALLER
 AS
 $$
 DECLARE
-  -- Cursor to get classified documents with content
+  -- Cursor to get classified documents with content and no chunks yet
   doc_cursor CURSOR FOR
-    SELECT 
-      dc.document_id,
-      dc.file_name,
-      dc.file_path,
-      dc.document_class,
-      pd.content_text
+    SELECT dc.document_id
     FROM document_db.s3_documents.document_classifications dc
     JOIN document_db.s3_documents.parsed_documents pd 
       ON dc.document_id = pd.document_id
     WHERE pd.content_text IS NOT NULL 
       AND LENGTH(TRIM(pd.content_text)) > 100  -- Only chunk documents with substantial content
       AND dc.document_class NOT LIKE 'ERR_%'   -- Skip error records
-      AND dc.document_class != 'classification_error';
+      AND dc.document_class != 'classification_error'
+      AND NOT EXISTS (                         -- Skip documents already chunked (re-chunking is handled separately)
+        SELECT 1 FROM document_db.s3_documents.document_chunks ch
+        WHERE ch.document_id = dc.document_id
+      );
 
-  -- Variables for processing each document
   v_document_id STRING;
-  v_file_name STRING;
-  v_file_path STRING;
-  v_document_class STRING;
-  v_content_text STRING;
-  v_chunks VARIANT;
-  v_chunk_text STRING;
-  v_chunk_index INTEGER;
+  v_chunks_written INTEGER;
   processed_count INTEGER := 0;
   chunk_count INTEGER := 0;
   error_count INTEGER := 0;
@@ -585,88 +1603,11 @@ BEGIN
   
   FOR doc_record IN doc_cursor DO
     BEGIN
-      -- Extract document data from cursor
       v_document_id := doc_record.document_id;
-      v_file_name := doc_record.file_name;
-      v_file_path := doc_record.file_path;
-      v_document_class := doc_record.document_class;
-      v_content_text := doc_record.content_text;
 
-      -- Skip if document already chunked (avoid duplicates)
-      LET chunk_exists INTEGER := (SELECT COUNT(*) FROM document_db.s3_documents.document_chunks WHERE document_id = :v_document_id);
-      IF (chunk_exists > 0) THEN
-        CONTINUE;
-      END IF;
-
-      -- Try Cortex chunking first, fallback to manual chunking if it fails
-      BEGIN
-        -- Split text into chunks using Snowflake Cortex function
-        v_chunks := SNOWFLAKE.CORTEX.SPLIT_TEXT_RECURSIVE_CHARACTER(
-          :v_content_text,
-          1000,  -- chunk_size
-          200    -- chunk_overlap
-        );
-
-        -- Process each chunk and insert into chunks table
-        v_chunk_index := 0;
-        FOR chunk_record IN (SELECT value FROM LATERAL FLATTEN(INPUT => :v_chunks)) DO
-          v_chunk_text := chunk_record.value::STRING;
-          
-          -- Only store chunks with meaningful content
-          LET chunk_length INTEGER := LENGTH(TRIM(:v_chunk_text));
-          IF (chunk_length > 50) THEN
-            INSERT INTO document_db.s3_documents.document_chunks
-            (chunk_id, document_id, file_name, file_path, document_class, chunk_index, chunk_text, chunk_size)
-            SELECT
-              CONCAT(:v_document_id, '_CHUNK_', :v_chunk_index),
-              :v_document_id,
-              :v_file_name,
-              :v_file_path,
-              :v_document_class,
-              :v_chunk_index,
-              :v_chunk_text,
-              LENGTH(:v_chunk_text);
-            
-            v_chunk_index := v_chunk_index + 1;
-            chunk_count := chunk_count + 1;
-          END IF;
-        END FOR;
-        
-      EXCEPTION
-        WHEN OTHER THEN
-          -- Fallback: Manual chunking if Cortex function fails
-          v_chunk_index := 0;
-          LET text_length INTEGER := LENGTH(:v_content_text);
-          LET chunk_size INTEGER := 1000;
-          LET start_pos INTEGER := 1;
-          
-          WHILE (start_pos <= text_length) DO
-            -- Extract chunk of text
-            v_chunk_text := SUBSTR(:v_content_text, start_pos, chunk_size);
-            
-            -- Only store chunks with meaningful content
-            LET chunk_length INTEGER := LENGTH(TRIM(:v_chunk_text));
-            IF (chunk_length > 50) THEN
-              INSERT INTO document_db.s3_documents.document_chunks
-              (chunk_id, document_id, file_name, file_path, document_class, chunk_index, chunk_text, chunk_size)
-              SELECT
-                CONCAT(:v_document_id, '_CHUNK_', :v_chunk_index),
-                :v_document_id,
-                :v_file_name,
-                :v_file_path,
-                :v_document_class,
-                :v_chunk_index,
-                :v_chunk_text,
-                LENGTH(:v_chunk_text);
-              
-              chunk_count := chunk_count + 1;
-            END IF;
-            
-            v_chunk_index := v_chunk_index + 1;
-            start_pos := start_pos + chunk_size;
-          END WHILE;
-      END;
+      CALL document_db.s3_documents.chunk_document(:v_document_id) INTO :v_chunks_written;
 
+      chunk_count := chunk_count + v_chunks_written;
       processed_count := processed_count + 1;
       
     EXCEPTION
@@ -682,6 +1623,129 @@ BEGIN
 END;
 $$;
 
+-- Failed re-chunk attempts per document and target chunking profile version. rechunk_stale_documents()
+-- tries documents with fewer failures first and skips a document that failed max_attempts times until
+-- its profile changes again, so a few broken documents cannot hold up every other re-chunk
+CREATE OR REPLACE TABLE document_db.s3_documents.rechunk_failures (
+  document_id VARCHAR(100),
+  profile_class VARCHAR(100),
+  profile_version INTEGER,
+  attempts INTEGER DEFAULT 0,
+  last_attempt_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  PRIMARY KEY (document_id, profile_class, profile_version)
+)
+COMMENT = 'Re-chunk failures per document and chunking profile version';
+
+-- Step 3.6: Re-chunk documents whose chunking profile changed
+-- Processes at most batch_size documents per call so large re-chunks run in bounded increments
+-- Documents that failed max_attempts times with the current profile are skipped until it changes
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.rechunk_stale_documents(
+  batch_size INTEGER DEFAULT 25,
+  max_attempts INTEGER DEFAULT 3
+)
+RETURNS STRING
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_document_id STRING;
+  v_profile_class STRING;
+  v_profile_version INTEGER;
+  v_chunks_written INTEGER;
+  processed_count INTEGER := 0;
+  chunk_count INTEGER := 0;
+  error_count INTEGER := 0;
+  remaining_count INTEGER := 0;
+  skipped_count INTEGER := 0;
+BEGIN
+  -- Documents whose existing chunks were produced by a different profile or profile version
+  CREATE OR REPLACE TEMPORARY TABLE stale_chunk_documents AS
+  WITH resolved_profiles AS (
+    SELECT 
+      dc.document_id,
+      COALESCE(cp.document_class, dp.document_class) AS profile_class,
+      COALESCE(cp.profile_version, dp.profile_version) AS profile_version
+    FROM document_db.s3_documents.document_classifications dc
+    LEFT JOIN document_db.s3_documents.chunking_profiles cp
+      ON cp.document_class = LOWER(TRIM(COALESCE(TRY_PARSE_JSON(dc.document_class):labels[0]::STRING, dc.document_class)))
+    CROSS JOIN (
+      SELECT document_class, profile_version
+      FROM document_db.s3_documents.chunking_profiles
+      WHERE document_class = 'default'
+    ) dp
+  ),
+  current_chunks AS (
+    SELECT 
+      document_id,
+      MIN(chunk_profile_class) AS profile_class,
+      MIN(chunk_profile_version) AS profile_version
+    FROM document_db.s3_documents.document_chunks
+    GROUP BY document_id
+  )
+  SELECT 
+    rp.document_id,
+    rp.profile_class,
+    rp.profile_version,
+    COALESCE(rf.attempts, 0) AS failed_attempts
+  FROM resolved_profiles rp
+  JOIN current_chunks cc 
+    ON rp.document_id = cc.document_id
+  LEFT JOIN document_db.s3_documents.rechunk_failures rf
+    ON rf.document_id = rp.document_id
+   AND rf.profile_class = rp.profile_class
+   AND rf.profile_version = rp.profile_version
+  WHERE cc.profile_class IS DISTINCT FROM rp.profile_class
+     OR cc.profile_version IS DISTINCT FROM rp.profile_version;
+
+  -- Documents that keep failing with the current profile wait for a profile change
+  DELETE FROM stale_chunk_documents WHERE failed_attempts >= :max_attempts;
+  skipped_count := SQLROWCOUNT;
+
+  -- Documents that failed before go last, so the others keep advancing
+  LET batch_rs RESULTSET := (
+    SELECT document_id, profile_class, profile_version
+    FROM stale_chunk_documents
+    QUALIFY ROW_NUMBER() OVER (ORDER BY failed_attempts, document_id) <= :batch_size
+  );
+  LET batch_cursor CURSOR FOR batch_rs;
+
+  FOR doc_record IN batch_cursor DO
+    BEGIN
+      v_document_id := doc_record.document_id;
+      v_profile_class := doc_record.profile_class;
+      v_profile_version := doc_record.profile_version;
+
+      CALL document_db.s3_documents.chunk_document(:v_document_id) INTO :v_chunks_written;
+
+      DELETE FROM document_db.s3_documents.rechunk_failures WHERE document_id = :v_document_id;
+      chunk_count := chunk_count + v_chunks_written;
+      processed_count := processed_count + 1;
+    EXCEPTION
+      WHEN OTHER THEN
+        error_count := error_count + 1;
+        MERGE INTO document_db.s3_documents.rechunk_failures t
+        USING (
+          SELECT :v_document_id AS document_id, :v_profile_class AS profile_class, :v_profile_version AS profile_version
+        ) s
+        ON t.document_id = s.document_id AND t.profile_class = s.profile_class AND t.profile_version = s.profile_version
+        WHEN MATCHED THEN UPDATE SET
+          t.attempts = t.attempts + 1,
+          t.last_attempt_timestamp = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (document_id, profile_class, profile_version, attempts)
+        VALUES (s.document_id, s.profile_class, s.profile_version, 1);
+    END;
+  END FOR;
+
+  remaining_count := (SELECT COUNT(*) FROM stale_chunk_documents) - processed_count;
+  DROP TABLE stale_chunk_documents;
+
+  RETURN 'Re-chunking completed. Documents: ' || processed_count || ', Chunks: ' || chunk_count 
+         || ', Errors: ' || error_count || ', Remaining: ' || remaining_count
+         || ', Skipped after ' || max_attempts || ' failures: ' || skipped_count;
+END;
+$$;
+
 -- Create Cortex Search Service for semantic search on document chunks
 CREATE OR REPLACE CORTEX SEARCH SERVICE document_db.s3_documents.document_search_service
 ON chunk_text
@@ -701,16 +1765,410 @@ AS (
 );
 
 
+-- =============================
+-- PER-DOCUMENT COST ATTRIBUTION
+-- =============================
+-- AI credits allocated to each document and pipeline stage. Rows come from the per-query Cortex
+-- usage views in ACCOUNT_USAGE, matched to pipeline_query_log by query ID
+CREATE OR REPLACE TABLE document_db.s3_documents.document_cost_attribution (
+  query_id VARCHAR(100),
+  document_id VARCHAR(100),
+  pipeline_stage VARCHAR(20),
+  function_name VARCHAR(100),
+  model_name VARCHAR(100),
+  credits FLOAT,
+  tokens NUMBER,
+  pages_processed NUMBER,
+  elapsed_ms NUMBER,
+  query_start_time TIMESTAMP_LTZ,
+  attributed_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+)
+CLUSTER BY (document_id)
+COMMENT = 'Cortex AI credits per pipeline query, attributed to document_id and stage';
+
+-- Attributes AI credits from the last lookback_days to documents
+-- ACCOUNT_USAGE views lag by up to a few hours, so each run re-merges the whole lookback window
+-- and late-arriving usage rows are picked up by the next run
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.attribute_document_costs(lookback_days INTEGER DEFAULT 3)
+RETURNS STRING
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_window_start TIMESTAMP_LTZ;
+  v_merged_rows INTEGER := 0;
+BEGIN
+  v_window_start := DATEADD('day', -lookback_days, CURRENT_TIMESTAMP());
+
+  MERGE INTO document_db.s3_documents.document_cost_attribution t
+  USING (
+    WITH query_timings AS (
+      SELECT query_id, start_time, total_elapsed_time AS elapsed_ms
+      FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+      WHERE start_time >= :v_window_start
+    ),
+    ai_usage AS (
+      -- Token-billed functions (AI_CLASSIFY, AI_COMPLETE, ...). This view has no time column, so
+      -- the window and query start time come from QUERY_HISTORY
+      SELECT 
+        u.query_id,
+        u.function_name,
+        u.model_name,
+        SUM(u.token_credits) AS credits,
+        SUM(u.tokens) AS tokens,
+        NULL AS pages_processed,
+        MIN(qt.start_time) AS query_start_time
+      FROM SNOWFLAKE.ACCOUNT_USAGE.CORTEX_FUNCTIONS_QUERY_USAGE_HISTORY u
+      JOIN query_timings qt ON u.query_id = qt.query_id
+      GROUP BY u.query_id, u.function_name, u.model_name
+      
+      UNION ALL
+      
+      -- Page-billed document functions (AI_PARSE_DOCUMENT, AI_EXTRACT)
+      SELECT 
+        query_id,
+        function_name,
+        model_name,
+        SUM(credits_used) AS credits,
+        NULL AS tokens,
+        SUM(page_count) AS pages_processed,
+        MIN(start_time) AS query_start_time
+      FROM SNOWFLAKE.ACCOUNT_USAGE.CORTEX_DOCUMENT_PROCESSING_USAGE_HISTORY
+      WHERE start_time >= :v_window_start
+      GROUP BY query_id, function_name, model_name
+    ),
+    pipeline_queries AS (
+      -- A set-based statement (e.g. the attribute backfill) is logged once per document it processed;
+      -- its usage is split evenly across those documents
+      SELECT 
+        query_id,
+        document_id,
+        ANY_VALUE(pipeline_stage) AS pipeline_stage,
+        COUNT(*) OVER (PARTITION BY query_id) AS query_documents
+      FROM document_db.s3_documents.pipeline_query_log
+      WHERE logged_timestamp >= DATEADD('day', -1, :v_window_start)
+      GROUP BY query_id, document_id
+    )
+    SELECT 
+      u.query_id,
+      l.document_id,
+      l.pipeline_stage,
+      u.function_name,
+      COALESCE(u.model_name, '') AS model_name,
+      u.credits / l.query_documents AS credits,
+      u.tokens / l.query_documents AS tokens,
+      u.pages_processed / l.query_documents AS pages_processed,
+      qt.elapsed_ms / l.query_documents AS elapsed_ms,
+      u.query_start_time
+    FROM ai_usage u
+    JOIN pipeline_queries l ON u.query_id = l.query_id
+    LEFT JOIN query_timings qt ON u.query_id = qt.query_id
+  ) s
+  ON t.query_id = s.query_id AND t.document_id = s.document_id
+     AND t.function_name = s.function_name AND t.model_name = s.model_name
+  WHEN MATCHED THEN UPDATE SET
+    t.credits = s.credits,
+    t.tokens = s.tokens,
+    t.pages_processed = s.pages_processed,
+    t.elapsed_ms = s.elapsed_ms,
+    t.attributed_timestamp = CURRENT_TIMESTAMP()
+  WHEN NOT MATCHED THEN INSERT 
+    (query_id, document_id, pipeline_stage, function_name, model_name, credits, tokens, pages_processed, elapsed_ms, query_start_time)
+  VALUES 
+    (s.query_id, s.document_id, s.pipeline_stage, s.function_name, s.model_name, s.credits, s.tokens, s.pages_processed, s.elapsed_ms, s.query_start_time);
+
+  v_merged_rows := SQLROWCOUNT;
+
+  RETURN 'Cost attribution completed. Query usage rows merged: ' || v_merged_rows;
+END;
+$$;
+
+-- Credits per document with a per-stage breakdown, normalized by page count and file size
+CREATE OR REPLACE VIEW document_db.s3_documents.document_costs
+COMMENT = 'Attributed AI credits per document, per page and per MB'
+AS
+WITH document_stage_costs AS (
+    SELECT 
+        document_id,
+        SUM(credits) AS total_credits,
+        SUM(IFF(pipeline_stage = 'parse', credits, 0)) AS parse_credits,
+        SUM(IFF(pipeline_stage = 'classify', credits, 0)) AS classify_credits,
+        SUM(IFF(pipeline_stage = 'extract', credits, 0)) AS extract_credits,
+        SUM(tokens) AS tokens,
+        SUM(IFF(pipeline_stage = 'parse', pages_processed, 0)) AS parse_pages_billed,
+        SUM(elapsed_ms) AS ai_elapsed_ms,
+        COUNT(DISTINCT query_id) AS ai_queries
+    FROM document_db.s3_documents.document_cost_attribution
+    GROUP BY document_id
+)
+SELECT 
+    pd.document_id,
+    pd.file_name,
+    pd.document_type,
+    COALESCE(TRY_PARSE_JSON(dc.document_class):labels[0]::STRING, dc.document_class) AS document_class,
+    pd.file_size,
+    COALESCE(pd.parsed_content:metadata:pageCount::INTEGER, NULLIF(c.parse_pages_billed, 0)) AS page_count,
+    c.total_credits,
+    c.parse_credits,
+    c.classify_credits,
+    c.extract_credits,
+    c.total_credits / NULLIF(COALESCE(pd.parsed_content:metadata:pageCount::INTEGER, NULLIF(c.parse_pages_billed, 0)), 0) AS credits_per_page,
+    c.total_credits / NULLIF(pd.file_size / 1048576, 0) AS credits_per_mb,
+    c.tokens,
+    c.ai_elapsed_ms,
+    c.ai_queries,
+    pd.parse_timestamp
+FROM document_stage_costs c
+JOIN document_db.s3_documents.parsed_documents pd ON c.document_id = pd.document_id
+LEFT JOIN document_db.s3_documents.document_classifications dc ON c.document_id = dc.document_id;
+
+-- Credits per document class, to find which document types drive spend
+CREATE OR REPLACE VIEW document_db.s3_documents.document_class_costs
+COMMENT = 'Attributed AI credits per document class, per document and per page'
+AS
+SELECT 
+    COALESCE(document_class, 'unclassified') AS document_class,
+    COUNT(*) AS documents,
+    SUM(page_count) AS pages,
+    SUM(total_credits) AS total_credits,
+    SUM(parse_credits) AS parse_credits,
+    SUM(classify_credits) AS classify_credits,
+    SUM(extract_credits) AS extract_credits,
+    AVG(total_credits) AS avg_credits_per_document,
+    SUM(total_credits) / NULLIF(SUM(page_count), 0) AS credits_per_page,
+    MAX(total_credits) AS max_document_credits
+FROM document_db.s3_documents.document_costs
+GROUP BY COALESCE(document_class, 'unclassified');
+
+
+-- =============================
+-- COST DAILY CACHE
+-- =============================
+-- Daily pipeline credits copied from the ACCOUNT_USAGE views, which are slow to scan and lag by
+-- up to a few hours. The Cost Monitoring page loads this table once and filters it in memory,
+-- instead of querying ACCOUNT_USAGE for every panel and date range. One row per day and source:
+--   metering          METERING_HISTORY credits: pipeline serverless tasks (name = task) and AI_SERVICES
+--   cortex_functions  CORTEX_FUNCTIONS_USAGE_HISTORY token credits and calls per parse/classify/extract function
+--   cortex_search     CORTEX_SEARCH_DAILY_USAGE_HISTORY tokens and credits for document_search_service
+CREATE OR REPLACE TABLE document_db.s3_documents.cost_daily_cache (
+  usage_date DATE,
+  source VARCHAR(20),
+  service_type VARCHAR(50),
+  name VARCHAR(500),
+  credits NUMBER(38, 9),
+  tokens NUMBER,
+  call_count NUMBER,
+  cached_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  PRIMARY KEY (usage_date, source, service_type, name)
+)
+COMMENT = 'Daily pipeline credits from ACCOUNT_USAGE for the dashboard Cost Monitoring page';
+
+-- Re-pull the last lookback_days cached days (still settling in ACCOUNT_USAGE) and any newer days.
+-- An empty cache is backfilled with the last 365 days
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.refresh_cost_daily_cache(lookback_days INTEGER DEFAULT 3)
+RETURNS STRING
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_from_date DATE;
+  v_cached_rows INTEGER := 0;
+BEGIN
+  SELECT COALESCE(DATEADD('day', -:lookback_days, MAX(usage_date)), DATEADD('day', -365, CURRENT_DATE()))
+  INTO :v_from_date
+  FROM document_db.s3_documents.cost_daily_cache;
+
+  BEGIN TRANSACTION;
+  DELETE FROM document_db.s3_documents.cost_daily_cache WHERE usage_date >= :v_from_date;
+
+  INSERT INTO document_db.s3_documents.cost_daily_cache
+    (usage_date, source, service_type, name, credits, tokens, call_count)
+  SELECT DATE(start_time), 'metering', service_type, IFF(service_type = 'AI_SERVICES', '', name),
+         SUM(credits_used), NULL, COUNT(*)
+  FROM SNOWFLAKE.ACCOUNT_USAGE.METERING_HISTORY
+  WHERE start_time >= :v_from_date
+    AND (
+      -- Every pipeline task by name (also when the name is qualified); keep in step with the TASKS section
+      (service_type = 'SERVERLESS_TASK'
+        AND UPPER(SPLIT_PART(name, '.', -1)) IN (
+          'PARSE_DOCUMENTS_TASK', 'CLASSIFY_DOCUMENTS_TASK', 'EXTRACT_DOCUMENTS_TASK', 'CHUNK_DOCUMENTS_TASK',
+          'RECHUNK_DOCUMENTS_TASK', 'ATTRIBUTE_COSTS_TASK', 'REFRESH_ANALYTICS_ROLLUP_TASK',
+          'REFRESH_COST_CACHE_TASK', 'BACKFILL_DOCUMENT_ATTRIBUTES_TASK', 'PARSE_DOCUMENTS_RECOVERY_TASK'))
+      OR service_type = 'AI_SERVICES'
+    )
+  GROUP BY 1, 2, 3, 4
+  UNION ALL
+  SELECT DATE(start_time), 'cortex_functions', 'AI_SERVICES', function_name,
+         SUM(token_credits), SUM(tokens), COUNT(*)
+  FROM SNOWFLAKE.ACCOUNT_USAGE.CORTEX_FUNCTIONS_USAGE_HISTORY
+  WHERE start_time >= :v_from_date
+    AND (UPPER(function_name) LIKE '%PARSE_DOCUMENT%'
+      OR UPPER(function_name) LIKE '%CLASSIFY%'
+      OR UPPER(function_name) LIKE '%EXTRACT%')
+  GROUP BY 1, 2, 3, 4
+  UNION ALL
+  SELECT usage_date, 'cortex_search', 'CORTEX_SEARCH', service_name,
+         SUM(credits), SUM(tokens), NULL
+  FROM SNOWFLAKE.ACCOUNT_USAGE.CORTEX_SEARCH_DAILY_USAGE_HISTORY
+  WHERE usage_date >= :v_from_date
+    AND UPPER(service_name) LIKE '%DOCUMENT_SEARCH_SERVICE%'
+  GROUP BY 1, 2, 3, 4;
+
+  v_cached_rows := SQLROWCOUNT;
+  COMMIT;
+
+  RETURN 'Cost cache refresh completed. Days from ' || v_from_date || ', rows cached: ' || v_cached_rows;
+END;
+$$;
+
+
+-- =============================
+-- ANALYTICS DAILY ROLLUP
+-- =============================
+-- Daily counts behind the dashboard Analytics page, so its charts read a few hundred
+-- pre-aggregated rows instead of grouping the raw tables on every visit:
+--   documents_by_type         parsed documents per parse date and file type
+--   documents_by_status       parsed documents per parse date and status (parsed, classified, classification_error)
+--   classifications_by_class  classified documents per classification date and class
+--   extractions_by_attribute  extracted attributes per extraction date and attribute name
+-- The rollup is maintained from streams: each change adds +1 for the new row and -1 for the old one
+-- (an update appears as a DELETE/INSERT pair), so status changes and re-extractions move counts
+-- between days and dimensions without rescanning the tables
+CREATE OR REPLACE TABLE document_db.s3_documents.analytics_daily_rollup (
+  rollup_date DATE,
+  metric VARCHAR(30),
+  dimension_value VARCHAR(200),
+  item_count NUMBER,
+  updated_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+  PRIMARY KEY (rollup_date, metric, dimension_value)
+)
+COMMENT = 'Daily document, classification and extraction counts for the dashboard Analytics page';
+
+CREATE OR REPLACE STREAM document_db.s3_documents.analytics_parsed_stream
+ON TABLE document_db.s3_documents.parsed_documents
+COMMENT = 'Changes to parsed_documents not yet applied to analytics_daily_rollup';
+
+CREATE OR REPLACE STREAM document_db.s3_documents.analytics_classifications_stream
+ON TABLE document_db.s3_documents.document_classifications
+COMMENT = 'Changes to document_classifications not yet applied to analytics_daily_rollup';
+
+CREATE OR REPLACE STREAM document_db.s3_documents.analytics_extractions_stream
+ON TABLE document_db.s3_documents.document_extractions
+COMMENT = 'Changes to document_extractions not yet applied to analytics_daily_rollup';
+
+-- Apply pending stream changes to the rollup. full_rebuild => TRUE recomputes it from the tables
+-- (e.g. after upgrading an existing deployment) and discards what the streams hold
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.refresh_analytics_rollup(full_rebuild BOOLEAN DEFAULT FALSE)
+RETURNS STRING
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_merged_rows INTEGER := 0;
+  v_has_changes BOOLEAN;
+BEGIN
+  IF (full_rebuild) THEN
+    BEGIN TRANSACTION;
+    -- Reading the streams in a DML statement advances their offsets when the transaction commits
+    INSERT INTO document_db.s3_documents.analytics_daily_rollup (rollup_date, metric, dimension_value, item_count)
+    SELECT NULL, NULL, NULL, NULL FROM document_db.s3_documents.analytics_parsed_stream WHERE FALSE
+    UNION ALL
+    SELECT NULL, NULL, NULL, NULL FROM document_db.s3_documents.analytics_classifications_stream WHERE FALSE
+    UNION ALL
+    SELECT NULL, NULL, NULL, NULL FROM document_db.s3_documents.analytics_extractions_stream WHERE FALSE;
+
+    DELETE FROM document_db.s3_documents.analytics_daily_rollup;
+
+    INSERT INTO document_db.s3_documents.analytics_daily_rollup (rollup_date, metric, dimension_value, item_count)
+    SELECT DATE(parse_timestamp), 'documents_by_type', COALESCE(document_type, 'unknown'), COUNT(*)
+    FROM document_db.s3_documents.parsed_documents
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT DATE(parse_timestamp), 'documents_by_status', COALESCE(status, 'unknown'), COUNT(*)
+    FROM document_db.s3_documents.parsed_documents
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT DATE(classification_timestamp), 'classifications_by_class',
+           COALESCE(TRY_PARSE_JSON(document_class):labels[0]::STRING, document_class, 'unclassified'), COUNT(*)
+    FROM document_db.s3_documents.document_classifications
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT DATE(extraction_timestamp), 'extractions_by_attribute', attribute_name, COUNT(*)
+    FROM document_db.s3_documents.document_extractions
+    GROUP BY 1, 2, 3;
+
+    v_merged_rows := SQLROWCOUNT;
+    COMMIT;
+    RETURN 'Analytics rollup rebuilt. Rows: ' || v_merged_rows;
+  END IF;
+
+  SELECT SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.analytics_parsed_stream')
+      OR SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.analytics_classifications_stream')
+      OR SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.analytics_extractions_stream')
+  INTO :v_has_changes;
+  IF (NOT v_has_changes) THEN
+    RETURN 'Analytics rollup completed. Rows merged: 0';
+  END IF;
+
+  -- One statement consumes all three streams, so their offsets advance together
+  MERGE INTO document_db.s3_documents.analytics_daily_rollup t
+  USING (
+    WITH changes AS (
+      SELECT DATE(parse_timestamp) AS rollup_date, 'documents_by_type' AS metric,
+             COALESCE(document_type, 'unknown') AS dimension_value,
+             IFF(METADATA$ACTION = 'INSERT', 1, -1) AS delta
+      FROM document_db.s3_documents.analytics_parsed_stream
+      UNION ALL
+      SELECT DATE(parse_timestamp), 'documents_by_status', COALESCE(status, 'unknown'),
+             IFF(METADATA$ACTION = 'INSERT', 1, -1)
+      FROM document_db.s3_documents.analytics_parsed_stream
+      UNION ALL
+      SELECT DATE(classification_timestamp), 'classifications_by_class',
+             COALESCE(TRY_PARSE_JSON(document_class):labels[0]::STRING, document_class, 'unclassified'),
+             IFF(METADATA$ACTION = 'INSERT', 1, -1)
+      FROM document_db.s3_documents.analytics_classifications_stream
+      UNION ALL
+      SELECT DATE(extraction_timestamp), 'extractions_by_attribute', attribute_name,
+             IFF(METADATA$ACTION = 'INSERT', 1, -1)
+      FROM document_db.s3_documents.analytics_extractions_stream
+    )
+    SELECT rollup_date, metric, dimension_value, SUM(delta) AS delta
+    FROM changes
+    GROUP BY rollup_date, metric, dimension_value
+    HAVING SUM(delta) <> 0
+  ) s
+  ON t.rollup_date = s.rollup_date AND t.metric = s.metric AND t.dimension_value = s.dimension_value
+  WHEN MATCHED THEN UPDATE SET
+    t.item_count = t.item_count + s.delta,
+    t.updated_timestamp = CURRENT_TIMESTAMP()
+  WHEN NOT MATCHED THEN INSERT (rollup_date, metric, dimension_value, item_count)
+    VALUES (s.rollup_date, s.metric, s.dimension_value, s.delta);
+
+  v_merged_rows := SQLROWCOUNT;
+
+  -- Days and dimensions whose rows all moved elsewhere
+  DELETE FROM document_db.s3_documents.analytics_daily_rollup WHERE item_count <= 0;
+
+  RETURN 'Analytics rollup completed. Rows merged: ' || v_merged_rows;
+END;
+$$;
+
+
 -- =============================
 -- TASKS - Automated pipeline execution
 -- =============================
--- Task 1: Triggered when new files appear in the stream
+-- Task 1: Triggered when new files appear in the stream, and again after every batch that
+-- leaves files in parse_work_queue, until the backlog is drained
 CREATE OR REPLACE TASK document_db.s3_documents.parse_documents_task
   TARGET_COMPLETION_INTERVAL = '10 MINUTES'
-  COMMENT = 'Parse new documents from S3 stage using AI_PARSE_DOCUMENT'
+  COMMENT = 'Parse new documents from S3 stage using AI_PARSE_DOCUMENT, one micro-batch per run'
 WHEN SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.new_documents_stream')
+  OR SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.parse_queue_continuation_stream')
 AS
-  CALL document_db.s3_documents.parse_new_documents();
+  CALL document_db.s3_documents.parse_new_documents(100);
 
 -- Task 2: Runs after parsing completes
 CREATE OR REPLACE TASK document_db.s3_documents.classify_documents_task
@@ -733,89 +2191,324 @@ CREATE OR REPLACE TASK document_db.s3_documents.chunk_documents_task
 AS
   CALL document_db.s3_documents.chunk_classified_documents();
 
+-- Task 5: Re-chunk documents whose chunking profile changed, in bounded batches
+CREATE OR REPLACE TASK document_db.s3_documents.rechunk_documents_task
+  SCHEDULE = '30 MINUTES'
+  COMMENT = 'Re-chunk documents whose chunking_profiles version changed, 25 documents per run'
+AS
+  CALL document_db.s3_documents.rechunk_stale_documents(25);
+
+-- Task 6: Attribute AI credits to documents (ACCOUNT_USAGE lags, so a few runs a day is enough)
+CREATE OR REPLACE TASK document_db.s3_documents.attribute_costs_task
+  SCHEDULE = 'USING CRON 0 */6 * * * UTC'
+  COMMENT = 'Allocate Cortex AI credits to documents and pipeline stages from ACCOUNT_USAGE'
+AS
+  CALL document_db.s3_documents.attribute_document_costs(3);
+
+-- Task 7: Fold the run's changes into the analytics rollup once the pipeline graph has finished
+CREATE OR REPLACE TASK document_db.s3_documents.refresh_analytics_rollup_task
+  COMMENT = 'Apply parsed, classified and extracted document changes to analytics_daily_rollup'
+  AFTER document_db.s3_documents.chunk_documents_task
+AS
+  CALL document_db.s3_documents.refresh_analytics_rollup();
+
+-- Task 8: Pull new ACCOUNT_USAGE days into the cost cache read by the Cost Monitoring page
+CREATE OR REPLACE TASK document_db.s3_documents.refresh_cost_cache_task
+  SCHEDULE = 'USING CRON 30 */6 * * * UTC'
+  COMMENT = 'Copy new daily pipeline credits from ACCOUNT_USAGE into cost_daily_cache'
+AS
+  CALL document_db.s3_documents.refresh_cost_daily_cache(3);
+
+-- Task 9: Re-extract attributes whose extraction_prompts row was added or reworded
+CREATE OR REPLACE TASK document_db.s3_documents.backfill_document_attributes_task
+  SCHEDULE = '30 MINUTES'
+  COMMENT = 'Re-extract only new or changed extraction prompt attributes, 50 documents per run'
+AS
+  CALL document_db.s3_documents.backfill_changed_attributes(50);
+
+-- Task 10: Continuations are only written by a parse run that finishes, so a run that dies (timeout,
+-- poison file) would leave the queue waiting for the next upload. This hourly check writes a
+-- continuation whenever files are pending or stuck in a stale claim, which re-triggers Task 1
+CREATE OR REPLACE TASK document_db.s3_documents.parse_documents_recovery_task
+  SCHEDULE = '60 MINUTES'
+  COMMENT = 'Re-trigger parse_documents_task when parse_work_queue has pending or abandoned files'
+AS
+  INSERT INTO document_db.s3_documents.parse_queue_continuations (batch_id, files_processed, files_remaining)
+  SELECT 'recovery', 0, COUNT(*)
+  FROM document_db.s3_documents.parse_work_queue
+  WHERE status = 'pending'
+     OR (status = 'processing' AND claimed_timestamp < DATEADD('hour', -1, CURRENT_TIMESTAMP()))
+  HAVING COUNT(*) > 0;
+
 -- =============================
--- FLATTENED DOCUMENT PROCESSING VIEW
+-- FLATTENED DOCUMENT PROCESSING SUMMARY (DYNAMIC TABLE)
 -- =============================
--- Create a comprehensive flattened view that combines all document processing results
--- This view shows document_id, file_name, document_class, attribute_name, and attribute_value
+-- Materialized, incrementally refreshed summary that combines all document processing results
+-- This table shows document_id, file_name, document_class, attribute_name, and attribute_value
 -- Each row represents one document-attribute pair (e.g., customer_count: 12,062)
-
-CREATE OR REPLACE VIEW document_db.s3_documents.document_processing_summary AS
-WITH flattened_extractions AS (
-    -- Handle regular attributes (non-JSON)
+-- JSON parsing and flattening happen once per changed row at refresh time instead of on every read
+
+-- Upgrading an existing deployment: the summary used to be a view, and a view cannot be replaced
+-- by a dynamic table in place. Drop it once before running the statement below:
+-- DROP VIEW IF EXISTS document_db.s3_documents.document_processing_summary;
+
+CREATE OR REPLACE DYNAMIC TABLE document_db.s3_documents.document_processing_summary
+  TARGET_LAG = '5 minutes'
+  WAREHOUSE = COMPUTE_WH
+  REFRESH_MODE = INCREMENTAL
+  CLUSTER BY (document_id, attribute_name)
+  COMMENT = 'Flattened document-attribute pairs, incrementally maintained from classifications and extractions'
+AS
+WITH parsed_extractions AS (
+    -- Parse attribute_value once per row
     SELECT 
         document_id,
-        file_name,
-        file_path,
-        document_class,
         attribute_name,
         attribute_value,
+        TRY_PARSE_JSON(attribute_value) AS attribute_json,
         confidence_score,
         extraction_timestamp
     FROM document_db.s3_documents.document_extractions
-    WHERE TRY_PARSE_JSON(attribute_value) IS NULL
+),
+flattened_extractions AS (
+    -- Handle regular attributes (non-JSON)
+    SELECT 
+        document_id,
+        attribute_name,
+        attribute_value,
+        confidence_score,
+        extraction_timestamp
+    FROM parsed_extractions
+    WHERE attribute_json IS NULL
     
     UNION ALL
     
     -- Handle JSON attributes - flatten them
     SELECT 
-        de.document_id,
-        de.file_name,
-        de.file_path,
-        de.document_class,
+        pe.document_id,
         f.key::STRING AS attribute_name,
         f.value::STRING AS attribute_value,
-        de.confidence_score,
-        de.extraction_timestamp
-    FROM document_db.s3_documents.document_extractions de,
-         LATERAL FLATTEN(INPUT => TRY_PARSE_JSON(de.attribute_value)) f
-    WHERE TRY_PARSE_JSON(de.attribute_value) IS NOT NULL
+        pe.confidence_score,
+        pe.extraction_timestamp
+    FROM parsed_extractions pe,
+         LATERAL FLATTEN(INPUT => pe.attribute_json) f
+    WHERE pe.attribute_json IS NOT NULL
+),
+clean_classifications AS (
+    -- Clean document classification (remove JSON formatting if present)
+    SELECT 
+        document_id,
+        file_name,
+        file_path,
+        document_type,
+        COALESCE(TRY_PARSE_JSON(document_class):labels[0]::STRING, document_class) AS document_classification,
+        classification_timestamp
+    FROM document_db.s3_documents.document_classifications
 )
 SELECT 
-    dc.document_id,
-    dc.file_name,
-    dc.file_path,
-    dc.document_type,
-    -- Clean document classification (remove JSON formatting if present)
-    CASE 
-        WHEN TRY_PARSE_JSON(dc.document_class) IS NOT NULL THEN 
-            TRY_PARSE_JSON(dc.document_class):labels[0]::STRING
-        ELSE dc.document_class
-    END as document_classification,
+    cc.document_id,
+    cc.file_name,
+    cc.file_path,
+    cc.document_type,
+    cc.document_classification,
     fe.attribute_name,
     fe.attribute_value,
     fe.confidence_score,
-    dc.classification_timestamp,
+    cc.classification_timestamp,
     fe.extraction_timestamp
-FROM document_db.s3_documents.document_classifications dc
+FROM clean_classifications cc
 LEFT JOIN flattened_extractions fe 
-    ON dc.document_id = fe.document_id
-ORDER BY dc.document_id, fe.attribute_name;
+    ON cc.document_id = fe.document_id;
+
+
+-- =============================
+-- PROCESSING SUMMARY EXPORTS
+-- =============================
+-- Full-corpus exports of document_processing_summary are unloaded server-side with COPY INTO and
+-- downloaded straight from the stage, so large exports never pass through the Streamlit app.
+-- Presigned URLs on an internal stage require server-side encryption
+CREATE STAGE IF NOT EXISTS document_db.s3_documents.export_stage
+  ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE')
+  COMMENT = 'Processing summary exports (Parquet or gzipped CSV) for download via presigned URLs';
+
+-- Unload the summary, optionally filtered by class and classification date range, into a new
+-- export_stage folder. Returns one row per unloaded file with a presigned URL valid for 1 hour.
+-- Files are split at MAX_FILE_SIZE, so downloads stay manageable for large corpora
+CREATE OR REPLACE PROCEDURE document_db.s3_documents.export_processing_summary(
+  export_format STRING DEFAULT 'parquet',
+  document_class STRING DEFAULT NULL,
+  start_date DATE DEFAULT NULL,
+  end_date DATE DEFAULT NULL
+)
+RETURNS TABLE (file_name STRING, file_size NUMBER, row_count NUMBER, download_url STRING)
+LANGUAGE SQL
+EXECUTE AS CALLER
+AS
+$$
+DECLARE
+  v_format STRING := LOWER(COALESCE(export_format, 'parquet'));
+  v_export_path STRING;
+  v_filters STRING := '';
+  v_copy_sql STRING;
+  v_files RESULTSET;
+  invalid_export_format EXCEPTION (-20001, 'export_format must be parquet or csv');
+BEGIN
+  IF (v_format NOT IN ('parquet', 'csv')) THEN
+    RAISE invalid_export_format;
+  END IF;
+
+  IF (document_class IS NOT NULL) THEN
+    v_filters := v_filters || ' AND document_classification = ''' || REPLACE(document_class, '''', '''''') || '''';
+  END IF;
+  IF (start_date IS NOT NULL) THEN
+    v_filters := v_filters || ' AND classification_timestamp >= ''' || start_date::STRING || '''::DATE';
+  END IF;
+  IF (end_date IS NOT NULL) THEN
+    v_filters := v_filters || ' AND classification_timestamp < DATEADD(day, 1, ''' || end_date::STRING || '''::DATE)';
+  END IF;
+
+  v_export_path := 'processing_summary/' || TO_CHAR(CURRENT_TIMESTAMP(), 'YYYYMMDD_HH24MISSFF3') || '/';
+  v_copy_sql := 'COPY INTO @document_db.s3_documents.export_stage/' || v_export_path || ' FROM ('
+    || 'SELECT document_id, file_name, file_path, document_type, document_classification, attribute_name, '
+    || 'attribute_value, confidence_score, classification_timestamp, extraction_timestamp '
+    || 'FROM document_db.s3_documents.document_processing_summary WHERE TRUE' || v_filters || ')'
+    || IFF(v_format = 'parquet',
+           ' FILE_FORMAT = (TYPE = PARQUET COMPRESSION = SNAPPY)',
+           ' FILE_FORMAT = (TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = ''"'')')
+    || ' HEADER = TRUE MAX_FILE_SIZE = 268435456 DETAILED_OUTPUT = TRUE';
+  EXECUTE IMMEDIATE :v_copy_sql;
+
+  -- DETAILED_OUTPUT lists each unloaded file; the URLs are generated without reading the files back
+  v_files := (
+    SELECT "FILE_NAME" AS file_name,
+           "FILE_SIZE" AS file_size,
+           "ROW_COUNT" AS row_count,
+           GET_PRESIGNED_URL(
+             @document_db.s3_documents.export_stage,
+             IFF(STARTSWITH("FILE_NAME", :v_export_path), "FILE_NAME", :v_export_path || "FILE_NAME"),
+             3600
+           ) AS download_url
+    FROM TABLE(RESULT_SCAN(LAST_QUERY_ID()))
+  );
+  RETURN TABLE(v_files);
+END;
+$$;
 
 
 -- =============================
 -- START TASKS AND VALIDATION QUERIES
 -- =============================
 -- No manual refresh needed - auto-refresh handles this automatically!
-ALTER TASK document_db.s3_documents.parse_documents_task RESUME;
+-- Resume the stream-triggered graph: the parse task and every task that runs AFTER it
+SELECT SYSTEM$TASK_DEPENDENTS_ENABLE('document_db.s3_documents.parse_documents_task');
+ALTER TASK document_db.s3_documents.rechunk_documents_task RESUME;
+ALTER TASK document_db.s3_documents.attribute_costs_task RESUME;
+ALTER TASK document_db.s3_documents.refresh_cost_cache_task RESUME;
+ALTER TASK document_db.s3_documents.backfill_document_attributes_task RESUME;
+ALTER TASK document_db.s3_documents.parse_documents_recovery_task RESUME;
+
+-- Backfill the cost cache now instead of waiting for the first scheduled run
+CALL document_db.s3_documents.refresh_cost_daily_cache(3);
 
 -- Validation queries to check pipeline status
 SELECT * FROM document_db.s3_documents.new_documents_stream;
+
+-- Parse backlog progress (pending drains by one batch per parse_documents_task run)
+SELECT status, COUNT(*) AS files, MAX(attempts) AS max_attempts
+FROM document_db.s3_documents.parse_work_queue
+GROUP BY status;
 SELECT * FROM document_db.s3_documents.parsed_documents;
 SELECT * FROM document_db.s3_documents.document_classifications;
 SELECT * FROM document_db.s3_documents.document_extractions;
 SELECT * FROM document_db.s3_documents.document_chunks;
 
+-- Chunking profile coverage: chunks per class and profile version (stale rows await rechunk_documents_task)
+SELECT 
+    ch.chunk_profile_class,
+    ch.chunk_profile_version,
+    cp.profile_version AS current_profile_version,
+    COUNT(DISTINCT ch.document_id) AS documents,
+    COUNT(*) AS chunks,
+    ROUND(AVG(ch.chunk_size)) AS avg_chunk_size
+FROM document_db.s3_documents.document_chunks ch
+LEFT JOIN document_db.s3_documents.chunking_profiles cp
+    ON ch.chunk_profile_class = cp.document_class
+GROUP BY ALL
+ORDER BY ch.chunk_profile_class;
+
+-- Extraction prompt coverage: values per prompt version (stale values await backfill_document_attributes_task)
+SELECT 
+    ep.document_class,
+    ep.attribute_name,
+    ep.prompt_version,
+    COUNT_IF(de.prompt_hash = ep.prompt_hash) AS current_values,
+    COUNT_IF(de.prompt_hash IS DISTINCT FROM ep.prompt_hash) AS stale_values
+FROM document_db.s3_documents.extraction_prompts ep
+JOIN document_db.s3_documents.document_extractions de
+    ON de.attribute_name = ep.attribute_name
+   AND LOWER(REPLACE(REPLACE(TRIM(ep.document_class),' ','_'),'-','_')) =
+       LOWER(REPLACE(REPLACE(TRIM(COALESCE(TRY_PARSE_JSON(de.document_class):labels[0]::STRING, de.document_class)),' ','_'),'-','_'))
+GROUP BY ALL
+ORDER BY stale_values DESC, ep.document_class, ep.attribute_name;
+
+-- Classification fast path: documents classified by each rule versus AI_CLASSIFY
+SELECT 
+    classification_method,
+    rule_id,
+    COALESCE(TRY_PARSE_JSON(document_class):labels[0]::STRING, document_class) AS document_class,
+    COUNT(*) AS documents
+FROM document_db.s3_documents.document_classifications
+GROUP BY ALL
+ORDER BY classification_method, rule_id, document_class;
+
 -- Validation query for flattened document processing results
 -- This shows each document with individual attribute-value pairs (one row per attribute)
 SELECT * FROM document_db.s3_documents.document_processing_summary LIMIT 20;
 
--- Debug: Test the main view with w2_3 specifically
+-- Check dynamic table refresh mode and recent refreshes (refresh_mode should be INCREMENTAL)
+SHOW DYNAMIC TABLES LIKE 'DOCUMENT_PROCESSING_SUMMARY' IN SCHEMA document_db.s3_documents;
+SELECT name, state, refresh_action, refresh_start_time, refresh_end_time
+FROM TABLE(INFORMATION_SCHEMA.DYNAMIC_TABLE_REFRESH_HISTORY(
+  NAME => 'document_db.s3_documents.document_processing_summary'
+))
+ORDER BY refresh_start_time DESC
+LIMIT 10;
+
+-- Per-document cost attribution (ACCOUNT_USAGE lags by up to a few hours after processing)
+CALL document_db.s3_documents.attribute_document_costs(3);
+SELECT * FROM document_db.s3_documents.document_class_costs ORDER BY total_credits DESC;
+SELECT document_id, file_name, document_class, page_count, total_credits, credits_per_page
+FROM document_db.s3_documents.document_costs
+ORDER BY total_credits DESC
+LIMIT 20;
+
+-- Batch Q&A runs: answered and failed questions per run
+SELECT run_id, COUNT(*) AS results, COUNT_IF(status = 'failed') AS failed, MAX(answered_timestamp) AS finished
+FROM document_db.s3_documents.batch_qa_results
+GROUP BY run_id
+ORDER BY finished DESC
+LIMIT 10;
+
+-- Cost cache: cached days and credits per source (the Cost Monitoring page reads only this table)
+SELECT source, MIN(usage_date) AS first_day, MAX(usage_date) AS last_day, SUM(credits) AS credits,
+       MAX(cached_timestamp) AS last_refreshed
+FROM document_db.s3_documents.cost_daily_cache
+GROUP BY source;
+
+-- Analytics rollup: daily counts per metric (the Analytics page reads only this table)
+SELECT metric, COUNT(*) AS rollup_rows, SUM(item_count) AS items, MAX(updated_timestamp) AS last_updated
+FROM document_db.s3_documents.analytics_daily_rollup
+GROUP BY metric;
+
+-- Processing summary exports on stage (remove old ones with REMOVE, see 03_cleanup_utilities.sql)
+LIST @document_db.s3_documents.export_stage/processing_summary/;
+
+-- Debug: Test the summary table with w2_3 specifically
 SELECT * FROM document_db.s3_documents.document_processing_summary 
 WHERE file_name LIKE '%w2_3%' 
 ORDER BY document_id, attribute_name;
 
--- Summary statistics for the flattened view
+-- Summary statistics for the flattened summary table
 SELECT 
     COUNT(DISTINCT document_id) as total_documents,
     COUNT(DISTINCT document_classification) as unique_classifications,
@@ -870,7 +2563,7 @@ ORDER BY document_id, attribute_name;
 -- WHERE file_name LIKE '%infographic%' 
 -- ORDER BY document_id, attribute_name;
 
--- Debug: Test the main view with JSON flattening
+-- Debug: Test the summary table with JSON flattening
 SELECT * FROM document_db.s3_documents.document_processing_summary 
 ORDER BY document_id, attribute_name 
 LIMIT 20;
@@ -980,7 +2673,7 @@ FULL OUTER JOIN actual_attrs aa
     AND ea.expected_attribute = aa.actual_attribute
 ORDER BY ea.expected_attribute, aa.actual_attribute;
 
--- Test the JSON flattening in the view - should show individual attributes
+-- Test the JSON flattening in the summary table - should show individual attributes
 SELECT 
     document_id,
     file_name,
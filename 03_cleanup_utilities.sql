@@ -14,6 +14,11 @@ REMOVE @document_db.s3_documents.document_stage;
 CREATE OR REPLACE TEMPORARY TABLE temp_stream_clear AS 
 SELECT * FROM document_db.s3_documents.new_documents_stream;
 DROP TABLE temp_stream_clear;
+CREATE OR REPLACE TEMPORARY TABLE temp_continuation_clear AS 
+SELECT * FROM document_db.s3_documents.parse_queue_continuation_stream;
+DROP TABLE temp_continuation_clear;
+-- Delete processing summary exports (download links to them stop working)
+REMOVE @document_db.s3_documents.export_stage/processing_summary/;
 
 -- Verify stage is empty and clear all processing tables
 LIST @document_db.s3_documents.document_stage;
@@ -21,10 +26,32 @@ TRUNCATE TABLE document_db.s3_documents.document_chunks;        -- Clear chunks
 TRUNCATE TABLE document_db.s3_documents.document_extractions;
 TRUNCATE TABLE document_db.s3_documents.document_classifications;
 TRUNCATE TABLE document_db.s3_documents.parsed_documents;
+TRUNCATE TABLE document_db.s3_documents.parse_work_queue;
+TRUNCATE TABLE document_db.s3_documents.parse_queue_continuations;
+TRUNCATE TABLE document_db.s3_documents.pipeline_query_log;
+TRUNCATE TABLE document_db.s3_documents.attribute_backfill_failures;
+TRUNCATE TABLE document_db.s3_documents.rechunk_failures;
+TRUNCATE TABLE document_db.s3_documents.document_cost_attribution;
+TRUNCATE TABLE document_db.s3_documents.extraction_review_audit;
+TRUNCATE TABLE document_db.s3_documents.batch_qa_results;
+TRUNCATE TABLE document_db.s3_documents.analytics_daily_rollup;
+
+-- Discard the truncated rows from the analytics streams, since the rollup was truncated too
+CREATE OR REPLACE TEMPORARY TABLE temp_analytics_stream_clear AS
+SELECT document_id FROM document_db.s3_documents.analytics_parsed_stream
+UNION ALL
+SELECT document_id FROM document_db.s3_documents.analytics_classifications_stream
+UNION ALL
+SELECT document_id FROM document_db.s3_documents.analytics_extractions_stream;
+DROP TABLE temp_analytics_stream_clear;
+
+-- Bring the flattened summary dynamic table in line with the truncated tables
+ALTER DYNAMIC TABLE document_db.s3_documents.document_processing_summary REFRESH;
 
 -- Validation queries to confirm clean state
 SELECT COUNT(*) as stream_record_count FROM document_db.s3_documents.new_documents_stream;
 SELECT COUNT(*) as parsed_record_count FROM document_db.s3_documents.parsed_documents;
+SELECT COUNT(*) as queued_file_count FROM document_db.s3_documents.parse_work_queue;
 SELECT COUNT(*) as classification_record_count FROM document_db.s3_documents.document_classifications;
 SELECT COUNT(*) as extraction_record_count FROM document_db.s3_documents.document_extractions;
 SELECT COUNT(*) as chunk_record_count FROM document_db.s3_documents.document_chunks;
@@ -35,22 +62,55 @@ SELECT COUNT(*) as chunk_record_count FROM document_db.s3_documents.document_chu
 -- Use this section only if you need to completely rebuild the pipeline
 /*
 -- Drop all tasks (in reverse dependency order)
+DROP TASK IF EXISTS document_db.s3_documents.parse_documents_recovery_task;
+DROP TASK IF EXISTS document_db.s3_documents.backfill_document_attributes_task;
+DROP TASK IF EXISTS document_db.s3_documents.refresh_cost_cache_task;
+DROP TASK IF EXISTS document_db.s3_documents.refresh_analytics_rollup_task;
+DROP TASK IF EXISTS document_db.s3_documents.attribute_costs_task;
+DROP TASK IF EXISTS document_db.s3_documents.rechunk_documents_task;
 DROP TASK IF EXISTS document_db.s3_documents.extract_documents_task;
 DROP TASK IF EXISTS document_db.s3_documents.chunk_documents_task;
 DROP TASK IF EXISTS document_db.s3_documents.classify_documents_task;
 DROP TASK IF EXISTS document_db.s3_documents.parse_documents_task;
 
--- Drop all tables
+-- Drop the flattened summary dynamic table (depends on the tables below)
+DROP DYNAMIC TABLE IF EXISTS document_db.s3_documents.document_processing_summary;
+
+-- Drop the cost attribution views
+DROP VIEW IF EXISTS document_db.s3_documents.document_class_costs;
+DROP VIEW IF EXISTS document_db.s3_documents.document_costs;
+DROP MATERIALIZED VIEW IF EXISTS document_db.s3_documents.extraction_review_queue;
+
+-- Drop all tables (this also removes their search optimization)
 DROP TABLE IF EXISTS document_db.s3_documents.document_chunks;
 DROP TABLE IF EXISTS document_db.s3_documents.document_extractions;
 DROP TABLE IF EXISTS document_db.s3_documents.document_classifications;
 DROP TABLE IF EXISTS document_db.s3_documents.parsed_documents;
+DROP TABLE IF EXISTS document_db.s3_documents.chunking_profiles;
+DROP TABLE IF EXISTS document_db.s3_documents.extraction_settings;
+DROP TABLE IF EXISTS document_db.s3_documents.classification_rules;
+DROP TABLE IF EXISTS document_db.s3_documents.classification_sampling_profiles;
+DROP STREAM IF EXISTS document_db.s3_documents.parse_queue_continuation_stream;
+DROP TABLE IF EXISTS document_db.s3_documents.parse_queue_continuations;
+DROP TABLE IF EXISTS document_db.s3_documents.parse_work_queue;
+DROP TABLE IF EXISTS document_db.s3_documents.document_cost_attribution;
+DROP TABLE IF EXISTS document_db.s3_documents.pipeline_query_log;
+DROP TABLE IF EXISTS document_db.s3_documents.attribute_backfill_failures;
+DROP TABLE IF EXISTS document_db.s3_documents.rechunk_failures;
+DROP TABLE IF EXISTS document_db.s3_documents.extraction_review_audit;
+DROP TABLE IF EXISTS document_db.s3_documents.batch_qa_results;
+DROP STREAM IF EXISTS document_db.s3_documents.analytics_parsed_stream;
+DROP STREAM IF EXISTS document_db.s3_documents.analytics_classifications_stream;
+DROP STREAM IF EXISTS document_db.s3_documents.analytics_extractions_stream;
+DROP TABLE IF EXISTS document_db.s3_documents.analytics_daily_rollup;
+DROP TABLE IF EXISTS document_db.s3_documents.cost_daily_cache;
 
 -- Drop stream
 DROP STREAM IF EXISTS document_db.s3_documents.new_documents_stream;
 
 -- Drop stage (this will also clean up the auto-refresh SQS queue)
 DROP STAGE IF EXISTS document_db.s3_documents.document_stage;
+DROP STAGE IF EXISTS document_db.s3_documents.export_stage;
 
 -- Drop schema and database
 DROP SCHEMA IF EXISTS document_db.s3_documents;
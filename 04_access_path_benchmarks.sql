@@ -0,0 +1,130 @@
+-- =============================
+-- ACCESS PATH BENCHMARKS
+-- =============================
+-- This file contains a small benchmark query set for the document_id access paths used by the
+-- Streamlit app (explorer, approve/deny updates, detail views) and the confidence-range scan
+-- behind the review queue
+-- Run it after 02_document_pipeline_setup.sql once documents have been processed, and re-run it
+-- as the tables grow to confirm lookups still prune down to a handful of micro-partitions
+
+USE WAREHOUSE COMPUTE_WH;
+USE SCHEMA document_db.s3_documents;
+
+-- Disable the result cache so every query below really scans the tables
+ALTER SESSION SET USE_CACHED_RESULT = FALSE;
+
+-- =============================
+-- PHYSICAL LAYOUT STATUS
+-- =============================
+-- Clustering depth/overlap for the declared clustering keys (lower average_depth is better)
+SELECT SYSTEM$CLUSTERING_INFORMATION('document_db.s3_documents.document_extractions');
+SELECT SYSTEM$CLUSTERING_INFORMATION('document_db.s3_documents.document_chunks');
+SELECT SYSTEM$CLUSTERING_INFORMATION('document_db.s3_documents.extraction_review_queue');
+
+-- Search optimization build progress (search_optimization_progress should reach 100)
+SHOW TABLES LIKE 'DOCUMENT_EXTRACTIONS' IN SCHEMA document_db.s3_documents;
+SHOW TABLES LIKE 'DOCUMENT_CHUNKS' IN SCHEMA document_db.s3_documents;
+
+-- Configured search optimization methods per table
+DESCRIBE SEARCH OPTIMIZATION ON document_db.s3_documents.document_extractions;
+DESCRIBE SEARCH OPTIMIZATION ON document_db.s3_documents.document_chunks;
+
+-- =============================
+-- BENCHMARK INPUTS
+-- =============================
+-- Pick a representative document and attribute (replace with specific values if needed)
+SET bench_document_id = (
+  SELECT document_id FROM document_db.s3_documents.document_extractions
+  ORDER BY extraction_timestamp DESC LIMIT 1
+);
+SET bench_attribute_name = (
+  SELECT MIN(attribute_name) FROM document_db.s3_documents.document_extractions
+  WHERE document_id = $bench_document_id
+);
+
+-- =============================
+-- ACCESS PATH 1: Explorer extracted fields (document_id)
+-- =============================
+SELECT attribute_name, attribute_value, confidence_score, extraction_timestamp
+FROM document_db.s3_documents.document_extractions
+WHERE document_id = $bench_document_id
+ORDER BY attribute_name;
+
+SET q_extraction_fields = LAST_QUERY_ID();
+
+-- =============================
+-- ACCESS PATH 2: Approve/Deny point lookup (document_id + attribute_name)
+-- =============================
+-- Same predicate as the review UPDATE statements, read-only so the benchmark has no side effects
+SELECT attribute_value, confidence_score
+FROM document_db.s3_documents.document_extractions
+WHERE document_id = $bench_document_id
+  AND attribute_name = $bench_attribute_name;
+
+SET q_extraction_point = LAST_QUERY_ID();
+
+-- =============================
+-- ACCESS PATH 3: Explorer chunk preview (document_id)
+-- =============================
+SELECT chunk_text, chunk_index
+FROM document_db.s3_documents.document_chunks
+WHERE document_id = $bench_document_id
+ORDER BY chunk_index
+LIMIT 3;
+
+SET q_chunk_preview = LAST_QUERY_ID();
+
+-- =============================
+-- ACCESS PATH 4: Detail view full chunk list (document_id)
+-- =============================
+SELECT chunk_index, chunk_text, chunk_size
+FROM document_db.s3_documents.document_chunks
+WHERE document_id = $bench_document_id
+ORDER BY chunk_index;
+
+SET q_chunk_detail = LAST_QUERY_ID();
+
+-- =============================
+-- ACCESS PATH 5: Review queue page (confidence range, keyset order)
+-- =============================
+-- First page of the dashboard review queue at the default 0.5 threshold
+SELECT document_id, file_name, attribute_name, attribute_value, confidence_score
+FROM document_db.s3_documents.extraction_review_queue
+WHERE confidence_score < 0.5
+ORDER BY confidence_score, document_id, attribute_name
+LIMIT 100;
+
+SET q_review_queue = LAST_QUERY_ID();
+
+-- =============================
+-- PARTITION PRUNING RESULTS
+-- =============================
+-- One row per table scan: partitions_scanned should be a small fraction of partitions_total
+-- (pruning_ratio close to 1.0) once clustering and search optimization have caught up
+WITH scans AS (
+  SELECT 'extraction_fields' AS access_path, * FROM TABLE(GET_QUERY_OPERATOR_STATS($q_extraction_fields)) UNION ALL
+  SELECT 'extraction_point_lookup', * FROM TABLE(GET_QUERY_OPERATOR_STATS($q_extraction_point)) UNION ALL
+  SELECT 'chunk_preview', * FROM TABLE(GET_QUERY_OPERATOR_STATS($q_chunk_preview)) UNION ALL
+  SELECT 'chunk_detail', * FROM TABLE(GET_QUERY_OPERATOR_STATS($q_chunk_detail)) UNION ALL
+  SELECT 'review_queue', * FROM TABLE(GET_QUERY_OPERATOR_STATS($q_review_queue))
+)
+SELECT
+  access_path,
+  query_id,
+  operator_attributes:table_name::STRING AS table_name,
+  operator_statistics:pruning:partitions_scanned::NUMBER AS partitions_scanned,
+  operator_statistics:pruning:partitions_total::NUMBER AS partitions_total,
+  ROUND(1 - partitions_scanned / NULLIF(partitions_total, 0), 4) AS pruning_ratio,
+  execution_time_breakdown:overall_percentage::FLOAT AS scan_time_pct
+FROM scans
+WHERE operator_type = 'TableScan'
+ORDER BY access_path;
+
+-- Elapsed time and bytes scanned per benchmark query (INFORMATION_SCHEMA has no ACCOUNT_USAGE latency)
+SELECT query_id, total_elapsed_time, bytes_scanned, rows_produced
+FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION())
+WHERE query_id IN ($q_extraction_fields, $q_extraction_point, $q_chunk_preview, $q_chunk_detail, $q_review_queue)
+ORDER BY start_time;
+
+-- Restore the default result cache behavior
+ALTER SESSION UNSET USE_CACHED_RESULT;
@@ -0,0 +1,177 @@
+-- =============================
+-- CLASSIFICATION SAMPLER EVALUATION
+-- =============================
+-- Offline comparison of AI_CLASSIFY on the full content_text versus sampled input
+-- (sample_classification_input), over the documents already parsed from demo_docs
+-- For each sampler it reports agreement with the full-text label, accuracy on demo_docs folders that
+-- hold a single class, AI_CLASSIFY input tokens and classification wall time
+-- Run it after 02_document_pipeline_setup.sql has parsed the documents. It only reads pipeline tables:
+-- samples and labels go to temporary tables, and classification_sampling_profiles is not changed
+-- Only documents longer than a sampler's max_chars are sampled; sampled_documents counts them
+
+USE WAREHOUSE COMPUTE_WH;
+USE SCHEMA document_db.s3_documents;
+
+-- Disable the result cache so every sampler really calls AI_CLASSIFY
+ALTER SESSION SET USE_CACHED_RESULT = FALSE;
+
+-- =============================
+-- SAMPLERS AND EXPECTED LABELS
+-- =============================
+-- 'full' is the baseline; 'profile' uses the configured classification_sampling_profiles
+CREATE OR REPLACE TEMPORARY TABLE sampler_eval_candidates (
+  sampler VARCHAR,
+  sample_mode VARCHAR,
+  max_chars INTEGER,
+  edge_pages INTEGER
+);
+
+INSERT INTO sampler_eval_candidates (sampler, sample_mode, max_chars, edge_pages)
+SELECT 'full', 'full', NULL, NULL UNION ALL
+SELECT 'prefix_4000', 'prefix', 4000, NULL UNION ALL
+SELECT 'prefix_8000', 'prefix', 8000, NULL UNION ALL
+SELECT 'first_last_pages_12000', 'first_last_pages', 12000, 2 UNION ALL
+SELECT 'head_middle_tail_9000', 'head_middle_tail', 9000, NULL UNION ALL
+SELECT 'profile', NULL, NULL, NULL;
+
+-- demo_docs folders whose documents all belong to one class (sales/ and marketing/ are mixed, and
+-- hr/ also holds non-policy documents)
+CREATE OR REPLACE TEMPORARY TABLE sampler_eval_expected AS
+SELECT column1 AS path_prefix, column2 AS expected_class
+FROM VALUES
+  ('w2s/', 'w2'),
+  ('vendor_contracts/', 'vendor_contract'),
+  ('financial filings/', 'financial_infographic'),
+  ('policies/', 'corporate_policy');
+
+-- =============================
+-- SAMPLED INPUTS
+-- =============================
+-- One row per sampler and document, with the AI_CLASSIFY input tokens of the sample
+CREATE OR REPLACE TEMPORARY TABLE sampler_eval_inputs AS
+WITH samples AS (
+  SELECT
+    c.sampler,
+    pd.document_id,
+    pd.file_path,
+    pd.document_type,
+    LENGTH(pd.content_text) AS content_chars,
+    document_db.s3_documents.sample_classification_input(
+      pd.content_text,
+      IFF(c.sampler = 'profile', IFF(tp.document_type IS NOT NULL, tp.sample_mode, dp.sample_mode), c.sample_mode),
+      IFF(c.sampler = 'profile', IFF(tp.document_type IS NOT NULL, tp.max_chars, dp.max_chars), c.max_chars),
+      IFF(c.sampler = 'profile', IFF(tp.document_type IS NOT NULL, tp.edge_pages, dp.edge_pages), c.edge_pages)
+    ) AS input_text
+  FROM document_db.s3_documents.parsed_documents pd
+  CROSS JOIN sampler_eval_candidates c
+  LEFT JOIN document_db.s3_documents.classification_sampling_profiles tp
+    ON tp.document_type = pd.document_type
+  LEFT JOIN document_db.s3_documents.classification_sampling_profiles dp
+    ON dp.document_type = 'default'
+  WHERE pd.content_text IS NOT NULL
+    AND LENGTH(TRIM(pd.content_text)) > 0
+)
+SELECT
+  *,
+  LENGTH(input_text) AS input_chars,
+  AI_COUNT_TOKENS('ai_classify', input_text,
+    ['w2', 'vendor_contract', 'sales_report', 'marketing_report', 'hr_policy',
+     'corporate_policy', 'financial_infographic', 'case_study', 'strategy_document', 'other']) AS input_tokens
+FROM samples;
+
+-- =============================
+-- CLASSIFICATION RUNS
+-- =============================
+-- One set-based AI_CLASSIFY statement per sampler (the categories match classify_parsed_documents()),
+-- with its query ID kept for the timing results
+CREATE OR REPLACE TEMPORARY TABLE sampler_eval_labels (sampler VARCHAR, document_id VARCHAR, predicted_class VARCHAR);
+CREATE OR REPLACE TEMPORARY TABLE sampler_eval_queries (sampler VARCHAR, query_id VARCHAR);
+
+EXECUTE IMMEDIATE $$
+DECLARE
+  sampler_cursor CURSOR FOR SELECT sampler FROM sampler_eval_candidates ORDER BY sampler;
+  v_sampler STRING;
+BEGIN
+  FOR sampler_record IN sampler_cursor DO
+    v_sampler := sampler_record.sampler;
+    INSERT INTO sampler_eval_labels (sampler, document_id, predicted_class)
+    SELECT
+      sampler,
+      document_id,
+      AI_CLASSIFY(
+        input_text,
+        ['w2', 'vendor_contract', 'sales_report', 'marketing_report', 'hr_policy',
+         'corporate_policy', 'financial_infographic', 'case_study', 'strategy_document', 'other']
+      ):labels[0]::STRING
+    FROM sampler_eval_inputs
+    WHERE sampler = :v_sampler;
+    INSERT INTO sampler_eval_queries (sampler, query_id)
+    SELECT :v_sampler, LAST_QUERY_ID();
+  END FOR;
+  RETURN 'Sampler evaluation classified every sample';
+END;
+$$;
+
+-- =============================
+-- RESULTS
+-- =============================
+-- Accuracy, input size and latency per sampler. A sampler is safe to use when agreement_with_full
+-- and folder_label_accuracy match the 'full' row; token_share is its input tokens relative to 'full'
+WITH timings AS (
+  SELECT q.sampler, h.total_elapsed_time AS classify_elapsed_ms
+  FROM sampler_eval_queries q
+  JOIN TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 1000)) h
+    ON h.query_id = q.query_id
+),
+baseline AS (
+  SELECT document_id, predicted_class
+  FROM sampler_eval_labels
+  WHERE sampler = 'full'
+)
+SELECT
+  l.sampler,
+  COUNT(*) AS documents,
+  COUNT_IF(i.input_chars < i.content_chars) AS sampled_documents,
+  ROUND(AVG(IFF(l.predicted_class = b.predicted_class, 1, 0)), 3) AS agreement_with_full,
+  ROUND(AVG(IFF(e.expected_class IS NULL, NULL, IFF(l.predicted_class = e.expected_class, 1, 0))), 3) AS folder_label_accuracy,
+  SUM(i.input_chars) AS input_chars,
+  SUM(i.input_tokens) AS input_tokens,
+  ROUND(SUM(i.input_tokens) / NULLIF(MAX(SUM(IFF(l.sampler = 'full', i.input_tokens, 0))) OVER (), 0), 3) AS token_share,
+  MAX(t.classify_elapsed_ms) AS classify_elapsed_ms,
+  ROUND(MAX(t.classify_elapsed_ms) / COUNT(*)) AS elapsed_ms_per_document
+FROM sampler_eval_labels l
+JOIN sampler_eval_inputs i
+  ON i.sampler = l.sampler AND i.document_id = l.document_id
+LEFT JOIN baseline b
+  ON b.document_id = l.document_id
+LEFT JOIN sampler_eval_expected e
+  ON STARTSWITH(i.file_path, e.path_prefix)
+LEFT JOIN timings t
+  ON t.sampler = l.sampler
+GROUP BY l.sampler
+ORDER BY input_tokens;
+
+-- Documents whose sampled label differs from the full-text label, to see what a sampler misses
+SELECT
+  l.sampler,
+  i.file_path,
+  i.document_type,
+  i.content_chars,
+  i.input_chars,
+  b.predicted_class AS full_text_class,
+  l.predicted_class AS sampled_class
+FROM sampler_eval_labels l
+JOIN sampler_eval_inputs i
+  ON i.sampler = l.sampler AND i.document_id = l.document_id
+JOIN sampler_eval_labels b
+  ON b.sampler = 'full' AND b.document_id = l.document_id
+WHERE l.predicted_class IS DISTINCT FROM b.predicted_class
+ORDER BY l.sampler, i.file_path;
+
+-- Clean up and restore the default result cache behavior
+DROP TABLE sampler_eval_queries;
+DROP TABLE sampler_eval_labels;
+DROP TABLE sampler_eval_inputs;
+DROP TABLE sampler_eval_expected;
+DROP TABLE sampler_eval_candidates;
+ALTER SESSION UNSET USE_CACHED_RESULT;
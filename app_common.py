@@ -0,0 +1,543 @@
+"""
+Shared state and helpers for the Document AI dashboard pages.
+
+Imported once per process: the data backend, the stylesheet and the cached queries used by more
+than one page. Page modules (app_pages/) import from here and are themselves imported only when
+their page is first opened, so charting and PDF libraries stay out of the cold start of pages
+that do not use them.
+"""
+import re
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from document_backend import get_backend
+from query_tracing import TracingBackend, events_to_jsonl, trace_cache
+
+# Snowflake when a Snowpark session is active, otherwise (or with DOC_APP_BACKEND=local) local DuckDB.
+# Every call is recorded in the query trace of the rerun that made it.
+backend = TracingBackend(get_backend())
+
+# Custom CSS for Snowflake branding, built once per process
+CUSTOM_CSS = """
+<style>
+/* Snowflake Brand Colors */
+:root {
+    --snowflake-blue: #29B5E8;
+    --mid-blue: #11567F;
+    --midnight: #000000;
+    --star-blue: #71D3DC;
+    --valencia-orange: #FF9F36;
+    --purple-moon: #7D44CF;
+    --first-light: #D45B90;
+    --windy-city: #8A999E;
+}
+
+/* Main title styling */
+.main .block-container h1 {
+    color: var(--mid-blue);
+    font-weight: 700;
+    font-size: 2.5rem;
+    margin-bottom: 2rem;
+    text-align: center;
+}
+
+/* Subheader styling */
+.main .block-container h2 {
+    color: var(--mid-blue);
+    font-weight: 600;
+    font-size: 1.8rem;
+    margin-top: 2rem;
+    margin-bottom: 1rem;
+    border-bottom: 2px solid var(--snowflake-blue);
+    padding-bottom: 0.5rem;
+}
+
+.main .block-container h3 {
+    color: var(--mid-blue);
+    font-weight: 500;
+    font-size: 1.3rem;
+    margin-bottom: 0.8rem;
+}
+
+/* Button styling */
+.stButton > button {
+    background-color: var(--snowflake-blue);
+    color: white;
+    border: none;
+    border-radius: 20px;
+    padding: 0.5rem 1.5rem;
+    font-weight: 600;
+    text-transform: uppercase;
+    letter-spacing: 0.5px;
+}
+
+.stButton > button:hover {
+    background-color: var(--mid-blue);
+    color: white;
+}
+
+/* Slide title styling */
+.slide-title {
+    background: linear-gradient(90deg, var(--snowflake-blue), var(--star-blue));
+    padding: 1rem;
+    border-radius: 8px;
+    margin: 2rem 0;
+}
+
+.slide-title h2 {
+    color: white;
+    margin: 0;
+    font-weight: 600;
+}
+
+/* Metadata styling with Snowflake branding */
+.metadata-item {
+    background: linear-gradient(135deg, #f8fafc 0%, #e0f2fe 100%);
+    border: 1px solid var(--star-blue);
+    border-radius: 8px;
+    padding: 1rem;
+    margin: 0.5rem 0;
+    font-size: 0.9rem;
+    color: var(--mid-blue);
+    box-shadow: 0 2px 4px rgba(41, 181, 232, 0.1);
+}
+
+.metadata-item strong {
+    color: var(--mid-blue);
+    font-weight: 600;
+}
+
+/* Professional header cards */
+.header-card {
+    background: linear-gradient(135deg, var(--snowflake-blue) 0%, var(--star-blue) 100%);
+    padding: 2rem;
+    border-radius: 12px;
+    margin-bottom: 2rem;
+    color: white;
+    box-shadow: 0 4px 12px rgba(41, 181, 232, 0.3);
+}
+
+.header-card h1 {
+    margin: 0;
+    font-size: 2.5rem;
+    font-weight: 700;
+    color: white;
+    text-align: center;
+}
+
+.header-card p {
+    margin: 0.5rem 0 0 0;
+    font-size: 1.1rem;
+    opacity: 0.9;
+    text-align: center;
+}
+
+/* Sidebar styling */
+.css-1d391kg {
+    background: linear-gradient(180deg, var(--mid-blue) 0%, var(--midnight) 100%);
+}
+
+.sidebar .sidebar-content {
+    background: linear-gradient(180deg, var(--mid-blue) 0%, var(--midnight) 100%);
+    color: white;
+}
+
+/* Section headers */
+.section-header-spaced {
+    color: white;
+    font-weight: 600;
+    margin: 1.5rem 0 1rem 0;
+    padding-bottom: 0.5rem;
+    border-bottom: 2px solid var(--snowflake-blue);
+}
+
+/* Metric cards with Snowflake styling */
+.metric-container {
+    background: linear-gradient(135deg, #ffffff 0%, #f0f9ff 100%);
+    border: 2px solid var(--star-blue);
+    border-radius: 12px;
+    padding: 1.5rem;
+    box-shadow: 0 2px 8px rgba(41, 181, 232, 0.15);
+    transition: all 0.3s ease;
+}
+
+.metric-container:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 4px 16px rgba(41, 181, 232, 0.25);
+    border-color: var(--snowflake-blue);
+}
+
+/* Status indicators with Snowflake colors */
+.status-success {
+    color: var(--mid-blue);
+    background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
+    border: 1px solid var(--star-blue);
+    padding: 0.4rem 1rem;
+    border-radius: 20px;
+    font-size: 0.85rem;
+    font-weight: 600;
+}
+
+.status-error {
+    color: var(--first-light);
+    background: linear-gradient(135deg, #fdf2f8 0%, #fce7f3 100%);
+    border: 1px solid var(--first-light);
+    padding: 0.4rem 1rem;
+    border-radius: 20px;
+    font-size: 0.85rem;
+    font-weight: 600;
+}
+
+/* Table styling with Snowflake theme */
+.dataframe {
+    border: 2px solid var(--star-blue);
+    border-radius: 12px;
+    overflow: hidden;
+    box-shadow: 0 2px 8px rgba(41, 181, 232, 0.1);
+}
+
+.dataframe th {
+    background: linear-gradient(90deg, var(--snowflake-blue), var(--star-blue));
+    color: white;
+    font-weight: 600;
+    padding: 1rem;
+    text-align: center;
+}
+
+.dataframe td {
+    padding: 0.8rem;
+    border-bottom: 1px solid var(--star-blue);
+    color: var(--mid-blue);
+}
+
+/* Expander styling */
+.streamlit-expanderHeader {
+    background: linear-gradient(135deg, var(--snowflake-blue) 0%, var(--star-blue) 100%);
+    border: none;
+    border-radius: 8px;
+    font-weight: 600;
+    color: white;
+}
+
+/* Success/Error message styling with Snowflake branding */
+.stSuccess {
+    background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
+    border: 1px solid var(--star-blue);
+    border-radius: 8px;
+    color: var(--mid-blue);
+}
+
+.stError {
+    background: linear-gradient(135deg, #fdf2f8 0%, #fce7f3 100%);
+    border: 1px solid var(--first-light);
+    border-radius: 8px;
+    color: var(--first-light);
+}
+
+.stWarning {
+    background: linear-gradient(135deg, #fffbeb 0%, #fef3c7 100%);
+    border: 1px solid var(--valencia-orange);
+    border-radius: 8px;
+    color: #92400e;
+}
+
+.stInfo {
+    background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
+    border: 1px solid var(--snowflake-blue);
+    border-radius: 8px;
+    color: var(--mid-blue);
+}
+
+/* Section dividers with Snowflake styling */
+hr {
+    border: none;
+    height: 2px;
+    background: linear-gradient(90deg, var(--star-blue) 0%, var(--snowflake-blue) 50%, var(--star-blue) 100%);
+    margin: 2rem 0;
+}
+
+/* Sidebar navigation selectbox styling */
+section[data-testid="stSidebar"] .stSelectbox > label {
+    font-weight: 600;
+    color: var(--mid-blue);
+    font-size: 0.9rem;
+    margin-bottom: 0.5rem;
+}
+
+section[data-testid="stSidebar"] .stSelectbox > div > div {
+    border-radius: 8px;
+    border: 2px solid var(--snowflake-blue);
+}
+
+/* Sidebar element spacing */
+section[data-testid="stSidebar"] .element-container {
+    margin-bottom: 0.5rem !important;
+}
+</style>
+"""
+
+
+def load_custom_css():
+    """Inject the stylesheet (Streamlit drops elements that a rerun does not render again)"""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────────────────────
+# Shared Queries
+# ─────────────────────────────────────────────────────────────
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=30)
+def get_pipeline_stats():
+    """Get overall pipeline statistics"""
+    try:
+        stats = backend.sql("""
+            SELECT 
+                COUNT(*) as total_documents,
+                COUNT(CASE WHEN status = 'parsed' THEN 1 END) as parsed_count,
+                COUNT(CASE WHEN status = 'classified' THEN 1 END) as classified_count,
+                COUNT(CASE WHEN status = 'classification_error' THEN 1 END) as error_count
+            FROM document_db.s3_documents.parsed_documents
+        """).to_pandas().iloc[0]
+        
+        # Get extraction stats
+        extraction_stats = backend.sql("""
+            SELECT COUNT(DISTINCT document_id) as extracted_count
+            FROM document_db.s3_documents.document_extractions
+        """).to_pandas().iloc[0]
+        
+        # Get chunk stats
+        chunk_stats = backend.sql("""
+            SELECT 
+                COUNT(*) as total_chunks,
+                COUNT(DISTINCT document_id) as chunked_documents
+            FROM document_db.s3_documents.document_chunks
+        """).to_pandas().iloc[0]
+        
+        return {
+            'total_documents': int(stats['TOTAL_DOCUMENTS']),
+            'parsed_count': int(stats['PARSED_COUNT']),
+            'classified_count': int(stats['CLASSIFIED_COUNT']),
+            'error_count': int(stats['ERROR_COUNT']),
+            'extracted_count': int(extraction_stats['EXTRACTED_COUNT']),
+            'total_chunks': int(chunk_stats['TOTAL_CHUNKS']),
+            'chunked_documents': int(chunk_stats['CHUNKED_DOCUMENTS'])
+        }
+    except Exception as e:
+        st.error(f"Error fetching pipeline stats: {e}")
+        return {}
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_document_classifications():
+    """Get document classification breakdown"""
+    try:
+        df = backend.sql("""
+            SELECT 
+                CASE 
+                    WHEN TRY_PARSE_JSON(document_class) IS NOT NULL THEN 
+                        TRY_PARSE_JSON(document_class):labels[0]::STRING
+                    ELSE document_class
+                END as document_class_clean,
+                COUNT(*) as count
+            FROM document_db.s3_documents.document_classifications
+            WHERE document_class NOT LIKE 'ERR_%' 
+              AND document_class != 'classification_error'
+            GROUP BY document_class_clean
+            ORDER BY count DESC
+        """).to_pandas()
+        return df
+    except Exception as e:
+        st.error(f"Error fetching classifications: {e}")
+        return pd.DataFrame()
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=30)
+def get_recent_documents(limit=10):
+    """Get recently processed documents"""
+    try:
+        df = backend.sql(f"""
+            SELECT 
+                dc.document_id,
+                dc.file_name,
+                dc.file_path,
+                CASE 
+                    WHEN TRY_PARSE_JSON(dc.document_class) IS NOT NULL THEN 
+                        TRY_PARSE_JSON(dc.document_class):labels[0]::STRING
+                    ELSE dc.document_class
+                END as document_class,
+                dc.classification_timestamp,
+                pd.status,
+                pd.document_type
+            FROM document_db.s3_documents.document_classifications dc
+            JOIN document_db.s3_documents.parsed_documents pd 
+                ON dc.document_id = pd.document_id
+            ORDER BY dc.classification_timestamp DESC
+            LIMIT {limit}
+        """).to_pandas()
+        return df
+    except Exception as e:
+        st.error(f"Error fetching recent documents: {e}")
+        return pd.DataFrame()
+
+# ─────────────────────────────────────────────────────────────
+# Document Q&A
+# ─────────────────────────────────────────────────────────────
+ANSWER_MODEL = 'mixtral-8x7b'
+
+# Common English words ignored when matching question terms against chunk text
+SEARCH_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'did', 'do', 'does', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our', 'that', 'the',
+    'their', 'there', 'this', 'to', 'was', 'we', 'were', 'what', 'when', 'where', 'which',
+    'who', 'why', 'will', 'with', 'you', 'your'
+}
+
+def tokenize_text(text):
+    """Lowercase word tokens without stopwords"""
+    return [t for t in re.findall(r"[a-z0-9]+", str(text).lower())
+            if t not in SEARCH_STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+def lexical_overlap_score(query_terms, text):
+    """Fraction of distinct query terms that appear in the text (0.0 - 1.0)"""
+    terms = set(query_terms)
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize_text(text))) / len(terms)
+
+def build_answer_prompt(question, context_docs):
+    """COMPLETE prompt answering the question from context chunks (dicts with file_name, document_class, chunk_text)"""
+    # Prepare context from documents
+    context_text = "\n\n".join([
+        f"Document: {doc['file_name']} (Class: {doc['document_class']})\nContent: {doc['chunk_text']}"
+        for doc in context_docs
+    ])
+    
+    return f"""You are a helpful document analysis assistant. Answer the user's question based on the provided document context.
+    
+    Question: {question}
+    
+    Document Context:
+    {context_text}
+    
+    Instructions:
+    - Provide a clear, concise answer based on the document content
+    - If the answer isn't in the documents, say so clearly
+    - Reference specific documents when relevant
+    - Be helpful and informative
+    
+    Answer:"""
+
+def get_ai_response(question, context_docs):
+    """Generate AI response using Snowflake Cortex"""
+    try:
+        # Use Snowflake Cortex Complete function
+        return backend.complete(ANSWER_MODEL, build_answer_prompt(question, context_docs))
+    except Exception as e:
+        st.error(f"Error generating AI response: {e}")
+        return "I apologize, but I encountered an error while processing your question. Please try again."
+
+# ─────────────────────────────────────────────────────────────
+# Extraction Reviews
+# ─────────────────────────────────────────────────────────────
+def save_extraction_reviews(reviews):
+    """Apply reviewed extractions with one MERGE and audit each change, in a single transaction.
+
+    reviews maps (document_id, attribute_name) to {'action': 'approve'|'deny', 'value', 'confidence'}.
+    """
+    rows = [
+        (document_id, attribute_name, review['action'], review['value'], review['confidence'])
+        for (document_id, attribute_name), review in reviews.items()
+    ]
+    if not rows:
+        return 0
+    values_params = [value for row in rows for value in row]
+    staged_reviews = f"""(
+        SELECT document_id, attribute_name, review_action, new_value::STRING AS new_value, new_confidence::FLOAT AS new_confidence
+        FROM (VALUES {", ".join("(?, ?, ?, ?, ?)" for _ in rows)})
+            AS v (document_id, attribute_name, review_action, new_value, new_confidence)
+    ) r"""
+    
+    # The audit insert reads the previous values, so it runs before the MERGE
+    audit_insert = f"""
+    INSERT INTO document_db.s3_documents.extraction_review_audit
+        (review_batch_id, document_id, attribute_name, review_action,
+         previous_value, previous_confidence, new_value, new_confidence)
+    SELECT ?, r.document_id, r.attribute_name, r.review_action,
+        e.attribute_value, e.confidence_score, r.new_value, r.new_confidence
+    FROM {staged_reviews}
+    LEFT JOIN document_db.s3_documents.document_extractions e
+        ON e.document_id = r.document_id AND e.attribute_name = r.attribute_name
+    """
+    merge = f"""
+    MERGE INTO document_db.s3_documents.document_extractions e
+    USING {staged_reviews}
+    ON e.document_id = r.document_id AND e.attribute_name = r.attribute_name
+    WHEN MATCHED THEN UPDATE SET
+        attribute_value = r.new_value,
+        confidence_score = r.new_confidence,
+        reviewed_timestamp = CURRENT_TIMESTAMP()
+    """
+    backend.execute_transaction([
+        (audit_insert, [str(uuid.uuid4())] + values_params),
+        (merge, values_params)
+    ])
+    return len(rows)
+
+# ─────────────────────────────────────────────────────────────
+# Query Trace
+# ─────────────────────────────────────────────────────────────
+def render_query_trace_panel(history):
+    """Render the sidebar query trace for this rerun and recent reruns"""
+    summary = history[-1]['summary']
+    events = history[-1]['events']
+    
+    with st.sidebar.expander("🔍 Query Trace", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Queries", summary['queries'])
+            st.metric("Cache Hits", summary['cache_hits'])
+        with col2:
+            st.metric("Query Time", f"{summary['query_ms']:.0f} ms")
+            st.metric("Cache Misses", summary['cache_misses'])
+        st.caption(f"Rerun {summary['rerun_id']} on {summary['page']}: {summary['rerun_ms']:.0f} ms total, "
+                   f"{summary['rows']:,} rows, {summary['bytes'] / 1024:,.0f} KB; "
+                   f"imports {summary['import_ms']:.0f} ms ({summary['cold_imports']} cold)")
+        
+        if events:
+            st.dataframe(
+                pd.DataFrame(events)[['seq', 'kind', 'name', 'duration_ms', 'rows', 'bytes', 'cache', 'fingerprint', 'sql']],
+                column_config={
+                    'seq': st.column_config.NumberColumn('#', format="%d"),
+                    'kind': 'Kind',
+                    'name': 'Name',
+                    'duration_ms': st.column_config.NumberColumn('ms', format="%.1f"),
+                    'rows': st.column_config.NumberColumn('Rows', format="%d"),
+                    'bytes': st.column_config.NumberColumn('Bytes', format="%d"),
+                    'cache': 'Cache',
+                    'fingerprint': 'Fingerprint',
+                    'sql': 'SQL'
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        st.markdown("**Recent reruns:**")
+        st.dataframe(
+            pd.DataFrame([h['summary'] for h in reversed(history)])[
+                ['rerun_id', 'page', 'rerun_ms', 'import_ms', 'queries', 'query_ms', 'cache_hits', 'cache_misses', 'errors']
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        st.download_button(
+            label="📥 Download Trace (JSONL)",
+            data=events_to_jsonl([e for h in history for e in h['events']]),
+            file_name=f"query_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+            mime="application/x-ndjson",
+            use_container_width=True
+        )
@@ -0,0 +1 @@
+"""Dashboard pages, one module per navigation entry, each exposing render()"""
@@ -0,0 +1,332 @@
+"""Analytics page: processing trends, success rates and attribute distributions"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from app_common import backend
+from query_tracing import trace_cache
+
+ROLLUP_COLUMNS = ['ROLLUP_DATE', 'METRIC', 'DIMENSION_VALUE', 'ITEM_COUNT', 'UPDATED_TIMESTAMP']
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_analytics_rollup():
+    """Daily counts from analytics_daily_rollup; every chart on the page is derived from this frame"""
+    try:
+        rollup = backend.sql("""
+            SELECT rollup_date, metric, dimension_value, item_count, updated_timestamp
+            FROM document_db.s3_documents.analytics_daily_rollup
+        """).to_pandas()
+    except Exception as e:
+        st.error(f"Error loading analytics rollup: {e}")
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    rollup['ROLLUP_DATE'] = pd.to_datetime(rollup['ROLLUP_DATE'])
+    return rollup
+
+
+def rollup_metric(rollup, metric):
+    """Rows of one rollup metric"""
+    return rollup[rollup['METRIC'] == metric]
+
+
+def summary_filter(document_class, start_date, end_date):
+    """WHERE clause and qmark params selecting summary rows by class and classification date"""
+    clauses = ["classification_timestamp >= ?::DATE", "classification_timestamp < DATEADD('day', 1, ?::DATE)"]
+    params = [str(start_date), str(end_date)]
+    if document_class:
+        clauses.append("document_classification = ?")
+        params.append(document_class)
+    return " AND ".join(clauses), params
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_summary_preview(document_class, start_date, end_date):
+    """Totals, top attributes and the first 500 rows of the filtered summary, all computed server-side"""
+    where_sql, params = summary_filter(document_class, start_date, end_date)
+    totals = backend.sql(f"""
+        SELECT 
+            COUNT(DISTINCT document_id) as total_documents,
+            COUNT(DISTINCT document_classification) as document_types,
+            COUNT(DISTINCT attribute_name) as unique_attributes,
+            COUNT(attribute_name) as total_extractions
+        FROM document_db.s3_documents.document_processing_summary
+        WHERE {where_sql}
+    """, params=params).to_pandas().iloc[0]
+    
+    attribute_counts = backend.sql(f"""
+        SELECT attribute_name, COUNT(*) as count
+        FROM document_db.s3_documents.document_processing_summary
+        WHERE {where_sql} AND attribute_name IS NOT NULL
+        GROUP BY attribute_name
+        ORDER BY count DESC
+        LIMIT 10
+    """, params=params).to_pandas()
+    
+    preview = backend.sql(f"""
+        SELECT 
+            document_id,
+            file_name,
+            document_type,
+            document_classification,
+            attribute_name,
+            attribute_value,
+            classification_timestamp,
+            extraction_timestamp
+        FROM document_db.s3_documents.document_processing_summary
+        WHERE {where_sql}
+        ORDER BY document_id, attribute_name
+        LIMIT 500
+    """, params=params).to_pandas()
+    return totals, attribute_counts, preview
+
+
+def export_summary(export_format, document_class, start_date, end_date):
+    """Unload the filtered summary to export_stage; returns the files with their download URLs"""
+    return backend.sql(
+        "CALL document_db.s3_documents.export_processing_summary(?, ?, ?, ?)",
+        params=[export_format, document_class, str(start_date), str(end_date)]
+    ).to_pandas()
+
+
+def render():
+    """Render the Analytics page"""
+    # Professional header for Analytics
+    st.markdown("""
+    <div class="header-card">
+        <h1>Analytics</h1>
+        <p>Detailed analytics and insights from your document pipeline using Snowflake data</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    rollup = get_analytics_rollup()
+    col_info, col_refresh = st.columns([4, 1])
+    with col_info:
+        if not rollup.empty:
+            st.caption(f"Daily rollup last updated {rollup['UPDATED_TIMESTAMP'].max()}")
+    with col_refresh:
+        if st.button("🔄 Refresh Rollup", use_container_width=True):
+            try:
+                backend.call_procedure("refresh_analytics_rollup")
+                get_analytics_rollup.clear()
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error refreshing rollup: {e}")
+    
+    # Processing timeline
+    st.subheader("Processing Timeline")
+    try:
+        classified = rollup_metric(rollup, 'classifications_by_class')
+        cutoff = pd.Timestamp.today().normalize() - pd.Timedelta(days=30)
+        timeline_data = (
+            classified[classified['ROLLUP_DATE'] >= cutoff]
+            .groupby('ROLLUP_DATE', as_index=False)['ITEM_COUNT'].sum()
+            .rename(columns={'ROLLUP_DATE': 'PROCESS_DATE', 'ITEM_COUNT': 'DOCUMENTS_PROCESSED'})
+            .sort_values('PROCESS_DATE')
+        )
+        
+        if not timeline_data.empty:
+            fig = px.line(
+                timeline_data,
+                x='PROCESS_DATE',
+                y='DOCUMENTS_PROCESSED',
+                title="Documents Processed Over Time (Last 30 Days)",
+                markers=True
+            )
+            fig.update_layout(
+                xaxis_title="Date",
+                yaxis_title="Documents Processed"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No timeline data available")
+    except Exception as e:
+        st.error(f"Error generating timeline: {e}")
+    
+    # Document type analysis
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Document Types")
+        try:
+            type_data = (
+                rollup_metric(rollup, 'documents_by_type')
+                .groupby('DIMENSION_VALUE', as_index=False)['ITEM_COUNT'].sum()
+                .rename(columns={'DIMENSION_VALUE': 'DOCUMENT_TYPE', 'ITEM_COUNT': 'COUNT'})
+                .sort_values('COUNT', ascending=False)
+            )
+            
+            if not type_data.empty:
+                fig = px.bar(
+                    type_data,
+                    x='DOCUMENT_TYPE',
+                    y='COUNT',
+                    title="Documents by File Type"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No document type data available")
+        except Exception as e:
+            st.error(f"Error generating type analysis: {e}")
+    
+    with col2:
+        st.subheader("Processing Success Rate")
+        status_counts = rollup_metric(rollup, 'documents_by_status').groupby('DIMENSION_VALUE')['ITEM_COUNT'].sum()
+        total = int(status_counts.sum())
+        success = int(status_counts.get('classified', 0))
+        errors = int(status_counts.get('classification_error', 0))
+        
+        if total > 0:
+            fig = go.Figure(data=[
+                go.Pie(
+                    labels=['Success', 'Errors', 'Pending'],
+                    values=[success, errors, total - success - errors],
+                    hole=0.4,
+                    marker_colors=['#2ca02c', '#d62728', '#ff7f0e']
+                )
+            ])
+            fig.update_layout(title="Processing Success Rate")
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No processing data available")
+    
+    # Extraction statistics
+    st.subheader("Extraction Statistics")
+    try:
+        # Extractions are keyed by (document_id, attribute_name), so each one is a distinct document
+        extraction_stats = (
+            rollup_metric(rollup, 'extractions_by_attribute')
+            .groupby('DIMENSION_VALUE', as_index=False)['ITEM_COUNT'].sum()
+            .rename(columns={'DIMENSION_VALUE': 'ATTRIBUTE_NAME', 'ITEM_COUNT': 'EXTRACTION_COUNT'})
+            .sort_values('EXTRACTION_COUNT', ascending=False)
+            .head(20)
+        )
+        extraction_stats['UNIQUE_DOCUMENTS'] = extraction_stats['EXTRACTION_COUNT']
+        
+        if not extraction_stats.empty:
+            fig = px.bar(
+                extraction_stats,
+                x='ATTRIBUTE_NAME',
+                y='EXTRACTION_COUNT',
+                title="Most Extracted Attributes",
+                hover_data=['UNIQUE_DOCUMENTS']
+            )
+            fig.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No extraction statistics available")
+    except Exception as e:
+        st.error(f"Error generating extraction stats: {e}")
+    
+    # Flattened Document Processing Summary
+    st.markdown("---")
+    st.subheader("📋 Complete Document Processing Summary")
+    st.markdown("*Each row represents one document-attribute pair (e.g., customer_count: 12,062, fiscal_year: 2025). JSON automatically flattened.*")
+    
+    # Filters apply to the statistics, the preview and the export
+    classified = rollup_metric(rollup, 'classifications_by_class')
+    class_options = sorted(classified['DIMENSION_VALUE'].unique())
+    first_date = classified['ROLLUP_DATE'].min().date() if not classified.empty else datetime.now().date() - timedelta(days=30)
+    
+    filter_col1, filter_col2, filter_col3 = st.columns([2, 2, 2])
+    with filter_col1:
+        selected_class = st.selectbox("Document Class", ["All Classes"] + class_options, key="summary_class")
+    with filter_col2:
+        start_date = st.date_input("Classified From", value=first_date, key="summary_start_date")
+    with filter_col3:
+        end_date = st.date_input("Classified To", value=datetime.now().date(), key="summary_end_date")
+    
+    if start_date > end_date:
+        st.error("Error: Start date must be before or equal to end date")
+        return
+    document_class = None if selected_class == "All Classes" else selected_class
+    
+    # Full export: COPY INTO runs in Snowflake and files are downloaded from the stage,
+    # so the rows never pass through the app
+    with st.expander("📦 Export Full Summary", expanded=False):
+        st.caption("Unloads every matching row to the export stage and returns presigned download links (valid for 1 hour)")
+        export_col1, export_col2 = st.columns([2, 1])
+        with export_col1:
+            export_format = st.radio(
+                "Format",
+                ["parquet", "csv"],
+                format_func=lambda f: "Parquet (Snappy)" if f == "parquet" else "CSV (gzip)",
+                horizontal=True,
+                key="summary_export_format"
+            )
+        with export_col2:
+            if st.button("📥 Export to Stage", type="primary", use_container_width=True):
+                try:
+                    with st.spinner("Exporting..."):
+                        st.session_state.summary_export = export_summary(export_format, document_class, start_date, end_date)
+                except Exception as e:
+                    st.error(f"Error exporting summary: {e}")
+        
+        export_files = st.session_state.get('summary_export')
+        if export_files is not None:
+            if export_files.empty:
+                st.info("No rows matched the filters")
+            else:
+                st.success(f"Exported {int(export_files['ROW_COUNT'].sum()):,} rows in {len(export_files)} file(s)")
+                for _, export_file in export_files.iterrows():
+                    st.markdown(
+                        f"[{export_file['FILE_NAME'].split('/')[-1]}]({export_file['DOWNLOAD_URL']}) "
+                        f"({export_file['ROW_COUNT']:,} rows, {export_file['FILE_SIZE'] / 1024:,.1f} KB)"
+                    )
+    
+    try:
+        totals, attribute_counts, flattened_df = get_summary_preview(document_class, start_date, end_date)
+        
+        if not flattened_df.empty:
+            # Display summary statistics
+            st.markdown("**Summary Statistics:**")
+            stats_col1, stats_col2, stats_col3, stats_col4 = st.columns(4)
+            
+            with stats_col1:
+                st.metric("Total Documents", int(totals['TOTAL_DOCUMENTS']))
+            with stats_col2:
+                st.metric("Document Types", int(totals['DOCUMENT_TYPES']))
+            with stats_col3:
+                st.metric("Unique Attributes", int(totals['UNIQUE_ATTRIBUTES']))
+            with stats_col4:
+                st.metric("Total Extractions", int(totals['TOTAL_EXTRACTIONS']))
+            
+            # Display the flattened table
+            st.markdown(f"**Preview (first {len(flattened_df)} rows; export for the full summary):**")
+            st.dataframe(
+                flattened_df,
+                use_container_width=True,
+                column_config={
+                    "DOCUMENT_ID": st.column_config.TextColumn("Document ID", width="medium"),
+                    "FILE_NAME": st.column_config.TextColumn("File Name", width="large"),
+                    "DOCUMENT_TYPE": st.column_config.TextColumn("File Type", width="small"),
+                    "DOCUMENT_CLASSIFICATION": st.column_config.TextColumn("Classification", width="medium"),
+                    "ATTRIBUTE_NAME": st.column_config.TextColumn("Attribute", width="medium"),
+                    "ATTRIBUTE_VALUE": st.column_config.TextColumn("Value", width="large"),
+                    "CLASSIFICATION_TIMESTAMP": st.column_config.DatetimeColumn("Classified", width="medium"),
+                    "EXTRACTION_TIMESTAMP": st.column_config.DatetimeColumn("Extracted", width="medium")
+                },
+                hide_index=True
+            )
+            
+            # Show attribute distribution
+            if not attribute_counts.empty:
+                st.markdown("**Attribute Distribution:**")
+                fig = px.bar(
+                    attribute_counts,
+                    x='COUNT',
+                    y='ATTRIBUTE_NAME',
+                    orientation='h',
+                    title="Top 10 Most Extracted Attributes",
+                    labels={'COUNT': 'Count', 'ATTRIBUTE_NAME': 'Attribute Name'}
+                )
+                fig.update_layout(height=400)
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No flattened document processing data available")
+    except Exception as e:
+        st.error(f"Error fetching flattened document data: {e}")
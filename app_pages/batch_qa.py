@@ -0,0 +1,324 @@
+"""Batch Q&A page: the same questions answered for every document in a class, concurrently"""
+import contextvars
+import itertools
+import random
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import streamlit as st
+
+from app_common import (
+    ANSWER_MODEL, backend, build_answer_prompt, get_document_classifications, lexical_overlap_score, tokenize_text
+)
+from query_tracing import trace_cache
+
+# Chunks of a document used as the context of each answer
+BATCH_CONTEXT_CHUNKS = 4
+RETRY_BACKOFF_SECONDS = 1.0  # First retry delay; doubles per attempt, with jitter
+RESULT_INSERT_BATCH = 100  # Result rows written to batch_qa_results per INSERT
+CHUNK_LOAD_BATCH = 50  # Documents whose chunks are loaded per query
+RESULTS_REFRESH_EVERY = 25  # Completed results between redraws of the live results table
+IN_FLIGHT_PER_WORKER = 2  # Answers queued per worker; the rest are not built until these finish
+RESULT_COLUMNS = [
+    'DOCUMENT_ID', 'FILE_NAME', 'DOCUMENT_CLASS', 'QUESTION', 'ANSWER', 'STATUS', 'ATTEMPTS', 'ERROR_MESSAGE', 'ELAPSED_MS'
+]
+DOCUMENT_CLASS_CLEAN = """
+    CASE
+        WHEN TRY_PARSE_JSON(document_class) IS NOT NULL THEN
+            TRY_PARSE_JSON(document_class):labels[0]::STRING
+        ELSE document_class
+    END"""
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_class_documents(document_class):
+    """Documents of one class"""
+    return backend.sql(f"""
+        SELECT document_id, file_name, {DOCUMENT_CLASS_CLEAN} as document_class
+        FROM document_db.s3_documents.document_classifications
+        WHERE {DOCUMENT_CLASS_CLEAN} = ?
+        ORDER BY file_name
+    """, params=[document_class]).to_pandas()
+
+
+def get_chunks_for_documents(document_ids):
+    """Chunks of a batch of documents.
+
+    Not cached: a run loads its documents CHUNK_LOAD_BATCH at a time as its answers are queued, so a
+    large class is never held in memory at once.
+    """
+    return backend.sql(f"""
+        SELECT document_id, chunk_index, chunk_text
+        FROM document_db.s3_documents.document_chunks
+        WHERE document_id IN ({', '.join('?' for _ in document_ids)})
+        ORDER BY document_id, chunk_index
+    """, params=list(document_ids)).to_pandas()
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=30)
+def get_recent_runs():
+    """Recent batch runs with their result counts"""
+    return backend.sql("""
+        SELECT
+            run_id,
+            COUNT(*) as results,
+            SUM(IFF(status = 'failed', 1, 0)) as failed,
+            MAX(answered_timestamp) as finished
+        FROM document_db.s3_documents.batch_qa_results
+        GROUP BY run_id
+        ORDER BY finished DESC
+        LIMIT 20
+    """).to_pandas()
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=300)
+def get_run_results(run_id):
+    """Stored results of one batch run"""
+    return backend.sql(f"""
+        SELECT {', '.join(RESULT_COLUMNS)}
+        FROM document_db.s3_documents.batch_qa_results
+        WHERE run_id = ?
+        ORDER BY file_name, question
+    """, params=[run_id]).to_pandas()
+
+
+def parse_questions(uploaded_file):
+    """Questions from an uploaded CSV: its QUESTION column, else its first column"""
+    questions_df = pd.read_csv(uploaded_file)
+    questions_df.columns = [str(c).strip().upper() for c in questions_df.columns]
+    column = 'QUESTION' if 'QUESTION' in questions_df.columns else questions_df.columns[0]
+    return questions_df[column].dropna().astype(str).tolist()
+
+
+def select_context(question, chunks, limit=BATCH_CONTEXT_CHUNKS):
+    """The document's chunks that best match the question by term overlap, in document order"""
+    query_terms = tokenize_text(question)
+    scored = [(lexical_overlap_score(query_terms, chunk['CHUNK_TEXT']), chunk) for _, chunk in chunks.iterrows()]
+    best = sorted(scored, key=lambda item: item[0], reverse=True)[:limit]
+    return [chunk for _, chunk in sorted(best, key=lambda item: item[1]['CHUNK_INDEX'])]
+
+
+def answer_with_retries(question, document, context_docs, max_retries):
+    """COMPLETE with up to max_retries retries and jittered exponential backoff.
+
+    Makes no Streamlit calls, so it can run on a worker thread. Returns one result row.
+    """
+    start = time.perf_counter()
+    result = {
+        'DOCUMENT_ID': document['DOCUMENT_ID'],
+        'FILE_NAME': document['FILE_NAME'],
+        'DOCUMENT_CLASS': document['DOCUMENT_CLASS'],
+        'QUESTION': question,
+        'ANSWER': None,
+        'STATUS': 'failed',
+        'ERROR_MESSAGE': None,
+    }
+    prompt = build_answer_prompt(question, context_docs)
+    for attempt in range(1, max_retries + 2):
+        result['ATTEMPTS'] = attempt
+        try:
+            result['ANSWER'] = backend.complete(ANSWER_MODEL, prompt)
+            result['STATUS'], result['ERROR_MESSAGE'] = 'answered', None
+            break
+        except Exception as e:
+            result['ERROR_MESSAGE'] = str(e)[:1000]
+            if attempt <= max_retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    result['ELAPSED_MS'] = int((time.perf_counter() - start) * 1000)
+    return result
+
+
+def save_results(run_id, results):
+    """Insert result rows into batch_qa_results"""
+    for start in range(0, len(results), RESULT_INSERT_BATCH):
+        batch = results[start:start + RESULT_INSERT_BATCH]
+        backend.sql(f"""
+            INSERT INTO document_db.s3_documents.batch_qa_results
+                (run_id, document_id, file_name, document_class, question, answer, status, attempts,
+                 error_message, elapsed_ms, model_name)
+            VALUES {', '.join('(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)' for _ in batch)}
+        """, params=[
+            value
+            for result in batch
+            for value in [run_id] + [result[column] for column in RESULT_COLUMNS] + [ANSWER_MODEL]
+        ]).collect()
+
+
+def iter_answer_tasks(questions, documents):
+    """(question, document, context) for every question and document, built lazily.
+
+    Chunks are loaded CHUNK_LOAD_BATCH documents at a time, when the first of their answers is queued.
+    """
+    for start in range(0, len(documents), CHUNK_LOAD_BATCH):
+        batch = documents.iloc[start:start + CHUNK_LOAD_BATCH]
+        chunks = get_chunks_for_documents(tuple(batch['DOCUMENT_ID']))
+        chunks_by_document = {document_id: group for document_id, group in chunks.groupby('DOCUMENT_ID')}
+        for _, document in batch.iterrows():
+            document_chunks = chunks_by_document.get(document['DOCUMENT_ID'], chunks.iloc[0:0])
+            for question in questions:
+                context_docs = [
+                    {'file_name': document['FILE_NAME'], 'document_class': document['DOCUMENT_CLASS'],
+                     'chunk_text': chunk['CHUNK_TEXT']}
+                    for chunk in select_context(question, document_chunks)
+                ]
+                yield question, document, context_docs
+
+
+def run_batch(questions, documents, concurrency, max_retries, progress, results_table):
+    """Answer every question for every document on a bounded thread pool, streaming results to the page.
+
+    At most IN_FLIGHT_PER_WORKER answers per worker are queued at a time, so results stream from the
+    first documents while later chunks are not loaded yet. Results are written to batch_qa_results as
+    they complete, RESULT_INSERT_BATCH rows at a time, and the live table is redrawn every
+    RESULTS_REFRESH_EVERY results.
+    """
+    run_id = str(uuid.uuid4())
+    total = len(questions) * len(documents)
+    tasks = iter_answer_tasks(questions, documents)
+
+    results, unsaved, in_flight = [], [], set()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            for question, document, context_docs in itertools.islice(
+                tasks, concurrency * IN_FLIGHT_PER_WORKER - len(in_flight)
+            ):
+                # Each worker runs in a copy of this context, so the rerun's query trace records its calls
+                in_flight.add(executor.submit(
+                    contextvars.copy_context().run, answer_with_retries, question, document, context_docs, max_retries
+                ))
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                unsaved.append(result)
+                if len(unsaved) >= RESULT_INSERT_BATCH:
+                    save_results(run_id, unsaved)
+                    unsaved = []
+                if len(results) % RESULTS_REFRESH_EVERY == 0 or len(results) == total:
+                    results_table.dataframe(
+                        pd.DataFrame(results, columns=RESULT_COLUMNS), use_container_width=True, hide_index=True
+                    )
+            progress.progress(len(results) / total, text=f"{len(results)} of {total} answered")
+
+    save_results(run_id, unsaved)
+    return run_id, pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+
+def render():
+    """Render the Batch Q&A page"""
+    st.markdown("""
+    <div class="header-card">
+        <h1>Batch Q&A</h1>
+        <p>Answer a list of questions for every document in a class, with concurrent Cortex COMPLETE calls</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Questions
+    st.subheader("Questions")
+    uploaded_file = st.file_uploader("Upload a CSV of questions (QUESTION column, or the first column)", type=["csv"])
+    if uploaded_file is not None:
+        try:
+            questions = parse_questions(uploaded_file)
+        except Exception as e:
+            st.error(f"Error reading questions: {e}")
+            questions = []
+    else:
+        questions_df = st.data_editor(
+            pd.DataFrame({'QUESTION': ["What is the termination clause?", "Does the agreement renew automatically?"]}),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            key="batch_questions"
+        )
+        questions = questions_df['QUESTION'].dropna().astype(str).tolist()
+    questions = [question.strip() for question in questions if question.strip()]
+
+    # Documents
+    st.subheader("Documents")
+    class_df = get_document_classifications()
+    if class_df.empty:
+        st.warning("No classified documents found in the pipeline")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        document_class = st.selectbox("Document class:", class_df['DOCUMENT_CLASS_CLEAN'].tolist())
+    class_documents = get_class_documents(document_class)
+    with col2:
+        selected_files = st.multiselect(
+            "Documents (all in the class when empty):",
+            class_documents['FILE_NAME'].tolist()
+        )
+    documents = class_documents[class_documents['FILE_NAME'].isin(selected_files)] if selected_files else class_documents
+
+    # Run settings
+    col1, col2 = st.columns(2)
+    with col1:
+        concurrency = st.slider(
+            "Concurrent requests:",
+            min_value=1,
+            max_value=16,
+            value=4,
+            help="COMPLETE calls in flight at once; raise it for throughput, lower it if requests are throttled"
+        )
+    with col2:
+        max_retries = st.number_input(
+            "Retries per question:",
+            min_value=0,
+            max_value=5,
+            value=2,
+            help="Failed calls are retried with exponential backoff"
+        )
+
+    total_calls = len(questions) * len(documents)
+    st.caption(f"{len(questions)} question(s) × {len(documents)} document(s) = {total_calls} COMPLETE call(s)")
+
+    if st.button("▶️ Run Batch", type="primary", disabled=total_calls == 0):
+        progress = st.progress(0.0, text="Starting...")
+        results_table = st.empty()
+        try:
+            run_id, results = run_batch(
+                questions, documents, concurrency, int(max_retries), progress, results_table
+            )
+            get_recent_runs.clear()
+            st.session_state.batch_qa_run = run_id
+            failed = int((results['STATUS'] == 'failed').sum())
+            st.success(f"Run {run_id} finished: {len(results) - failed} answered, {failed} failed")
+        except Exception as e:
+            st.error(f"Error running batch: {e}")
+
+    # Results of this or a previous run
+    st.markdown("---")
+    st.subheader("Results")
+    runs = get_recent_runs()
+    if runs.empty:
+        st.info("No batch runs yet")
+        return
+
+    run_ids = runs['RUN_ID'].tolist()
+    current_run = st.session_state.get('batch_qa_run')
+    run_id = st.selectbox(
+        "Run:",
+        run_ids,
+        index=run_ids.index(current_run) if current_run in run_ids else 0,
+        format_func=lambda r: (
+            f"{runs.loc[runs['RUN_ID'] == r, 'FINISHED'].iloc[0]} · "
+            f"{int(runs.loc[runs['RUN_ID'] == r, 'RESULTS'].iloc[0])} results ({r[:8]})"
+        )
+    )
+    results = get_run_results(run_id)
+    st.dataframe(results, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📥 Download Results CSV",
+        data=results.to_csv(index=False),
+        file_name=f"batch_qa_{run_id[:8]}.csv",
+        mime="text/csv"
+    )
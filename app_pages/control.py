@@ -0,0 +1,181 @@
+"""Pipeline Control page: run the pipeline procedures and manage tasks"""
+import streamlit as st
+
+from app_common import backend
+
+
+def render():
+    """Render the Pipeline Control page"""
+    # Professional header for Pipeline Control
+    st.markdown("""
+    <div class="header-card">
+        <h1>Pipeline Control</h1>
+        <p>Monitor and control your document processing pipeline powered by Snowflake</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Pipeline procedures
+    st.subheader("Manual Pipeline Execution")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        if st.button("Parse Documents", use_container_width=True):
+            with st.spinner("Running parse procedure..."):
+                try:
+                    result = backend.call_procedure("parse_new_documents")
+                    st.success(f"Parse completed: {result}")
+                except Exception as e:
+                    st.error(f"Parse failed: {e}")
+    
+    with col2:
+        if st.button("Classify Documents", use_container_width=True):
+            with st.spinner("Running classification procedure..."):
+                try:
+                    result = backend.call_procedure("classify_parsed_documents")
+                    st.success(f"Classification completed: {result}")
+                except Exception as e:
+                    st.error(f"Classification failed: {e}")
+    
+    with col3:
+        if st.button("Extract Attributes", use_container_width=True):
+            with st.spinner("Running extraction procedure..."):
+                try:
+                    result = backend.call_procedure("extract_attributes_for_classified_documents")
+                    st.success(f"Extraction completed: {result}")
+                except Exception as e:
+                    st.error(f"Extraction failed: {e}")
+    
+    with col4:
+        if st.button("Chunk Documents", use_container_width=True):
+            with st.spinner("Running chunking procedure..."):
+                try:
+                    result = backend.call_procedure("chunk_classified_documents")
+                    st.success(f"Chunking completed: {result}")
+                except Exception as e:
+                    st.error(f"Chunking failed: {e}")
+    
+    # Additional pipeline operations
+    st.markdown("**Additional Operations:**")
+    col5, col6, col7, col8 = st.columns(4)
+    
+    with col5:
+        if st.button("Re-chunk Changed Profiles", use_container_width=True):
+            with st.spinner("Re-chunking documents with changed chunking profiles..."):
+                try:
+                    result = backend.call_procedure("rechunk_stale_documents", 25)
+                    st.success(f"{result}")
+                except Exception as e:
+                    st.error(f"Re-chunking failed: {e}")
+    
+    with col7:
+        if st.button("Backfill Changed Attributes", use_container_width=True):
+            with st.spinner("Re-extracting attributes with new or changed prompts..."):
+                try:
+                    result = backend.call_procedure("backfill_changed_attributes", 50)
+                    st.success(f"{result}")
+                except Exception as e:
+                    st.error(f"Attribute backfill failed: {e}")
+    
+    with col6:
+        if st.button("Run Full Pipeline", use_container_width=True):
+            with st.spinner("Running complete pipeline..."):
+                try:
+                    # Run all procedures in sequence
+                    parse_result = backend.call_procedure("parse_new_documents")
+                    classify_result = backend.call_procedure("classify_parsed_documents")
+                    extract_result = backend.call_procedure("extract_attributes_for_classified_documents")
+                    chunk_result = backend.call_procedure("chunk_classified_documents")
+                    # Refresh the summary now rather than waiting for its target lag
+                    backend.sql("ALTER DYNAMIC TABLE document_db.s3_documents.document_processing_summary REFRESH").collect()
+                    
+                    st.success("✅ Full pipeline completed successfully!")
+                    st.info(f"Parse: {parse_result}")
+                    st.info(f"Classify: {classify_result}")
+                    st.info(f"Extract: {extract_result}")
+                    st.info(f"Chunk: {chunk_result}")
+                    st.info("📋 Flattened summary refreshed with new extractions")
+                except Exception as e:
+                    st.error(f"Pipeline execution failed: {e}")
+    
+    st.markdown("---")
+    
+    # Task status
+    st.subheader("Task Status")
+    try:
+        # Use SHOW TASKS instead of INFORMATION_SCHEMA.TASK_HISTORY() to avoid session context issues
+        task_status = backend.sql("""
+            SHOW TASKS LIKE '%document%' IN SCHEMA document_db.s3_documents
+        """).to_pandas()
+        
+        if not task_status.empty:
+            # Select relevant columns for display
+            display_columns = ['name', 'state', 'condition', 'schedule', 'warehouse']
+            available_columns = [col for col in display_columns if col in task_status.columns]
+            
+            if available_columns:
+                st.dataframe(
+                    task_status[available_columns], 
+                    use_container_width=True,
+                    column_config={
+                        "name": st.column_config.TextColumn("Task Name", width="large"),
+                        "state": st.column_config.TextColumn("State", width="small"),
+                        "condition": st.column_config.TextColumn("Condition", width="medium"),
+                        "schedule": st.column_config.TextColumn("Schedule", width="medium"),
+                        "warehouse": st.column_config.TextColumn("Warehouse", width="small")
+                    }
+                )
+            else:
+                st.dataframe(task_status, use_container_width=True)
+        else:
+            st.info("No document-related tasks found")
+    except Exception as e:
+        st.error(f"Error fetching task status: {e}")
+        # Fallback: Try to show all tasks in the schema
+        try:
+            st.info("Attempting to show all tasks in the schema...")
+            all_tasks = backend.sql("SHOW TASKS IN SCHEMA document_db.s3_documents").to_pandas()
+            if not all_tasks.empty:
+                st.dataframe(all_tasks, use_container_width=True)
+            else:
+                st.info("No tasks found in document_db.s3_documents schema")
+        except Exception as fallback_error:
+            st.error(f"Fallback query also failed: {fallback_error}")
+    
+    st.markdown("---")
+    
+    # Stream status
+    st.subheader("Stream Status")
+    try:
+        stream_info = backend.sql("""
+            SELECT COUNT(*) as pending_files
+            FROM document_db.s3_documents.new_documents_stream
+        """).to_pandas().iloc[0]
+        
+        st.metric("Pending Files in Stream", int(stream_info['PENDING_FILES']))
+    except Exception as e:
+        st.error(f"Error fetching stream status: {e}")
+    
+    # Parse work queue (backlog drained in micro-batches by parse_documents_task)
+    st.subheader("Parse Queue Status")
+    try:
+        queue_info = backend.sql("""
+            SELECT 
+                COUNT(CASE WHEN status = 'pending' THEN 1 END) as pending_count,
+                COUNT(CASE WHEN status = 'processing' THEN 1 END) as processing_count,
+                COUNT(CASE WHEN status = 'done' THEN 1 END) as done_count,
+                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_count
+            FROM document_db.s3_documents.parse_work_queue
+        """).to_pandas().iloc[0]
+        
+        q_col1, q_col2, q_col3, q_col4 = st.columns(4)
+        with q_col1:
+            st.metric("Queued", int(queue_info['PENDING_COUNT']), help="Files waiting for a parse batch")
+        with q_col2:
+            st.metric("In Progress", int(queue_info['PROCESSING_COUNT']), help="Files claimed by the running batch")
+        with q_col3:
+            st.metric("Parsed", int(queue_info['DONE_COUNT']))
+        with q_col4:
+            st.metric("Failed", int(queue_info['FAILED_COUNT']), help="Files that failed parsing 3 times")
+    except Exception as e:
+        st.error(f"Error fetching parse queue status: {e}")
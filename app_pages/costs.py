@@ -0,0 +1,482 @@
+"""Cost Monitoring page: AI function and serverless task credits, per document and over time"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from app_common import backend
+from query_tracing import trace_cache
+
+COST_CACHE_COLUMNS = ['USAGE_DATE', 'SOURCE', 'SERVICE_TYPE', 'NAME', 'CREDITS', 'TOKENS', 'CALL_COUNT', 'CACHED_TIMESTAMP']
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=600)
+def get_cost_daily_cache():
+    """All cached daily usage rows; every usage panel filters this one frame by date"""
+    try:
+        cost_cache = backend.sql("""
+            SELECT usage_date, source, service_type, name, credits, tokens, call_count, cached_timestamp
+            FROM document_db.s3_documents.cost_daily_cache
+        """).to_pandas()
+    except Exception as e:
+        st.error(f"Error loading cost cache: {str(e)}")
+        return pd.DataFrame(columns=COST_CACHE_COLUMNS)
+    cost_cache['USAGE_DATE'] = pd.to_datetime(cost_cache['USAGE_DATE']).dt.date
+    for column in ('CREDITS', 'TOKENS', 'CALL_COUNT'):
+        cost_cache[column] = pd.to_numeric(cost_cache[column]).fillna(0)
+    return cost_cache
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=600)
+def get_document_costs():
+    """Attributed credits of every document; the per-document panels filter this one frame by date"""
+    document_costs = backend.sql("""
+        SELECT 
+            document_id,
+            file_name,
+            COALESCE(document_class, 'unclassified') as document_class,
+            document_type,
+            page_count,
+            file_size / 1048576 as file_size_mb,
+            total_credits,
+            parse_credits,
+            classify_credits,
+            extract_credits,
+            credits_per_page,
+            DATE(parse_timestamp) as parse_date
+        FROM document_db.s3_documents.document_costs
+    """).to_pandas()
+    document_costs['PARSE_DATE'] = pd.to_datetime(document_costs['PARSE_DATE']).dt.date
+    for column in ('PAGE_COUNT', 'FILE_SIZE_MB', 'TOTAL_CREDITS', 'PARSE_CREDITS', 'CLASSIFY_CREDITS',
+                   'EXTRACT_CREDITS', 'CREDITS_PER_PAGE'):
+        document_costs[column] = pd.to_numeric(document_costs[column])
+    return document_costs
+
+
+def render():
+    """Render the Cost Monitoring page"""
+    st.markdown("""
+    <div class="header-card">
+        <h1>Cost Monitoring Dashboard</h1>
+        <p>Track and analyze Cortex AI services and serverless task costs</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Date Range Filter
+    st.subheader("Date Range Filter")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    
+    with col1:
+        start_date = st.date_input(
+            "Start Date",
+            value=datetime.now() - timedelta(days=30),
+            max_value=datetime.now().date(),
+            help="Select the start date for cost analysis"
+        )
+    
+    with col2:
+        end_date = st.date_input(
+            "End Date",
+            value=datetime.now().date(),
+            max_value=datetime.now().date(),
+            help="Select the end date for cost analysis"
+        )
+    
+    with col3:
+        st.write("")  # Spacing
+        st.write("")  # Spacing
+        if st.button("Refresh Cost Data", type="primary"):
+            try:
+                with st.spinner("Pulling new usage from ACCOUNT_USAGE..."):
+                    backend.call_procedure("refresh_cost_daily_cache", 3)
+            except Exception as e:
+                st.error(f"Error refreshing cost cache: {str(e)}")
+            get_cost_daily_cache.clear()
+            st.rerun()
+    
+    # Validate date range
+    if start_date > end_date:
+        st.error("Error: Start date must be before or equal to end date")
+        st.stop()
+    
+    cost_cache = get_cost_daily_cache()
+    if not cost_cache.empty:
+        st.caption(f"Usage cached from ACCOUNT_USAGE, last refreshed {cost_cache['CACHED_TIMESTAMP'].max()}")
+    usage = cost_cache[(cost_cache['USAGE_DATE'] >= start_date) & (cost_cache['USAGE_DATE'] <= end_date)]
+    metering = usage[usage['SOURCE'] == 'metering']
+    serverless_usage = metering[metering['SERVICE_TYPE'] == 'SERVERLESS_TASK']
+    ai_services_usage = metering[metering['SERVICE_TYPE'] == 'AI_SERVICES']
+    
+    st.markdown("---")
+    
+    # Summary Metrics Section
+    st.subheader("Cost Summary")
+    
+    try:
+        # Serverless compute and AI services credits for the document pipeline only
+        if not metering.empty:
+            serverless_credits = serverless_usage['CREDITS'].sum()
+            ai_services_credits = ai_services_usage['CREDITS'].sum()
+            total_credits = serverless_credits + ai_services_credits
+            
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric(
+                    "Total Serverless Compute Cost", 
+                    f"{serverless_credits:.2f} credits",
+                    help="Total credits for document pipeline serverless tasks only"
+                )
+            with col2:
+                st.metric(
+                    "Total AI Services Cost", 
+                    f"{ai_services_credits:.2f} credits",
+                    help="Total credits for all AI Services including Cortex AI functions"
+                )
+            with col3:
+                st.metric(
+                    "Combined Total Cost", 
+                    f"{total_credits:.2f} credits",
+                    help="Sum of document pipeline serverless tasks + AI functions costs"
+                )
+        else:
+            st.info("No cost data available for the selected date range")
+            
+    except Exception as e:
+        st.error(f"Error fetching cost summary: {str(e)}")
+        st.info("Note: refresh_cost_daily_cache reads ACCOUNT_USAGE, which requires ACCOUNTADMIN privileges or proper grants")
+    
+    st.markdown("---")
+    
+    # 1. Serverless Task Costs (Document Pipeline Tasks Only)
+    st.subheader("Serverless Task Costs (Document Pipeline)")
+    
+    try:
+        serverless_df = (
+            serverless_usage.groupby(['NAME', 'USAGE_DATE'], as_index=False)['CREDITS'].sum()
+            .rename(columns={'NAME': 'TASK_NAME', 'CREDITS': 'CREDITS_USED'})
+            .sort_values(['USAGE_DATE', 'CREDITS_USED'], ascending=[False, False])
+        )
+        
+        if not serverless_df.empty:
+            # Summary metrics
+            total_task_credits = serverless_df['CREDITS_USED'].sum()
+            unique_tasks = serverless_df['TASK_NAME'].nunique()
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total Serverless Task Credits", f"{total_task_credits:.2f}")
+            with col2:
+                st.metric("Unique Tasks", f"{unique_tasks}")
+            
+            # Detailed table
+            st.dataframe(
+                serverless_df,
+                column_config={
+                    'TASK_NAME': 'Task Name',
+                    'USAGE_DATE': st.column_config.DateColumn('Date'),
+                    'CREDITS_USED': st.column_config.NumberColumn('Credits Used', format="%.2f")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No serverless task cost data available for the selected date range")
+    except Exception as e:
+        st.error(f"Error fetching serverless task costs: {str(e)}")
+    
+    st.markdown("---")
+    
+    # 2. Cortex Function Usage from CORTEX_FUNCTIONS_USAGE_HISTORY  
+    st.subheader("Cortex Function Token Credits (AI_PARSE_DOCUMENT, AI_CLASSIFY, AI_EXTRACT)")
+    
+    try:
+        cortex_functions_df = (
+            usage[usage['SOURCE'] == 'cortex_functions']
+            .groupby(['NAME', 'USAGE_DATE'], as_index=False)[['CREDITS', 'CALL_COUNT']].sum()
+            .rename(columns={'NAME': 'FUNCTION_NAME', 'CREDITS': 'TOKEN_CREDITS'})
+            .sort_values(['USAGE_DATE', 'TOKEN_CREDITS'], ascending=[False, False])
+        )
+        
+        if not cortex_functions_df.empty:
+            # Overall Summary metrics
+            total_token_credits = cortex_functions_df['TOKEN_CREDITS'].sum()
+            total_calls = cortex_functions_df['CALL_COUNT'].sum()
+            
+            # Function-specific subtotals
+            parse_credits = cortex_functions_df[cortex_functions_df['FUNCTION_NAME'].str.upper().str.contains('PARSE_DOCUMENT')]['TOKEN_CREDITS'].sum()
+            classify_credits = cortex_functions_df[cortex_functions_df['FUNCTION_NAME'].str.upper().str.contains('CLASSIFY')]['TOKEN_CREDITS'].sum()
+            extract_credits = cortex_functions_df[cortex_functions_df['FUNCTION_NAME'].str.upper().str.contains('EXTRACT')]['TOKEN_CREDITS'].sum()
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total Function Calls", f"{total_calls:,.0f}")
+            with col2:
+                st.metric("Total Token Credits", f"{total_token_credits:.2f}")
+            
+            # Subtotals by function
+            st.markdown("**Subtotals by Function:**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("AI_PARSE_DOCUMENT", f"{parse_credits:.2f}")
+            with col2:
+                st.metric("AI_CLASSIFY", f"{classify_credits:.2f}")
+            with col3:
+                st.metric("AI_EXTRACT", f"{extract_credits:.2f}")
+            
+            # Detailed table
+            st.dataframe(
+                cortex_functions_df,
+                column_config={
+                    'FUNCTION_NAME': 'Function',
+                    'USAGE_DATE': st.column_config.DateColumn('Date'),
+                    'TOKEN_CREDITS': st.column_config.NumberColumn('Token Credits', format="%.2f"),
+                    'CALL_COUNT': st.column_config.NumberColumn('Calls', format="%d")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No Cortex function token usage data available for the selected date range")
+    except Exception as e:
+        st.error(f"Error fetching Cortex function usage data: {str(e)}")
+    
+    st.markdown("---")
+    
+    # 3. Cortex Search Costs (Document Pipeline)
+    st.subheader("Cortex Search Service Costs (Document Pipeline)")
+    
+    try:
+        search_df = (
+            usage[usage['SOURCE'] == 'cortex_search']
+            .groupby(['NAME', 'USAGE_DATE'], as_index=False)[['TOKENS', 'CREDITS']].sum()
+            .rename(columns={'NAME': 'SERVICE_NAME', 'TOKENS': 'TOTAL_TOKENS', 'CREDITS': 'TOTAL_CREDITS'})
+            .sort_values(['USAGE_DATE', 'TOTAL_CREDITS'], ascending=[False, False])
+        )
+        
+        if not search_df.empty:
+            # Summary
+            total_tokens = search_df['TOTAL_TOKENS'].sum()
+            total_credits = search_df['TOTAL_CREDITS'].sum()
+            unique_services = search_df['SERVICE_NAME'].nunique()
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Tokens", f"{total_tokens:,.0f}")
+            with col2:
+                st.metric("Total Credits", f"{total_credits:.2f}")
+            with col3:
+                st.metric("Unique Services", f"{unique_services}")
+            
+            # Detailed table
+            st.dataframe(
+                search_df,
+                column_config={
+                    'SERVICE_NAME': 'Service Name',
+                    'USAGE_DATE': st.column_config.DateColumn('Date'),
+                    'TOTAL_TOKENS': st.column_config.NumberColumn('Tokens', format="%d"),
+                    'TOTAL_CREDITS': st.column_config.NumberColumn('Credits', format="%.2f")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No Cortex Search cost data available for the selected date range")
+    except Exception as e:
+        st.error(f"Error fetching Cortex Search costs: {str(e)}")
+    
+    st.markdown("---")
+    
+    # 4. Cost per Document (attributed from per-query Cortex usage)
+    st.subheader("Cost per Document")
+    st.caption("AI credits attributed to each document and pipeline stage by query ID. Usage data lags by up to a few hours.")
+    
+    if st.button("Refresh Cost Attribution"):
+        try:
+            with st.spinner("Attributing AI credits to documents..."):
+                result = backend.call_procedure("attribute_document_costs", 3)
+            get_document_costs.clear()
+            st.success(result)
+        except Exception as e:
+            st.error(f"Error refreshing cost attribution: {str(e)}")
+    
+    try:
+        document_costs = get_document_costs()
+        document_costs = document_costs[
+            (document_costs['PARSE_DATE'] >= start_date) & (document_costs['PARSE_DATE'] <= end_date)
+        ]
+        class_costs_df = (
+            document_costs.groupby('DOCUMENT_CLASS', as_index=False)
+            .agg(
+                DOCUMENTS=('DOCUMENT_ID', 'count'),
+                PAGES=('PAGE_COUNT', 'sum'),
+                TOTAL_CREDITS=('TOTAL_CREDITS', 'sum'),
+                PARSE_CREDITS=('PARSE_CREDITS', 'sum'),
+                CLASSIFY_CREDITS=('CLASSIFY_CREDITS', 'sum'),
+                EXTRACT_CREDITS=('EXTRACT_CREDITS', 'sum'),
+                AVG_CREDITS_PER_DOCUMENT=('TOTAL_CREDITS', 'mean')
+            )
+        )
+        class_costs_df['CREDITS_PER_PAGE'] = class_costs_df['TOTAL_CREDITS'] / class_costs_df['PAGES'].where(class_costs_df['PAGES'] > 0)
+        class_costs_df = class_costs_df.sort_values('TOTAL_CREDITS', ascending=False)
+        
+        if not class_costs_df.empty:
+            attributed_credits = class_costs_df['TOTAL_CREDITS'].sum()
+            attributed_documents = class_costs_df['DOCUMENTS'].sum()
+            attributed_pages = class_costs_df['PAGES'].sum()
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Attributed AI Credits", f"{attributed_credits:.4f}")
+            with col2:
+                st.metric(
+                    "Avg Credits per Document",
+                    f"{attributed_credits / attributed_documents:.4f}" if attributed_documents else "N/A"
+                )
+            with col3:
+                st.metric(
+                    "Avg Credits per Page",
+                    f"{attributed_credits / attributed_pages:.5f}" if attributed_pages else "N/A"
+                )
+            
+            # Stage breakdown per class
+            stage_df = class_costs_df.melt(
+                id_vars=['DOCUMENT_CLASS'],
+                value_vars=['PARSE_CREDITS', 'CLASSIFY_CREDITS', 'EXTRACT_CREDITS'],
+                var_name='STAGE',
+                value_name='CREDITS'
+            )
+            stage_df['STAGE'] = stage_df['STAGE'].str.replace('_CREDITS', '').str.lower()
+            fig_class = px.bar(
+                stage_df,
+                x='DOCUMENT_CLASS',
+                y='CREDITS',
+                color='STAGE',
+                title="Attributed Credits by Document Class and Stage",
+                labels={'DOCUMENT_CLASS': 'Document Class', 'CREDITS': 'Credits', 'STAGE': 'Stage'}
+            )
+            st.plotly_chart(fig_class, use_container_width=True)
+            
+            st.dataframe(
+                class_costs_df,
+                column_config={
+                    'DOCUMENT_CLASS': 'Document Class',
+                    'DOCUMENTS': st.column_config.NumberColumn('Documents', format="%d"),
+                    'PAGES': st.column_config.NumberColumn('Pages', format="%d"),
+                    'TOTAL_CREDITS': st.column_config.NumberColumn('Total Credits', format="%.4f"),
+                    'PARSE_CREDITS': st.column_config.NumberColumn('Parse', format="%.4f"),
+                    'CLASSIFY_CREDITS': st.column_config.NumberColumn('Classify', format="%.4f"),
+                    'EXTRACT_CREDITS': st.column_config.NumberColumn('Extract', format="%.4f"),
+                    'AVG_CREDITS_PER_DOCUMENT': st.column_config.NumberColumn('Avg per Document', format="%.4f"),
+                    'CREDITS_PER_PAGE': st.column_config.NumberColumn('Per Page', format="%.5f")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            # Most expensive documents
+            top_documents_df = document_costs.nlargest(50, 'TOTAL_CREDITS').drop(columns=['PARSE_DATE'])
+            
+            st.markdown("**Most Expensive Documents:**")
+            st.dataframe(
+                top_documents_df,
+                column_config={
+                    'DOCUMENT_ID': 'Document ID',
+                    'FILE_NAME': 'File Name',
+                    'DOCUMENT_CLASS': 'Class',
+                    'DOCUMENT_TYPE': 'Type',
+                    'PAGE_COUNT': st.column_config.NumberColumn('Pages', format="%d"),
+                    'FILE_SIZE_MB': st.column_config.NumberColumn('Size (MB)', format="%.2f"),
+                    'TOTAL_CREDITS': st.column_config.NumberColumn('Total Credits', format="%.4f"),
+                    'PARSE_CREDITS': st.column_config.NumberColumn('Parse', format="%.4f"),
+                    'CLASSIFY_CREDITS': st.column_config.NumberColumn('Classify', format="%.4f"),
+                    'EXTRACT_CREDITS': st.column_config.NumberColumn('Extract', format="%.4f"),
+                    'CREDITS_PER_PAGE': st.column_config.NumberColumn('Per Page', format="%.5f")
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            # Size vs cost, to spot classes where large documents are disproportionately expensive
+            if top_documents_df['PAGE_COUNT'].notna().any():
+                fig_pages = px.scatter(
+                    top_documents_df,
+                    x='PAGE_COUNT',
+                    y='TOTAL_CREDITS',
+                    color='DOCUMENT_CLASS',
+                    hover_data=['FILE_NAME'],
+                    title="Credits vs Page Count (Top 50 Documents)",
+                    labels={'PAGE_COUNT': 'Pages', 'TOTAL_CREDITS': 'Credits', 'DOCUMENT_CLASS': 'Class'}
+                )
+                st.plotly_chart(fig_pages, use_container_width=True)
+        else:
+            st.info("No attributed document costs for the selected date range. Run the cost attribution after ACCOUNT_USAGE has caught up.")
+    except Exception as e:
+        st.error(f"Error fetching per-document costs: {str(e)}")
+    
+    st.markdown("---")
+    
+    # 5. Cost Trends Over Time
+    st.subheader("Cost Trends Over Time")
+    
+    # Serverless Task Costs Over Time (Document Pipeline)
+    try:
+        serverless_trend_df = (
+            serverless_usage.groupby('USAGE_DATE', as_index=False)['CREDITS'].sum()
+            .rename(columns={'CREDITS': 'TOTAL_CREDITS'})
+        )
+        
+        if not serverless_trend_df.empty:
+            fig1 = px.line(
+                serverless_trend_df,
+                x='USAGE_DATE',
+                y='TOTAL_CREDITS',
+                title="Serverless Task Credits Over Time (Document Pipeline)",
+                labels={'TOTAL_CREDITS': 'Credits', 'USAGE_DATE': 'Date'}
+            )
+            st.plotly_chart(fig1, use_container_width=True)
+    except Exception as e:
+        st.error(f"Error generating serverless trend chart: {str(e)}")
+    
+    # AI Services Costs Over Time (Document Pipeline)
+    try:
+        ai_trend_df = (
+            ai_services_usage.groupby('USAGE_DATE', as_index=False)['CREDITS'].sum()
+            .rename(columns={'CREDITS': 'TOTAL_CREDITS'})
+        )
+        
+        if not ai_trend_df.empty:
+            fig2 = px.area(
+                ai_trend_df,
+                x='USAGE_DATE',
+                y='TOTAL_CREDITS',
+                title="AI Services Credits Over Time",
+                labels={'TOTAL_CREDITS': 'Credits', 'USAGE_DATE': 'Date'}
+            )
+            st.plotly_chart(fig2, use_container_width=True)
+    except Exception as e:
+        st.error(f"Error generating AI services trend chart: {str(e)}")
+    
+    # Combined Services Cost Comparison (Document Pipeline)
+    try:
+        combined_trend_df = (
+            metering.groupby(['USAGE_DATE', 'SERVICE_TYPE'], as_index=False)['CREDITS'].sum()
+            .rename(columns={'CREDITS': 'TOTAL_CREDITS'})
+        )
+        
+        if not combined_trend_df.empty:
+            fig3 = px.bar(
+                combined_trend_df,
+                x='USAGE_DATE',
+                y='TOTAL_CREDITS',
+                color='SERVICE_TYPE',
+                title="Cost Comparison: Serverless Tasks vs AI Services (Document Pipeline)",
+                labels={'TOTAL_CREDITS': 'Credits', 'USAGE_DATE': 'Date', 'SERVICE_TYPE': 'Service Type'},
+                barmode='group'
+            )
+            st.plotly_chart(fig3, use_container_width=True)
+    except Exception as e:
+        st.error(f"Error generating combined trend chart: {str(e)}")
@@ -0,0 +1,165 @@
+"""Dashboard page: pipeline metrics, classification and status charts, recent documents"""
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from app_common import get_document_classifications, get_pipeline_stats, get_recent_documents
+
+
+def render_pipeline_metrics():
+    """Render pipeline status metrics"""
+    stats = get_pipeline_stats()
+    if not stats:
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            "Total Documents", 
+            stats.get('total_documents', 0),
+            help="Total documents in the pipeline"
+        )
+    
+    with col2:
+        st.metric(
+            "Classified", 
+            stats.get('classified_count', 0),
+            help="Documents successfully classified"
+        )
+    
+    with col3:
+        st.metric(
+            "Extracted", 
+            stats.get('extracted_count', 0),
+            help="Documents with extracted attributes"
+        )
+    
+    with col4:
+        st.metric(
+            "Total Chunks", 
+            stats.get('total_chunks', 0),
+            help="Total text chunks for search"
+        )
+
+def render_classification_chart():
+    """Render document classification breakdown chart"""
+    df = get_document_classifications()
+    if df.empty:
+        st.info("No classification data available")
+        return
+    
+    fig = px.pie(
+        df, 
+        values='COUNT', 
+        names='DOCUMENT_CLASS_CLEAN',
+        title="Document Classification Breakdown",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_processing_status_chart():
+    """Render processing status breakdown"""
+    stats = get_pipeline_stats()
+    if not stats:
+        return
+    
+    # Create status breakdown
+    status_data = {
+        'Status': ['Parsed', 'Classified', 'Extracted', 'Chunked', 'Errors'],
+        'Count': [
+            stats.get('parsed_count', 0),
+            stats.get('classified_count', 0),
+            stats.get('extracted_count', 0),
+            stats.get('chunked_documents', 0),
+            stats.get('error_count', 0)
+        ],
+        'Color': ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+    }
+    
+    fig = go.Figure(data=[
+        go.Bar(
+            x=status_data['Status'],
+            y=status_data['Count'],
+            marker_color=status_data['Color'],
+            text=status_data['Count'],
+            textposition='auto'
+        )
+    ])
+    
+    fig.update_layout(
+        title="Pipeline Processing Status",
+        xaxis_title="Processing Stage",
+        yaxis_title="Document Count",
+        yaxis=dict(dtick=1),  # Force whole numbers on y-axis
+        showlegend=False
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_recent_documents():
+    """Render table of recently processed documents"""
+    df = get_recent_documents()
+    if df.empty:
+        st.info("No recent documents found")
+        return
+    
+    # Format the dataframe for display
+    display_df = df.copy()
+    display_df['CLASSIFICATION_TIMESTAMP'] = pd.to_datetime(display_df['CLASSIFICATION_TIMESTAMP']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        column_config={
+            "DOCUMENT_ID": st.column_config.TextColumn("Document ID", width="medium"),
+            "FILE_NAME": st.column_config.TextColumn("File Name", width="large"),
+            "DOCUMENT_CLASS": st.column_config.TextColumn("Class", width="small"),
+            "STATUS": st.column_config.TextColumn("Status", width="small"),
+            "CLASSIFICATION_TIMESTAMP": st.column_config.TextColumn("Processed", width="medium")
+        },
+        hide_index=True
+    )
+
+
+def render():
+    """Render the Dashboard page"""
+    # Professional header
+    st.markdown("""
+    <div class="header-card">
+        <h1>Document Classification & Extraction Dashboard</h1>
+        <p>Real-time overview of your intelligent document processing pipeline powered by Snowflake Cortex AI</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Refresh button
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        if st.button("Refresh Data"):
+            st.cache_data.clear()
+            st.rerun()
+    
+    st.markdown("---")
+    
+    # Pipeline Metrics
+    st.subheader("Pipeline Status")
+    render_pipeline_metrics()
+    
+    st.markdown("---")
+    
+    # Charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        render_classification_chart()
+    
+    with col2:
+        render_processing_status_chart()
+    
+    st.markdown("---")
+    
+    # Recent Documents
+    st.subheader("Recently Processed Documents")
+    render_recent_documents()
@@ -0,0 +1,792 @@
+"""Document Review & Explore page: document details, page previews and attribute review"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from app_common import (
+    backend, get_ai_response, get_recent_documents, lexical_overlap_score, save_extraction_reviews, tokenize_text
+)
+from query_tracing import record_cache_lookup, trace_cache
+
+
+def get_document_details(document_id):
+    """Get detailed information for a specific document"""
+    try:
+        # Get basic document info
+        doc_info = backend.sql(f"""
+            SELECT 
+                dc.document_id,
+                dc.file_name,
+                dc.file_path,
+                dc.file_size,
+                dc.document_type,
+                CASE 
+                    WHEN TRY_PARSE_JSON(dc.document_class) IS NOT NULL THEN 
+                        TRY_PARSE_JSON(dc.document_class):labels[0]::STRING
+                    ELSE dc.document_class
+                END as document_class,
+                dc.classification_timestamp,
+                dc.classification_method,
+                dc.rule_id,
+                pd.content_text,
+                pd.status
+            FROM document_db.s3_documents.document_classifications dc
+            JOIN document_db.s3_documents.parsed_documents pd 
+                ON dc.document_id = pd.document_id
+            WHERE dc.document_id = '{document_id}'
+        """).to_pandas()
+        
+        # Get extracted fields
+        extracted_fields = backend.sql(f"""
+            SELECT 
+                attribute_name,
+                attribute_value,
+                extraction_timestamp
+            FROM document_db.s3_documents.document_extractions
+            WHERE document_id = '{document_id}'
+            ORDER BY attribute_name
+        """).to_pandas()
+        
+        # Get chunks
+        chunks = backend.sql(f"""
+            SELECT 
+                chunk_index,
+                chunk_text,
+                chunk_size
+            FROM document_db.s3_documents.document_chunks
+            WHERE document_id = '{document_id}'
+            ORDER BY chunk_index
+        """).to_pandas()
+        
+        return doc_info, extracted_fields, chunks
+    except Exception as e:
+        st.error(f"Error fetching document details: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+# Rendered PDF page previews kept in memory, shared across sessions
+PREVIEW_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PREVIEW_DPI_OPTIONS = [36, 50, 72, 96]
+
+class PagePreviewCache:
+    """Size-bounded LRU cache of rendered PNG bytes keyed by (file path, page, dpi)"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            png_bytes = self._entries.get(key)
+            if png_bytes is not None:
+                self._entries.move_to_end(key)
+            return png_bytes
+    
+    def put(self, key, png_bytes):
+        if len(png_bytes) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= len(self._entries.pop(key))
+            self._entries[key] = png_bytes
+            self.total_bytes += len(png_bytes)
+            # Evict least recently used pages until the cache fits its budget
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+@st.cache_resource
+def get_page_preview_cache():
+    """Process-wide page preview cache"""
+    return PagePreviewCache(PREVIEW_CACHE_MAX_BYTES)
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=3600)
+def get_pdf_page_count(relative_path):
+    """Count pages of a staged PDF without downloading it"""
+    result = backend.sql(f"""
+        SELECT document_db.s3_documents.pdf_page_count(
+            BUILD_SCOPED_FILE_URL(@document_db.s3_documents.document_stage, '{relative_path.replace("'", "''")}')
+        ) as page_count
+    """).collect()
+    return int(result[0]['PAGE_COUNT'] or 1)
+
+def get_pdf_page_png(relative_path, page_index, dpi):
+    """Render one PDF page to PNG server-side, served from the LRU cache when possible"""
+    cache = get_page_preview_cache()
+    cache_key = (relative_path, page_index, dpi)
+    png_bytes = cache.get(cache_key)
+    record_cache_lookup('page_preview_cache', png_bytes is not None)
+    if png_bytes is None:
+        result = backend.sql(f"""
+            SELECT document_db.s3_documents.render_pdf_page_png(
+                BUILD_SCOPED_FILE_URL(@document_db.s3_documents.document_stage, '{relative_path.replace("'", "''")}'),
+                {int(page_index)},
+                {int(dpi)}
+            ) as png
+        """).collect()
+        png_bytes = bytes(result[0]['PNG'])
+        cache.put(cache_key, png_bytes)
+    return png_bytes
+
+def render_pdf_page_preview(relative_path):
+    """Render a low-resolution preview of the selected PDF page"""
+    page_count = get_pdf_page_count(relative_path)
+    
+    col_page, col_dpi = st.columns([2, 1])
+    with col_page:
+        page_number = st.number_input(
+            f"Page (of {page_count})",
+            min_value=1,
+            max_value=page_count,
+            value=1,
+            key=f"preview_page_{relative_path}"
+        )
+    with col_dpi:
+        dpi = st.select_slider(
+            "Preview DPI",
+            options=PREVIEW_DPI_OPTIONS,
+            value=50,
+            key=f"preview_dpi_{relative_path}",
+            help="Lower DPI renders faster and uses less memory"
+        )
+    
+    png_bytes = get_pdf_page_png(relative_path, int(page_number) - 1, dpi)
+    st.image(png_bytes, caption=f"Page {page_number} of {page_count}: {relative_path.split('/')[-1]}")
+
+def render_document_preview(file_path, document_type):
+    """Render document preview using Snowflake's unstructured data capabilities"""
+    try:
+        # Extract relative path from full file path for stage access
+        if file_path.startswith('s3://'):
+            # For S3 paths, extract the relative path after the bucket
+            relative_path = '/'.join(file_path.split('/')[3:])  # Remove s3://bucket-name/
+        else:
+            relative_path = file_path
+        
+        if document_type.lower() in ['png', 'jpg', 'jpeg', 'tiff', 'tif']:
+            # Generate a presigned URL for image preview
+            try:
+                presigned_url_result = backend.sql(f"""
+                    SELECT GET_PRESIGNED_URL('@document_db.s3_documents.document_stage', '{relative_path}', 3600) as presigned_url
+                """).collect()
+                
+                if presigned_url_result and presigned_url_result[0]['PRESIGNED_URL']:
+                    presigned_url = presigned_url_result[0]['PRESIGNED_URL']
+                    st.image(presigned_url, caption=f"Preview: {file_path.split('/')[-1]}", use_container_width=True)
+                else:
+                    st.info("🖼️ Image preview not available - unable to generate access URL")
+            except Exception as e:
+                st.warning(f"🖼️ Image preview not available: {str(e)}")
+                
+        elif document_type.lower() == 'pdf':
+            # For PDF files, render the requested page in-app (low DPI, cached)
+            try:
+                render_pdf_page_preview(relative_path)
+            except Exception as e:
+                st.warning(f"📄 Page preview not available: {str(e)}")
+            
+            # Keep the full-file download option
+            try:
+                presigned_url_result = backend.sql(f"""
+                    SELECT GET_PRESIGNED_URL('@document_db.s3_documents.document_stage', '{relative_path}', 3600) as presigned_url
+                """).collect()
+                
+                if presigned_url_result and presigned_url_result[0]['PRESIGNED_URL']:
+                    presigned_url = presigned_url_result[0]['PRESIGNED_URL']
+                    st.markdown(f"""
+                    📄 **PDF Document**
+                    
+                    [📥 Download PDF]({presigned_url})
+                    
+                    *Click the link above to download the full PDF document*
+                    """)
+                else:
+                    st.info("📄 PDF preview not available - unable to generate access URL")
+            except Exception as e:
+                st.warning(f"📄 PDF preview not available: {str(e)}")
+                
+        elif document_type.lower() in ['docx', 'pptx']:
+            # For Office documents, show download option
+            try:
+                presigned_url_result = backend.sql(f"""
+                    SELECT GET_PRESIGNED_URL('@document_db.s3_documents.document_stage', '{relative_path}', 3600) as presigned_url
+                """).collect()
+                
+                if presigned_url_result and presigned_url_result[0]['PRESIGNED_URL']:
+                    presigned_url = presigned_url_result[0]['PRESIGNED_URL']
+                    doc_icon = "📊" if document_type.lower() == 'pptx' else "📝"
+                    doc_name = "PowerPoint Presentation" if document_type.lower() == 'pptx' else "Word Document"
+                    st.markdown(f"""
+                    {doc_icon} **{doc_name}**
+                    
+                    [📥 Download {document_type.upper()}]({presigned_url})
+                    
+                    *Click the link above to download and view the {doc_name.lower()}*
+                    """)
+                else:
+                    st.info(f"📄 {document_type.upper()} preview not available - unable to generate access URL")
+            except Exception as e:
+                st.warning(f"📄 {document_type.upper()} preview not available: {str(e)}")
+                
+        elif document_type.lower() in ['html', 'txt']:
+            # For text-based files, show download option and potentially preview content
+            try:
+                presigned_url_result = backend.sql(f"""
+                    SELECT GET_PRESIGNED_URL('@document_db.s3_documents.document_stage', '{relative_path}', 3600) as presigned_url
+                """).collect()
+                
+                if presigned_url_result and presigned_url_result[0]['PRESIGNED_URL']:
+                    presigned_url = presigned_url_result[0]['PRESIGNED_URL']
+                    doc_icon = "🌐" if document_type.lower() == 'html' else "📄"
+                    doc_name = "HTML Document" if document_type.lower() == 'html' else "Text File"
+                    st.markdown(f"""
+                    {doc_icon} **{doc_name}**
+                    
+                    [📥 Download {document_type.upper()}]({presigned_url})
+                    
+                    *Click the link above to download and view the {doc_name.lower()}*
+                    """)
+                else:
+                    st.info(f"📄 {document_type.upper()} preview not available - unable to generate access URL")
+            except Exception as e:
+                st.warning(f"📄 {document_type.upper()} preview not available: {str(e)}")
+                
+        else:
+            # For other file types, show file info and download option if possible
+            try:
+                presigned_url_result = backend.sql(f"""
+                    SELECT GET_PRESIGNED_URL('@document_db.s3_documents.document_stage', '{relative_path}', 3600) as presigned_url
+                """).collect()
+                
+                if presigned_url_result and presigned_url_result[0]['PRESIGNED_URL']:
+                    presigned_url = presigned_url_result[0]['PRESIGNED_URL']
+                    st.markdown(f"""
+                    📁 **{document_type.upper()} File**
+                    
+                    [📥 Download File]({presigned_url})
+                    
+                    *Preview not available for this file type*
+                    """)
+                else:
+                    st.info(f"📁 Preview not available for {document_type.upper()} files")
+            except Exception as e:
+                st.info(f"📁 Preview not available for {document_type.upper()} files")
+                
+    except Exception as e:
+        st.error(f"Error rendering preview: {e}")
+
+
+def apply_field_reviews(document_id, extracted_fields):
+    """Overlay this session's approvals and denials on the (possibly cached) extracted fields"""
+    reviews = st.session_state.get('field_reviews', {})
+    if extracted_fields.empty or not any(key[0] == document_id for key in reviews):
+        return extracted_fields
+    extracted_fields = extracted_fields.copy()
+    for idx, field in extracted_fields.iterrows():
+        review = reviews.get((document_id, field['ATTRIBUTE_NAME']))
+        if review:
+            extracted_fields.at[idx, 'ATTRIBUTE_VALUE'] = review['value']
+            extracted_fields.at[idx, 'CONFIDENCE_SCORE'] = review['confidence']
+    return extracted_fields
+
+
+def clear_field_reviews(document_id):
+    """Forget this session's saved reviews of a document once its details are reloaded from the table"""
+    reviews = st.session_state.get('field_reviews', {})
+    for key in [key for key in reviews if key[0] == document_id]:
+        del reviews[key]
+
+
+def stage_review(document_id, attribute_name, action, value=None):
+    """Buffer an approval (with its value) or denial until the review session is saved"""
+    st.session_state.setdefault('pending_reviews', {})[(document_id, attribute_name)] = {
+        'action': action,
+        'value': value if action == 'approve' else None,
+        'confidence': 1.0 if action == 'approve' else 0.0
+    }
+
+
+def review_field(document_id, attribute_name, action):
+    """Approve/Deny button callback: stage the review of one field"""
+    value_key = f"value_{document_id}_{attribute_name}"
+    stage_review(document_id, attribute_name, action, st.session_state.get(value_key, ""))
+    if action == 'deny':
+        st.session_state[value_key] = ""
+
+
+def unstage_review(document_id, attribute_name):
+    """Undo button callback: drop the pending review of one field"""
+    st.session_state.get('pending_reviews', {}).pop((document_id, attribute_name), None)
+
+
+def stage_low_confidence_reviews(document_id, low_conf_fields, action):
+    """Bulk action callback: stage the review of every low-confidence field of the document"""
+    for _, field in low_conf_fields.iterrows():
+        value_key = f"value_{document_id}_{field['ATTRIBUTE_NAME']}"
+        value = st.session_state.get(value_key, field['ATTRIBUTE_VALUE'] if pd.notna(field['ATTRIBUTE_VALUE']) else None)
+        stage_review(document_id, field['ATTRIBUTE_NAME'], action, value)
+        if action == 'deny':
+            st.session_state[value_key] = ""
+
+
+def save_pending_reviews():
+    """Save button callback: write all pending reviews in one transaction and keep them as saved reviews"""
+    pending = st.session_state.get('pending_reviews', {})
+    if not pending:
+        return
+    try:
+        saved_count = save_extraction_reviews(pending)
+    except Exception as e:
+        st.session_state.review_save_result = ('error', f"Error saving reviews: {e}")
+        return
+    
+    saved = st.session_state.setdefault('field_reviews', {})
+    for key, review in pending.items():
+        saved[key] = {'value': review['value'], 'confidence': review['confidence'],
+                      'status': 'approved' if review['action'] == 'approve' else 'denied'}
+    pending.clear()
+    st.session_state.review_save_result = ('success', f"💾 Saved {saved_count} review(s)")
+
+
+def discard_pending_reviews():
+    """Discard button callback: drop all pending reviews and the values edited for them"""
+    pending = st.session_state.get('pending_reviews', {})
+    for document_id, attribute_name in pending:
+        st.session_state.pop(f"value_{document_id}_{attribute_name}", None)
+    pending.clear()
+
+
+def render_pending_count(pending_caption):
+    """Write the number of staged reviews into the placeholder above the fields"""
+    pending_count = len(st.session_state.get('pending_reviews', {}))
+    pending_caption.caption(f"{pending_count} review(s) pending across documents; Save applies them together")
+
+
+@st.fragment
+def render_field_review(document_id, field, confidence_threshold, pending_caption):
+    """Render one extracted field; its Approve/Deny actions rerun only this fragment.
+    
+    The fragment also redraws the pending review count, which lives outside it in pending_caption.
+    """
+    # Reviews saved in this session apply immediately, ahead of the cached document details
+    review = st.session_state.setdefault('field_reviews', {}).get((document_id, field['ATTRIBUTE_NAME']))
+    if review:
+        field = field.copy()
+        field['ATTRIBUTE_VALUE'] = review['value']
+        field['CONFIDENCE_SCORE'] = review['confidence']
+    
+    # Determine confidence score styling
+    conf_score = field['CONFIDENCE_SCORE']
+    is_low_confidence = pd.notna(conf_score) and conf_score < confidence_threshold
+    
+    # Color coding for confidence
+    if pd.isna(conf_score):
+        conf_color = "#64748b"  # Gray for N/A
+        conf_bg = "#f1f5f9"
+        conf_text = "N/A"
+    elif conf_score < 0.3:
+        conf_color = "#dc2626"  # Red
+        conf_bg = "#fef2f2"
+        conf_text = f"{conf_score:.1%}"
+    elif conf_score < 0.4:
+        conf_color = "#ea580c"  # Orange
+        conf_bg = "#fff7ed"
+        conf_text = f"{conf_score:.1%}"
+    elif conf_score < confidence_threshold:
+        conf_color = "#ca8a04"  # Yellow
+        conf_bg = "#fefce8"
+        conf_text = f"{conf_score:.1%}"
+    else:
+        conf_color = "#16a34a"  # Green
+        conf_bg = "#f0fdf4"
+        conf_text = f"{conf_score:.1%}"
+    
+    # Create expandable tile with confidence badge
+    with st.expander(
+        f"{field['ATTRIBUTE_NAME']}", 
+        expanded=is_low_confidence
+    ):
+        # Confidence badge
+        st.markdown(f"""
+        <div style="
+            display: inline-block;
+            background: {conf_bg};
+            border: 1px solid {conf_color};
+            border-radius: 6px;
+            padding: 0.3rem 0.6rem;
+            font-weight: 600;
+            color: {conf_color};
+            font-size: 0.85rem;
+            margin-bottom: 0.5rem;
+        ">
+            Confidence: {conf_text}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        pending = st.session_state.get('pending_reviews', {}).get((document_id, field['ATTRIBUTE_NAME']))
+        if pending:
+            col_status, col_undo = st.columns([3, 1])
+            with col_status:
+                st.caption("⏳ Approval pending, save to apply" if pending['action'] == 'approve' else "⏳ Denial pending, save to apply")
+            with col_undo:
+                st.button(
+                    "↩️ Undo",
+                    key=f"undo_{document_id}_{field['ATTRIBUTE_NAME']}",
+                    on_click=unstage_review,
+                    args=(document_id, field['ATTRIBUTE_NAME'])
+                )
+        elif review:
+            st.caption("✅ Approved" if review['status'] == 'approved' else "❌ Denied")
+        
+        # Value display and editing for low confidence items
+        if is_low_confidence:
+            unique_key = f"{document_id}_{field['ATTRIBUTE_NAME']}"
+            
+            # Editable value
+            st.text_input(
+                "Value",
+                value=field['ATTRIBUTE_VALUE'] if pd.notna(field['ATTRIBUTE_VALUE']) else "",
+                key=f"value_{unique_key}",
+                label_visibility="collapsed"
+            )
+            
+            # Approve/Deny buttons stage the review; the callbacks run before the fragment reruns
+            col_approve, col_deny = st.columns(2)
+            
+            with col_approve:
+                st.button(
+                    "✅ Approve",
+                    key=f"approve_{unique_key}",
+                    on_click=review_field,
+                    args=(document_id, field['ATTRIBUTE_NAME'], 'approve'),
+                    use_container_width=True,
+                    type="primary"
+                )
+            
+            with col_deny:
+                st.button(
+                    "❌ Deny",
+                    key=f"deny_{unique_key}",
+                    on_click=review_field,
+                    args=(document_id, field['ATTRIBUTE_NAME'], 'deny'),
+                    use_container_width=True
+                )
+        else:
+            # Just display the value for high confidence items
+            st.write(field['ATTRIBUTE_VALUE'])
+    
+    render_pending_count(pending_caption)
+
+
+# Ask this document: questions are answered from the document's own chunks, ranked locally,
+# with a single COMPLETE call and no corpus-wide search
+ASK_DOCUMENT_CHUNKS = 4
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=300)
+def get_document_chunks(document_id):
+    """All chunks of one document"""
+    return backend.sql("""
+        SELECT chunk_index, chunk_text
+        FROM document_db.s3_documents.document_chunks
+        WHERE document_id = ?
+        ORDER BY chunk_index
+    """, params=[document_id]).to_pandas()
+
+
+def rank_document_chunks(question, chunks, limit=ASK_DOCUMENT_CHUNKS):
+    """(score, chunk) pairs for the chunks that best match the question, in document order.
+    
+    Ties keep document order, so a question that matches nothing gets the opening chunks.
+    """
+    query_terms = tokenize_text(question)
+    scored = [(lexical_overlap_score(query_terms, chunk['CHUNK_TEXT']), chunk) for _, chunk in chunks.iterrows()]
+    best = sorted(scored, key=lambda item: item[0], reverse=True)[:limit]
+    return sorted(best, key=lambda item: item[1]['CHUNK_INDEX'])
+
+
+@st.fragment
+def render_document_qa(document_id, file_name, document_class):
+    """Ask this document panel; asking reruns only this fragment"""
+    answers = st.session_state.setdefault('document_answers', {})
+    with st.form(key=f"ask_document_{document_id}"):
+        question = st.text_input(
+            "Question",
+            placeholder="e.g. When does this agreement renew?",
+            label_visibility="collapsed"
+        )
+        asked = st.form_submit_button("Ask", type="primary")
+    
+    if asked and question.strip():
+        chunks = get_document_chunks(document_id)
+        if chunks.empty:
+            st.warning("This document has no chunks yet. Run chunking from Pipeline Control first.")
+            return
+        ranked = rank_document_chunks(question, chunks)
+        context_docs = [
+            {'file_name': file_name, 'document_class': document_class, 'chunk_text': chunk['CHUNK_TEXT']}
+            for _, chunk in ranked
+        ]
+        with st.spinner("Generating answer..."):
+            answer = get_ai_response(question, context_docs)
+        answers[document_id] = {
+            'question': question,
+            'answer': answer,
+            'sources': [(int(chunk['CHUNK_INDEX']), score) for score, chunk in ranked]
+        }
+    
+    answer = answers.get(document_id)
+    if answer:
+        st.markdown(f"**Q:** {answer['question']}")
+        st.markdown(answer['answer'])
+        st.caption("Answered from chunks " + ", ".join(
+            f"#{chunk_index} ({score:.0%} term match)" for chunk_index, score in answer['sources']
+        ))
+
+
+def render():
+    """Render the Document Review & Explore page"""
+    # Professional header for Document Review & Explore
+    st.markdown("""
+    <div class="header-card">
+        <h1>Document Review & Explore</h1>
+        <p>Review extraction quality and explore individual documents and their extracted data in detail</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Confidence threshold slider at the top
+    st.subheader("⚙️ Quality Review Settings")
+    confidence_threshold = st.slider(
+        "Confidence Score Threshold (highlight extractions below this value)",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.5,
+        step=0.05,
+        help="Extractions with confidence scores below this threshold will be highlighted for review"
+    )
+    
+    st.markdown("---")
+    
+    # Get list of documents
+    recent_docs = get_recent_documents(50)  # Get more for selection
+    
+    if recent_docs.empty:
+        st.warning("No documents found in the pipeline")
+        st.stop()
+    
+    # Document selector
+    doc_options = {}
+    for _, row in recent_docs.iterrows():
+        label = f"{row['FILE_NAME']}"
+        doc_options[label] = row['DOCUMENT_ID']
+    
+    selected_doc_label = st.selectbox(
+        "Select a document to explore:",
+        options=list(doc_options.keys()),
+        help="Choose a document to view its details and extracted data"
+    )
+    
+    if selected_doc_label:
+        document_id = doc_options[selected_doc_label]
+        
+        # Get document details with confidence scores
+        @trace_cache
+        @st.cache_data(ttl=60)
+        def get_document_details_with_confidence(doc_id):
+            """Get document details including confidence scores"""
+            doc_query = f"""
+            SELECT 
+                dc.*,
+                pd.content_text
+            FROM document_db.s3_documents.document_classifications dc
+            LEFT JOIN document_db.s3_documents.parsed_documents pd
+                ON dc.document_id = pd.document_id
+            WHERE dc.document_id = '{doc_id}'
+            """
+            
+            fields_query = f"""
+            SELECT 
+                attribute_name,
+                attribute_value,
+                confidence_score,
+                extraction_timestamp
+            FROM document_db.s3_documents.document_extractions
+            WHERE document_id = '{doc_id}'
+            ORDER BY attribute_name
+            """
+            
+            chunks_query = f"""
+            SELECT chunk_text, chunk_index
+            FROM document_db.s3_documents.document_chunks
+            WHERE document_id = '{doc_id}'
+            ORDER BY chunk_index
+            LIMIT 3
+            """
+            
+            doc_info = backend.sql(doc_query).to_pandas()
+            extracted_fields = backend.sql(fields_query).to_pandas()
+            chunks = backend.sql(chunks_query).to_pandas()
+            
+            return doc_info, extracted_fields, chunks
+        
+        doc_info, extracted_fields, chunks = get_document_details_with_confidence(document_id)
+        extracted_fields = apply_field_reviews(document_id, extracted_fields)
+        
+        if not doc_info.empty:
+            doc = doc_info.iloc[0]
+            
+            # Document Info
+            st.subheader("📄 Document Information")
+            
+            # Clean document class display
+            doc_class_display = doc['DOCUMENT_CLASS']
+            if pd.notna(doc_class_display):
+                try:
+                    # Try to parse as JSON and extract the label
+                    import json
+                    parsed = json.loads(doc_class_display)
+                    if isinstance(parsed, dict) and 'labels' in parsed:
+                        doc_class_display = parsed['labels'][0] if parsed['labels'] else doc_class_display
+                except:
+                    # If parsing fails, use as-is
+                    pass
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Document Class", doc_class_display)
+            with col2:
+                st.metric("File Type", doc['DOCUMENT_TYPE'].upper())
+            
+            # Document metadata (professional card layout)
+            st.subheader("Document Metadata")
+            meta_col1, meta_col2, meta_col3, meta_col4 = st.columns(4)
+            with meta_col1:
+                st.markdown(f"""
+                <div class="metadata-item">
+                    <strong>File Name</strong><br>
+                    {doc['FILE_NAME']}
+                </div>
+                """, unsafe_allow_html=True)
+            with meta_col2:
+                file_size = f"{doc['FILE_SIZE']:,} bytes" if pd.notna(doc['FILE_SIZE']) else "N/A"
+                st.markdown(f"""
+                <div class="metadata-item">
+                    <strong>File Size</strong><br>
+                    {file_size}
+                </div>
+                """, unsafe_allow_html=True)
+            with meta_col3:
+                # Rule-classified documents name the classification_rules row that matched
+                classified_by = (
+                    f"rule {doc['RULE_ID']}" if doc['CLASSIFICATION_METHOD'] == 'rule'
+                    else "AI_CLASSIFY" if doc['CLASSIFICATION_METHOD'] == 'ai_classify' else "N/A"
+                )
+                st.markdown(f"""
+                <div class="metadata-item">
+                    <strong>Processed</strong><br>
+                    {doc['CLASSIFICATION_TIMESTAMP']}<br>
+                    <small>Classified by {classified_by}</small>
+                </div>
+                """, unsafe_allow_html=True)
+            with meta_col4:
+                # Truncate long paths for display
+                display_path = doc['FILE_PATH']
+                if len(display_path) > 30:
+                    display_path = "..." + display_path[-27:]
+                st.markdown(f"""
+                <div class="metadata-item">
+                    <strong>File Path</strong><br>
+                    <span title="{doc['FILE_PATH']}">{display_path}</span>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            st.markdown("---")
+            
+            # Document preview (full width, larger)
+            st.subheader("Document Preview")
+            render_document_preview(doc['FILE_PATH'], doc['DOCUMENT_TYPE'])
+            
+            st.markdown("---")
+            
+            # Extracted Fields with Quality Review
+            st.subheader("Extracted Fields")
+            if not extracted_fields.empty:
+                # Calculate quality metrics
+                low_conf_count = len(extracted_fields[extracted_fields['CONFIDENCE_SCORE'] < confidence_threshold])
+                if low_conf_count > 0:
+                    st.warning(f"⚠️ {low_conf_count} extraction(s) below {confidence_threshold:.0%} confidence threshold")
+                
+                # Review session: Approve/Deny only stage edits; Save writes them in one transaction
+                save_result = st.session_state.pop('review_save_result', None)
+                if save_result and save_result[0] == 'success':
+                    st.success(save_result[1])
+                elif save_result:
+                    st.error(save_result[1])
+                col1, col2, col3 = st.columns([2, 1, 1])
+                with col1:
+                    pending_caption = st.empty()
+                    render_pending_count(pending_caption)
+                with col2:
+                    st.button("💾 Save Reviews", type="primary", on_click=save_pending_reviews, use_container_width=True)
+                with col3:
+                    st.button("↩️ Discard", on_click=discard_pending_reviews, use_container_width=True)
+                
+                # Display extracted fields in a more compact grid layout with confidence scores.
+                # Each field is a fragment: approving or denying one reruns only that field.
+                field_cols = st.columns(2)  # Two columns for extracted fields
+                for idx, (_, field) in enumerate(extracted_fields.iterrows()):
+                    with field_cols[idx % 2]:
+                        render_field_review(document_id, field, confidence_threshold, pending_caption)
+                
+                # Bulk actions for low confidence items
+                low_conf_fields = extracted_fields[extracted_fields['CONFIDENCE_SCORE'] < confidence_threshold]
+                if not low_conf_fields.empty:
+                    st.markdown("---")
+                    st.subheader("🔧 Bulk Actions")
+                    
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        st.button(
+                            "✅ Approve All Low-Confidence",
+                            type="secondary",
+                            on_click=stage_low_confidence_reviews,
+                            args=(document_id, low_conf_fields, 'approve'),
+                            use_container_width=True
+                        )
+                    
+                    with col2:
+                        st.button(
+                            "❌ Deny All Low-Confidence",
+                            type="secondary",
+                            on_click=stage_low_confidence_reviews,
+                            args=(document_id, low_conf_fields, 'deny'),
+                            use_container_width=True
+                        )
+                    
+                    with col3:
+                        if st.button("🔄 Refresh", use_container_width=True):
+                            get_document_details_with_confidence.clear()
+                            clear_field_reviews(document_id)
+                            st.rerun()
+            else:
+                st.info("No extracted fields found for this document")
+            
+            st.markdown("---")
+            st.subheader("💬 Ask This Document")
+            st.caption("Answers come from this document's own chunks only")
+            render_document_qa(document_id, doc['FILE_NAME'], doc_class_display)
+            
+            # Raw content
+            if pd.notna(doc['CONTENT_TEXT']) and doc['CONTENT_TEXT']:
+                with st.expander("Full Document Text"):
+                    st.text_area(
+                        "Raw extracted text",
+                        doc['CONTENT_TEXT'],
+                        height=300,
+                        disabled=True
+                    )
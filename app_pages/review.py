@@ -0,0 +1,325 @@
+"""Review Queue page: low-confidence extractions across all documents, reviewed a page at a time"""
+import math
+import uuid
+
+import pandas as pd
+import streamlit as st
+
+from app_common import backend, save_extraction_reviews
+from query_tracing import trace_cache
+
+REVIEW_PAGE_SIZES = [50, 100, 250]
+QUEUE_CLASS = "COALESCE(TRY_PARSE_JSON(document_class):labels[0]::STRING, document_class)"
+GROUP_BY_OPTIONS = {
+    "None": None,
+    "Document class": (QUEUE_CLASS, 'DOCUMENT_CLASS'),
+    "Attribute": ('attribute_name', 'ATTRIBUTE_NAME'),
+}
+
+
+def queue_filter(threshold, classes, attributes):
+    """WHERE clause and qmark params selecting the queue items that match the review filters"""
+    clauses = ["confidence_score < ?"]
+    params = [threshold]
+    if classes:
+        clauses.append(f"{QUEUE_CLASS} IN ({', '.join('?' for _ in classes)})")
+        params += list(classes)
+    if attributes:
+        clauses.append(f"attribute_name IN ({', '.join('?' for _ in attributes)})")
+        params += list(attributes)
+    return " AND ".join(clauses), params
+
+
+def queue_sort_keys(group_by):
+    """Sort key (expression, result column) pairs: the group, then confidence, then a unique tiebreak"""
+    keys = [('confidence_score', 'CONFIDENCE_SCORE'), ('document_id', 'DOCUMENT_ID'), ('attribute_name', 'ATTRIBUTE_NAME')]
+    group = GROUP_BY_OPTIONS[group_by]
+    if group:
+        keys = [group] + [key for key in keys if key != group]
+    return keys
+
+
+def keyset_predicate(sort_keys, cursor):
+    """Rows after the cursor in sort order: (k1, k2, ...) > (v1, v2, ...) expanded into ORs.
+    
+    The leading key gets its own >= bound so the scan prunes on the queue's clustering key.
+    """
+    expressions = [expression for expression, _ in sort_keys]
+    clauses = []
+    params = [cursor[0]]
+    for i, expression in enumerate(expressions):
+        terms = [f"{previous} = ?" for previous in expressions[:i]] + [f"{expression} > ?"]
+        clauses.append(f"({' AND '.join(terms)})")
+        params += list(cursor[:i + 1])
+    return f"{expressions[0]} >= ? AND ({' OR '.join(clauses)})", params
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_queue_filter_options(threshold):
+    """Document classes and attributes present among the queue items below the threshold"""
+    try:
+        options = backend.sql(f"""
+            SELECT DISTINCT {QUEUE_CLASS} AS document_class, attribute_name
+            FROM document_db.s3_documents.extraction_review_queue
+            WHERE confidence_score < ?
+        """, params=[threshold]).to_pandas()
+        return sorted(options['DOCUMENT_CLASS'].dropna().unique()), sorted(options['ATTRIBUTE_NAME'].dropna().unique())
+    except Exception as e:
+        st.error(f"Error fetching review queue filters: {e}")
+        return [], []
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=30)
+def get_queue_groups(threshold, classes, attributes, group_by):
+    """Matching queue items per group (or in total when not grouping)"""
+    where, params = queue_filter(threshold, classes, attributes)
+    group = GROUP_BY_OPTIONS[group_by]
+    group_select = f"{group[0]} AS {group[1].lower()}, " if group else ""
+    group_clause = f"GROUP BY {group[0]} ORDER BY items DESC" if group else ""
+    try:
+        return backend.sql(f"""
+            SELECT {group_select}
+                COUNT(*) AS items,
+                COUNT(DISTINCT document_id) AS documents,
+                AVG(confidence_score) AS avg_confidence
+            FROM document_db.s3_documents.extraction_review_queue
+            WHERE {where}
+            {group_clause}
+        """, params=params).to_pandas()
+    except Exception as e:
+        st.error(f"Error fetching review queue summary: {e}")
+        return pd.DataFrame()
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=30)
+def get_queue_page(threshold, classes, attributes, group_by, cursor, page_size):
+    """One page of queue items in sort order, starting after the keyset cursor"""
+    where, params = queue_filter(threshold, classes, attributes)
+    sort_keys = queue_sort_keys(group_by)
+    if cursor is not None:
+        keyset, keyset_params = keyset_predicate(sort_keys, cursor)
+        where = f"{where} AND {keyset}"
+        params += keyset_params
+    try:
+        return backend.sql(f"""
+            SELECT
+                document_id,
+                file_name,
+                {QUEUE_CLASS} AS document_class,
+                attribute_name,
+                attribute_value,
+                confidence_score
+            FROM document_db.s3_documents.extraction_review_queue
+            WHERE {where}
+            ORDER BY {', '.join(expression for expression, _ in sort_keys)}
+            LIMIT ?
+        """, params=params + [page_size]).to_pandas()
+    except Exception as e:
+        st.error(f"Error fetching review queue: {e}")
+        return pd.DataFrame()
+
+
+def bulk_review_by_filter(threshold, classes, attributes, action):
+    """Approve or deny every queue item matching the filters, audited, in one transaction"""
+    where, params = queue_filter(threshold, classes, attributes)
+    review_batch_id = str(uuid.uuid4())
+    new_value = "attribute_value" if action == 'approve' else "NULL"
+    new_confidence = 1.0 if action == 'approve' else 0.0
+    
+    audit_insert = f"""
+    INSERT INTO document_db.s3_documents.extraction_review_audit
+        (review_batch_id, document_id, attribute_name, review_action,
+         previous_value, previous_confidence, new_value, new_confidence)
+    SELECT ?, document_id, attribute_name, ?, attribute_value, confidence_score, {new_value}, ?
+    FROM document_db.s3_documents.extraction_review_queue
+    WHERE {where}
+    """
+    # Update exactly the audited rows, even if the pipeline changed the queue in between
+    merge = """
+    MERGE INTO document_db.s3_documents.document_extractions e
+    USING (
+        SELECT document_id, attribute_name, new_value, new_confidence
+        FROM document_db.s3_documents.extraction_review_audit
+        WHERE review_batch_id = ?
+    ) r
+    ON e.document_id = r.document_id AND e.attribute_name = r.attribute_name
+    WHEN MATCHED THEN UPDATE SET
+        attribute_value = r.new_value,
+        confidence_score = r.new_confidence,
+        reviewed_timestamp = CURRENT_TIMESTAMP()
+    """
+    backend.execute_transaction([
+        (audit_insert, [review_batch_id, action, new_confidence] + params),
+        (merge, [review_batch_id])
+    ])
+    count = backend.sql(
+        "SELECT COUNT(*) AS n FROM document_db.s3_documents.extraction_review_audit WHERE review_batch_id = ?",
+        params=[review_batch_id]
+    ).collect()[0]['N']
+    return count
+
+
+def clear_queue_caches():
+    """Drop cached queue reads after reviews were written"""
+    get_queue_filter_options.clear()
+    get_queue_groups.clear()
+    get_queue_page.clear()
+
+
+def render():
+    """Render the Review Queue page"""
+    st.markdown("""
+    <div class="header-card">
+        <h1>Review Queue</h1>
+        <p>Low-confidence extractions across all documents, lowest confidence first, reviewed a page at a time</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Filters
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        confidence_threshold = st.slider(
+            "Confidence Score Threshold (queue extractions below this value)",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.05
+        )
+    with col2:
+        group_by = st.selectbox("Group by:", options=list(GROUP_BY_OPTIONS.keys()))
+    with col3:
+        page_size = st.selectbox("Items per page:", options=REVIEW_PAGE_SIZES, index=1)
+    
+    class_options, attribute_options = get_queue_filter_options(confidence_threshold)
+    col1, col2 = st.columns(2)
+    with col1:
+        classes = tuple(st.multiselect("Document classes:", options=class_options, placeholder="All classes"))
+    with col2:
+        attributes = tuple(st.multiselect("Attributes:", options=attribute_options, placeholder="All attributes"))
+    
+    # Keyset pagination: the cursor of each visited page, reset whenever the filters change.
+    # The editor version changes with the page shown, so marks never carry over to other items.
+    queue_key = (confidence_threshold, classes, attributes, group_by, page_size)
+    if st.session_state.get('review_queue_key') != queue_key:
+        st.session_state.review_queue_key = queue_key
+        st.session_state.review_queue_cursors = [None]
+        st.session_state.review_queue_mark = None
+        st.session_state.review_queue_version = st.session_state.get('review_queue_version', 0) + 1
+    cursors = st.session_state.review_queue_cursors
+    
+    def show_page(mark=None):
+        st.session_state.review_queue_mark = mark
+        st.session_state.review_queue_version += 1
+        st.rerun()
+    
+    save_result = st.session_state.pop('review_queue_result', None)
+    if save_result:
+        st.success(save_result)
+    
+    # Summary (per group)
+    groups = get_queue_groups(confidence_threshold, classes, attributes, group_by)
+    total_items = int(groups['ITEMS'].sum()) if not groups.empty else 0
+    if total_items == 0:
+        st.info("🎉 No unreviewed extractions below the threshold match these filters")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Items to Review", f"{total_items:,}")
+    with col2:
+        st.metric("Page", len(cursors))
+    with col3:
+        st.metric("Pages", math.ceil(total_items / page_size))
+    
+    if GROUP_BY_OPTIONS[group_by]:
+        st.dataframe(
+            groups,
+            column_config={
+                'ITEMS': st.column_config.NumberColumn('Items', format="%d"),
+                'DOCUMENTS': st.column_config.NumberColumn('Documents', format="%d"),
+                'AVG_CONFIDENCE': st.column_config.NumberColumn('Avg Confidence', format="%.2f")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    st.markdown("---")
+    
+    # Current page: mark each item Approve/Deny (optionally correcting the value), then save the page
+    items = get_queue_page(confidence_threshold, classes, attributes, group_by, cursors[-1], page_size)
+    if items.empty:
+        st.info("No more items on this page")
+    else:
+        review_df = items.copy()
+        review_df.insert(0, 'ACTION', st.session_state.review_queue_mark)
+        edited = st.data_editor(
+            review_df,
+            column_config={
+                'ACTION': st.column_config.SelectboxColumn('Action', options=['approve', 'deny'], width="small"),
+                'DOCUMENT_ID': None,
+                'FILE_NAME': 'Document',
+                'DOCUMENT_CLASS': 'Class',
+                'ATTRIBUTE_NAME': 'Attribute',
+                'ATTRIBUTE_VALUE': st.column_config.TextColumn('Value'),
+                'CONFIDENCE_SCORE': st.column_config.ProgressColumn('Confidence', min_value=0.0, max_value=1.0, format="%.2f")
+            },
+            disabled=['FILE_NAME', 'DOCUMENT_CLASS', 'ATTRIBUTE_NAME', 'CONFIDENCE_SCORE'],
+            use_container_width=True,
+            hide_index=True,
+            key=f"review_queue_editor_{st.session_state.review_queue_version}"
+        )
+        
+        marked = edited[edited['ACTION'].notna()]
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            if st.button("✅ Mark Page Approved", use_container_width=True):
+                show_page(mark='approve')
+        with col2:
+            if st.button(f"💾 Save {len(marked)} Review(s)", type="primary", disabled=marked.empty, use_container_width=True):
+                reviews = {
+                    (row['DOCUMENT_ID'], row['ATTRIBUTE_NAME']): {
+                        'action': row['ACTION'],
+                        'value': (row['ATTRIBUTE_VALUE'] if pd.notna(row['ATTRIBUTE_VALUE']) else None) if row['ACTION'] == 'approve' else None,
+                        'confidence': 1.0 if row['ACTION'] == 'approve' else 0.0
+                    }
+                    for _, row in marked.iterrows()
+                }
+                try:
+                    saved_count = save_extraction_reviews(reviews)
+                    clear_queue_caches()
+                    # Reviewed items leave the queue, so the same cursor now starts at the next items
+                    st.session_state.review_queue_result = f"💾 Saved {saved_count} review(s)"
+                    show_page()
+                except Exception as e:
+                    st.error(f"Error saving reviews: {e}")
+        with col3:
+            if st.button("⬅️ Previous Page", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                show_page()
+        with col4:
+            if st.button("Next Page ➡️", disabled=len(items) < page_size, use_container_width=True):
+                last = items.iloc[-1]
+                cursors.append(tuple(last[column] for _, column in queue_sort_keys(group_by)))
+                show_page()
+    
+    # Bulk actions by filter (set-based: no per-item round trips)
+    st.markdown("---")
+    with st.expander(f"🔧 Bulk Actions on all {total_items:,} matching items"):
+        st.caption("Applies to every unreviewed extraction matching the threshold and filters above, "
+                   "audited and written in one transaction")
+        confirmed = st.checkbox(f"I have checked the filters and want to update {total_items:,} extraction(s)")
+        col1, col2 = st.columns(2)
+        for col, action, label in [(col1, 'approve', "✅ Approve All Matching"), (col2, 'deny', "❌ Deny All Matching")]:
+            with col:
+                if st.button(label, disabled=not confirmed, use_container_width=True):
+                    try:
+                        count = bulk_review_by_filter(confidence_threshold, classes, attributes, action)
+                        clear_queue_caches()
+                        cursors[:] = [None]
+                        st.session_state.review_queue_result = f"{'✅ Approved' if action == 'approve' else '❌ Denied'} {count:,} extraction(s)"
+                        show_page()
+                    except Exception as e:
+                        st.error(f"Error applying bulk review: {e}")
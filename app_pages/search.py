@@ -0,0 +1,421 @@
+"""Document Assistant page: chat over the documents with Cortex Search and COMPLETE"""
+import contextvars
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from app_common import (
+    backend, get_ai_response, get_document_classifications, lexical_overlap_score, tokenize_text
+)
+from query_tracing import trace_cache
+
+
+def clean_document_class(document_class):
+    """Return the label from an AI_CLASSIFY JSON result, or the value unchanged"""
+    if isinstance(document_class, str) and document_class.startswith('{'):
+        try:
+            labels = json.loads(document_class).get('labels') or []
+            return labels[0] if labels else document_class
+        except (ValueError, AttributeError):
+            pass
+    return document_class
+
+SEARCH_COLUMNS = ["chunk_id", "document_id", "file_name", "file_path", "document_class", "chunk_index", "chunk_text"]
+
+# Multi-query search: a question is split into at most MAX_SUB_QUERIES parts that are searched
+# alongside the full question, SEARCH_WORKERS at a time, and the ranked lists are fused
+MAX_SUB_QUERIES = 3
+SEARCH_WORKERS = 4
+RRF_K = 60  # Reciprocal rank fusion: a chunk scores sum(1 / (RRF_K + rank)) over the lists it is in
+
+# "compare A with B", "A versus B"
+COMPARISON_PATTERN = re.compile(
+    r"^\s*(?:compare|contrast)\s+(?P<first>.+?)\s+(?:with|to|and|against|versus|vs\.?)\s+(?P<second>.+)$",
+    re.IGNORECASE
+)
+PART_SEPARATOR = re.compile(r"\s*(?:;|\?\s+|,?\s+\b(?:and also|as well as|and|versus|vs\.?)\b\s+)\s*", re.IGNORECASE)
+# '@scores' keys read from Cortex Search hits, in order of preference
+SEARCH_SCORE_KEYS = ('cosine_similarity', 'text_match')
+
+# Reranking: search hits are re-scored on an absolute 0.0 - 1.0 scale, so the relevance cutoff means
+# the same for every question. Hits with a cosine similarity blend it with their term overlap with the
+# question; hits without one (keyword-only matches, chunks not indexed yet) are scored by term overlap
+# alone, scaled so that a chunk holding every question term ranks with a strong semantic match.
+# Hits under the cutoff are left out of the prompt
+RERANK_LEXICAL_WEIGHT = 0.5
+UNSCORED_LEXICAL_WEIGHT = 0.8
+RERANK_CANDIDATES = 2  # Hits fetched per result kept, so reranking can promote lower-ranked chunks
+
+# Words shared by several class names, which do not identify a class on their own
+GENERIC_CLASS_WORDS = {'report', 'document', 'study'}
+
+def match_document_class(text, class_labels):
+    """The one document class whose distinguishing words all appear in the text, else None"""
+    terms = set(tokenize_text(text))
+    matches = []
+    for label in class_labels:
+        words = set(tokenize_text(label.replace('_', ' '))) - GENERIC_CLASS_WORDS
+        if words and words <= terms:
+            matches.append(label)
+    return matches[0] if len(matches) == 1 else None
+
+def decompose_question(question, class_labels=()):
+    """Sub-queries for a multi-part question, as (query, document class or None) pairs.
+    
+    The full question comes first, followed by its parts; a part that names exactly one document
+    class is filtered to it. Decomposition is rule-based, so it adds no model call before the search.
+    """
+    comparison = COMPARISON_PATTERN.match(question)
+    parts = [comparison.group('first'), comparison.group('second')] if comparison else [question]
+    parts = [piece for part in parts for piece in PART_SEPARATOR.split(part)]
+    
+    sub_queries = [(question, None)]
+    seen = {question.strip(" ?.,").lower()}
+    for part in parts:
+        part = part.strip(" ?.,")
+        if len(tokenize_text(part)) < 2 or part.lower() in seen:
+            continue
+        seen.add(part.lower())
+        sub_queries.append((part, match_document_class(part, class_labels)))
+    return sub_queries[:MAX_SUB_QUERIES + 1]
+
+def search_score(result):
+    """The service's relevance score for a hit (semantic similarity, else keyword match), or None"""
+    scores = result.get('@scores') or {}
+    for key in SEARCH_SCORE_KEYS:
+        if scores.get(key) is not None:
+            return float(scores[key])
+    return None
+
+def search_chunks(query, doc_filter=None, limit=5):
+    """One Cortex Search call, as result dicts. Makes no Streamlit calls, so it can run on a worker thread"""
+    search_filter = {"@eq": {"document_class": doc_filter}} if doc_filter else None
+    return [
+        {
+            'chunk_id': result.get('chunk_id', ''),
+            'document_id': result.get('document_id', ''),
+            'file_name': result.get('file_name', ''),
+            'document_class': result.get('document_class', ''),
+            'chunk_text': result.get('chunk_text', ''),
+            'relevance_score': search_score(result),
+            'semantic_score': (result.get('@scores') or {}).get('cosine_similarity')
+        }
+        for result in backend.search(query, SEARCH_COLUMNS, filter=search_filter, limit=limit)
+    ]
+
+def search_concurrently(sub_queries, limit):
+    """Search each (query, document class) pair on a bounded thread pool; one ranked list per pair.
+    
+    Each search runs in a copy of the caller's context, so the rerun's query trace records it.
+    """
+    with ThreadPoolExecutor(max_workers=min(SEARCH_WORKERS, len(sub_queries))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, search_chunks, query, doc_filter, limit)
+            for query, doc_filter in sub_queries
+        ]
+        return [future.result() for future in futures]
+
+def reciprocal_rank_fusion(ranked_lists, limit, k=RRF_K):
+    """Fuse ranked result lists; relevance_score becomes the chunk's fused score.
+    
+    A chunk found by several queries keeps its best semantic_score.
+    """
+    fused = {}
+    for results in ranked_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(result['chunk_id'], dict(result, relevance_score=0.0))
+            entry['relevance_score'] += 1.0 / (k + rank)
+            if result.get('semantic_score') is not None:
+                entry['semantic_score'] = max(entry.get('semantic_score') or 0.0, float(result['semantic_score']))
+    return sorted(fused.values(), key=lambda result: result['relevance_score'], reverse=True)[:limit]
+
+def rerank_results(question, results):
+    """Rerank hits by term overlap with the question and their cosine similarity.
+    
+    Scores are absolute rather than relative to the best hit, so a list of weak hits stays under the
+    cutoff. Sets each hit's rerank_score (0.0 - 1.0).
+    """
+    query_terms = tokenize_text(question)
+    for result in results:
+        overlap = lexical_overlap_score(query_terms, result['chunk_text'])
+        if result.get('semantic_score') is not None:
+            similarity = min(max(float(result['semantic_score']), 0.0), 1.0)
+            result['rerank_score'] = RERANK_LEXICAL_WEIGHT * overlap + (1 - RERANK_LEXICAL_WEIGHT) * similarity
+        else:
+            result['rerank_score'] = UNSCORED_LEXICAL_WEIGHT * overlap
+    return sorted(results, key=lambda result: result['rerank_score'], reverse=True)
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=60)
+def get_search_index_timestamp():
+    """Get the point in time the Cortex Search index reflects, as a timestamp string.
+    
+    Falls back to one target lag ago when the service does not report a data timestamp.
+    """
+    try:
+        service_info = backend.sql("""
+            DESCRIBE CORTEX SEARCH SERVICE document_db.s3_documents.document_search_service
+        """).to_pandas()
+        service_info.columns = [c.lower() for c in service_info.columns]
+        if 'data_timestamp' in service_info.columns and not service_info.empty \
+                and pd.notna(service_info['data_timestamp'].iloc[0]):
+            return str(service_info['data_timestamp'].iloc[0])
+    except Exception:
+        pass
+    return str(backend.sql("SELECT DATEADD('hour', -1, CURRENT_TIMESTAMP()) AS ts").collect()[0]['TS'])
+
+
+@trace_cache
+@st.cache_data(show_spinner=False, ttl=15)
+def get_unindexed_chunks(indexed_as_of):
+    """Get chunks created after the search index timestamp (not yet searchable via Cortex Search)"""
+    try:
+        # A few minutes of overlap absorbs clock/timezone skew; duplicates are removed by chunk_id
+        return backend.sql(f"""
+            SELECT 
+                chunk_id,
+                document_id,
+                file_name,
+                document_class,
+                chunk_text
+            FROM document_db.s3_documents.document_chunks
+            WHERE created_timestamp > DATEADD('minute', -5, '{indexed_as_of}'::TIMESTAMP_LTZ)::TIMESTAMP_NTZ
+            ORDER BY created_timestamp DESC
+            LIMIT 500
+        """).to_pandas()
+    except Exception:
+        return pd.DataFrame()
+
+def find_unindexed_chunks(query, doc_filter=None, limit=5, min_score=0.0):
+    """Lexically match the question against chunks that Cortex Search has not indexed yet.
+    
+    Only chunks whose rerank score (term overlap times UNSCORED_LEXICAL_WEIGHT) reaches min_score are
+    returned, so a chunk sharing one common word with the question is not bridged in.
+    """
+    delta_df = get_unindexed_chunks(get_search_index_timestamp())
+    if delta_df.empty:
+        return []
+    
+    query_terms = tokenize_text(query)
+    hits = []
+    for _, chunk in delta_df.iterrows():
+        if doc_filter and clean_document_class(chunk['DOCUMENT_CLASS']) != doc_filter:
+            continue
+        score = lexical_overlap_score(query_terms, chunk['CHUNK_TEXT'])
+        if score > 0 and UNSCORED_LEXICAL_WEIGHT * score >= min_score:
+            hits.append({
+                'chunk_id': chunk['CHUNK_ID'],
+                'document_id': chunk['DOCUMENT_ID'],
+                'file_name': chunk['FILE_NAME'],
+                'document_class': chunk['DOCUMENT_CLASS'],
+                'chunk_text': chunk['CHUNK_TEXT'],
+                'relevance_score': score
+            })
+    hits.sort(key=lambda hit: hit['relevance_score'], reverse=True)
+    return hits[:limit]
+
+def merge_search_results(indexed_results, fresh_results):
+    """Indexed hits followed by freshly chunked hits, dropping duplicate chunks.
+    
+    Their order is left to rerank_results(), so fresh chunks get no fixed share of the results.
+    """
+    merged, seen = [], set()
+    for result in indexed_results + fresh_results:
+        if result['chunk_id'] not in seen:
+            seen.add(result['chunk_id'])
+            merged.append(result)
+    return merged
+
+
+def render():
+    """Render the Document Assistant page"""
+    # Professional header for Document Assistant
+    st.markdown("""
+    <div class="header-card">
+        <h1>Document AI Assistant</h1>
+        <p>Ask questions about your documents and get AI-powered answers using Snowflake Cortex AI</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Constants
+    CHAT_MEMORY = 10
+    
+    # Reset chat conversation
+    def reset_conversation():
+        st.session_state.doc_messages = [
+            {
+                "role": "assistant",
+                "content": "Hello! I'm your Document AI Assistant. Ask me anything about your processed documents and I'll search through them to provide you with relevant answers.",
+            }
+        ]
+    
+    # Settings
+    with st.expander("⚙️ Settings"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Get available document classes for filtering
+            class_df = get_document_classifications()
+            class_options = ["All"] + class_df['DOCUMENT_CLASS_CLEAN'].tolist() if not class_df.empty else ["All"]
+            
+            doc_class_filter = st.selectbox(
+                "Filter by document class:",
+                options=class_options,
+                help="Filter search results by document type"
+            )
+        
+        with col2:
+            result_limit = st.number_input(
+                "Max search results:",
+                min_value=1,
+                max_value=20,
+                value=5,
+                help="Maximum number of document chunks to use for context"
+            )
+        
+        min_relevance = st.slider(
+            "Min relevance score:",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.3,
+            step=0.05,
+            help="Reranked chunks scoring below this are not sent to the model (0 keeps all results)"
+        )
+        
+        multi_query = st.checkbox(
+            "Multi-query search",
+            value=False,
+            help="Split multi-part questions (e.g. comparisons) into sub-queries, search them concurrently and fuse the rankings"
+        )
+        
+        st.button("Reset Chat", on_click=reset_conversation)
+    
+    # Helper functions for document search and AI response
+    def find_relevant_documents(query, doc_filter=None, limit=5, multi_query=False, min_score=0.0):
+        """Search for relevant document chunks using Cortex Search"""
+        try:
+            # Fetch extra candidates for the reranking stage to choose from
+            candidates = limit * RERANK_CANDIDATES
+            if multi_query:
+                class_labels = class_df['DOCUMENT_CLASS_CLEAN'].tolist() if not class_df.empty else []
+                sub_queries = [(sub_query, doc_filter or sub_filter)
+                               for sub_query, sub_filter in decompose_question(query, class_labels)]
+            else:
+                sub_queries = [(query, doc_filter)]
+            
+            # Perform the search (document_db.s3_documents.document_search_service) with optional filter
+            if len(sub_queries) > 1:
+                st.caption("Sub-queries: " + " · ".join(
+                    f"{sub_query} [{sub_filter}]" if sub_filter else sub_query for sub_query, sub_filter in sub_queries
+                ))
+                results = reciprocal_rank_fusion(search_concurrently(sub_queries, candidates), candidates)
+            else:
+                results = search_chunks(query, doc_filter, candidates)
+            
+            # Freshness bridge: chunks written since the last index refresh are not in Cortex Search
+            # yet (TARGET_LAG = 1 hour), so match them directly and merge them into the results.
+            # Both lists are reranked together, since rerank scores are on one absolute scale
+            fresh_results = find_unindexed_chunks(query, doc_filter, candidates, min_score)
+            reranked = rerank_results(query, merge_search_results(results, fresh_results))
+            
+            # Score cutoff: marginal chunks are left out of the prompt
+            results = [result for result in reranked if result['rerank_score'] >= min_score][:limit]
+            if reranked:
+                st.caption(f"Reranked {len(reranked)} hits: kept {len(results)} with score ≥ {min_score:.2f}")
+            
+            if results:
+                # Show which documents were found
+                doc_names = list(set([doc['file_name'] for doc in results if doc['file_name']]))
+                st.info(f"📄 Found relevant content in: {', '.join(doc_names[:3])}{'...' if len(doc_names) > 3 else ''}")
+                
+                return results
+            else:
+                st.warning("No relevant documents found for your query.")
+                return []
+                
+        except Exception as e:
+            error_msg = str(e)
+            if "does not exist" in error_msg or "404" in error_msg:
+                st.error(f"""
+                🚨 **Cortex Search Service Not Found**
+                
+                The search service `document_db.s3_documents.document_search_service` doesn't exist or isn't accessible.
+                
+                **Possible solutions:**
+                1. **Check if the service exists:** Run `SHOW CORTEX SEARCH SERVICES;` in SQL
+                2. **Create the service:** Execute the pipeline setup SQL to create the search service
+                3. **Check permissions:** Ensure your role has access to the `document_db.s3_documents` schema
+                4. **Verify data:** Make sure document chunks exist in `document_db.s3_documents.document_chunks`
+                
+                **Error details:** {error_msg}
+                """)
+            else:
+                st.error(f"Error searching documents: {error_msg}")
+            return []
+    
+    # Initialize chat messages
+    if "doc_messages" not in st.session_state:
+        reset_conversation()
+    
+    # Chat input
+    if user_message := st.chat_input("Ask me about your documents..."):
+        st.session_state.doc_messages.append({"role": "user", "content": user_message})
+    
+    # Display chat messages
+    for message in st.session_state.doc_messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    
+    # Generate response if last message was from user
+    if st.session_state.doc_messages[-1]["role"] != "assistant":
+        user_question = st.session_state.doc_messages[-1]["content"]
+        
+        with st.chat_message("assistant"):
+            with st.status("🔍 Searching documents and generating response...", expanded=True) as status:
+                st.write("🔎 Searching through your documents...")
+                
+                # Find relevant documents
+                relevant_docs = find_relevant_documents(
+                    user_question, 
+                    doc_class_filter if doc_class_filter != "All" else None,
+                    result_limit,
+                    multi_query,
+                    min_relevance
+                )
+                
+                if not relevant_docs:
+                    response = "I couldn't find any relevant documents to answer your question. Please try rephrasing your query or check if documents have been processed."
+                    st.markdown(response)
+                else:
+                    st.write("🤖 Generating AI response based on document content...")
+                    
+                    # Generate AI response
+                    response = get_ai_response(user_question, relevant_docs)
+                    
+                    status.update(label="✅ Complete!", state="complete", expanded=False)
+            
+            # Display the response
+            st.markdown("### 💬 Answer:")
+            st.markdown(response)
+            
+            # Show source documents used
+            if relevant_docs:
+                st.markdown("### 📚 Sources Used:")
+                for i, doc in enumerate(relevant_docs):
+                    with st.expander(f"📄 {doc['file_name']} (Relevance: {doc['rerank_score']:.3f})"):
+                        st.markdown(f"**Document Class:** {doc['document_class']}")
+                        st.markdown(f"**Content:**")
+                        st.text_area(
+                            "Document content",
+                            doc['chunk_text'],
+                            height=150,
+                            disabled=True,
+                            key=f"doc_context_{i}"
+                        )
+        
+        # Add assistant response to chat history
+        st.session_state.doc_messages.append({"role": "assistant", "content": response})
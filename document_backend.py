@@ -0,0 +1,123 @@
+"""
+Data backends for the Document AI dashboard.
+
+The dashboard reaches Snowflake only through a backend: SQL queries, pipeline procedure calls,
+Cortex Search and Cortex COMPLETE. SnowflakeBackend wraps the active Snowpark session.
+LocalBackend (local_backend.py) runs the same queries on DuckDB with deterministic stand-ins for
+the AI functions, so the app can be run, profiled and load-tested on a laptop without credits.
+
+Backend selection: DOC_APP_BACKEND=local|snowflake, otherwise Snowflake when a Snowpark session
+is active and local when it is not.
+"""
+import os
+
+DATABASE = "document_db"
+SCHEMA = "s3_documents"
+SEARCH_SERVICE = "document_search_service"
+
+
+class DocumentBackend:
+    """Interface used by the dashboard for all data access"""
+    name = "base"
+
+    def sql(self, query, params=None):
+        """SQL statement (qmark params); like Snowpark, it runs on .to_pandas() or .collect()"""
+        raise NotImplementedError
+
+    def execute_transaction(self, statements):
+        """Run (query, params) statements in one transaction, rolling back if any fails"""
+        raise NotImplementedError
+
+    def call_procedure(self, procedure_name, *args):
+        """Call a pipeline stored procedure in document_db.s3_documents and return its result"""
+        raise NotImplementedError
+
+    def search(self, query, columns, filter=None, limit=5):
+        """Query the document search service, returning one dict per result with the requested columns
+        (and the service's '@scores' when it reports them)"""
+        raise NotImplementedError
+
+    def complete(self, model, prompt):
+        """Generate a completion for the prompt"""
+        raise NotImplementedError
+
+
+class SnowflakeBackend(DocumentBackend):
+    """Backend for Streamlit in Snowflake, using the active Snowpark session"""
+    name = "snowflake"
+
+    def __init__(self, session):
+        self.session = session
+        self._root = None
+
+    @property
+    def root(self):
+        """snowflake.core Root, imported on first use: only Cortex Search needs it"""
+        if self._root is None:
+            from snowflake.core import Root  # requires snowflake>=0.8.0
+            self._root = Root(self.session)
+        return self._root
+
+    def sql(self, query, params=None):
+        return self.session.sql(query, params=params)
+
+    def execute_transaction(self, statements):
+        self.session.sql("BEGIN TRANSACTION").collect()
+        try:
+            results = [self.session.sql(query, params=params).collect() for query, params in statements]
+        except Exception:
+            self.session.sql("ROLLBACK").collect()
+            raise
+        self.session.sql("COMMIT").collect()
+        return results
+
+    def call_procedure(self, procedure_name, *args):
+        return self.session.call(f"{DATABASE}.{SCHEMA}.{procedure_name}", *args)
+
+    def search(self, query, columns, filter=None, limit=5):
+        cortex_search_service = (
+            self.root.databases[DATABASE]
+            .schemas[SCHEMA]
+            .cortex_search_services[SEARCH_SERVICE]
+        )
+        if filter:
+            search_response = cortex_search_service.search(query=query, columns=columns, filter=filter, limit=limit)
+        else:
+            search_response = cortex_search_service.search(query=query, columns=columns, limit=limit)
+        if search_response and hasattr(search_response, 'results'):
+            return list(search_response.results)
+        return []
+
+    def complete(self, model, prompt):
+        return self.session.sql(
+            "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS response",
+            params=[model, prompt]
+        ).collect()[0][0]
+
+
+_local_backend = None
+
+
+def get_local_backend():
+    """Process-wide LocalBackend, built and seeded from demo_docs on first use"""
+    global _local_backend
+    if _local_backend is None:
+        from local_backend import LocalBackend
+        _local_backend = LocalBackend()
+    return _local_backend
+
+
+def get_backend():
+    """Select the backend from DOC_APP_BACKEND, or from whether a Snowpark session is active"""
+    backend_name = os.environ.get("DOC_APP_BACKEND", "").strip().lower()
+    if backend_name == "local":
+        return get_local_backend()
+
+    try:
+        from snowflake.snowpark.context import get_active_session
+        session = get_active_session()
+    except Exception:
+        if backend_name == "snowflake":
+            raise
+        return get_local_backend()
+    return SnowflakeBackend(session)
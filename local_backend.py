@@ -0,0 +1,1345 @@
+"""
+Local DuckDB backend for the Document AI dashboard.
+
+Recreates the document_db.s3_documents tables in an in-memory DuckDB database and seeds them by
+running the pipeline over demo_docs. The dashboard's Snowflake SQL is executed after rewriting the
+few Snowflake-specific constructs it uses (semi-structured paths, casts, DATEADD/IFF, stage
+references); SHOW/DESCRIBE/ALTER/CALL statements are answered in Python.
+
+The AI functions are replaced with deterministic stand-ins, so repeated runs return identical
+results and timings can be compared between changes:
+- AI_PARSE_DOCUMENT: text extraction (pypdfium2 for PDF, zip XML for DOCX/PPTX, raw TXT/HTML)
+- AI_CLASSIFY: keyword scoring over the file path and content
+- AI_EXTRACT: best matching line for each extraction prompt, confidence = term overlap
+- Cortex Search: lexical TF-IDF ranking over document_chunks, reported as the text_match score
+- COMPLETE: the context sentences that best match the question
+
+Usage: DOC_APP_BACKEND=local streamlit run streamlit_document_assistant.py
+Requires duckdb and pandas; pypdfium2 and pillow enable PDF text and page previews.
+"""
+import hashlib
+import html
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from document_backend import DocumentBackend, DATABASE, SCHEMA
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEMO_DOCS_DIR = os.path.join(BASE_DIR, "demo_docs")
+PIPELINE_SETUP_SQL = os.path.join(BASE_DIR, "02_document_pipeline_setup.sql")
+
+SUPPORTED_EXTENSIONS = {
+    '.pdf': 'pdf', '.docx': 'docx', '.pptx': 'pptx', '.jpg': 'jpeg', '.jpeg': 'jpeg',
+    '.png': 'png', '.tiff': 'tiff', '.tif': 'tiff', '.html': 'html', '.txt': 'txt'
+}
+
+DOCUMENT_CLASSES = [
+    'w2', 'vendor_contract', 'sales_report', 'marketing_report', 'hr_policy',
+    'corporate_policy', 'financial_infographic', 'case_study', 'strategy_document', 'other'
+]
+
+# Keywords scored by the AI_CLASSIFY stand-in (matches in the file path count three times)
+CLASS_KEYWORDS = {
+    'w2': ['w2', 'w-2', 'wage and tax', 'wages', 'employer identification'],
+    'vendor_contract': ['contract', 'vendor', 'agreement', 'statement of work', 'termination'],
+    'sales_report': ['sales', 'revenue', 'pipeline', 'quota', 'bookings'],
+    'marketing_report': ['marketing', 'campaign', 'impressions', 'click-through', 'conversion'],
+    'hr_policy': ['hr', 'employee', 'handbook', 'performance review', 'benefits'],
+    'corporate_policy': ['policy', 'policies', 'expense', 'reimbursement', 'compliance'],
+    'financial_infographic': ['infographic', 'financial', 'margin', 'quarter', 'net revenue retention'],
+    'case_study': ['case study', 'success stor', 'customer story', 'challenge', 'outcome'],
+    'strategy_document': ['strategy', 'roadmap', 'initiative', 'objectives', 'kpi'],
+}
+
+# Seed data shared with the Snowflake deployment, read from the setup script
+SEED_TABLES = (
+    'extraction_prompts', 'extraction_settings', 'chunking_profiles', 'classification_rules',
+    'classification_sampling_profiles'
+)
+# Python UDFs whose handler code runs as-is, read from the setup script: name -> (handler, DuckDB argument types)
+SHARED_PYTHON_UDFS = {
+    'sample_classification_input': ('sample', ['VARCHAR', 'VARCHAR', 'BIGINT', 'BIGINT']),
+}
+
+TASKS = [
+    ('PARSE_DOCUMENTS_TASK', 'started', "SYSTEM$STREAM_HAS_DATA('document_db.s3_documents.new_documents_stream')", None),
+    ('CLASSIFY_DOCUMENTS_TASK', 'started', None, None),
+    ('EXTRACT_DOCUMENTS_TASK', 'started', None, None),
+    ('CHUNK_DOCUMENTS_TASK', 'started', None, None),
+    ('RECHUNK_DOCUMENTS_TASK', 'started', None, '30 MINUTES'),
+    ('ATTRIBUTE_COSTS_TASK', 'started', None, 'USING CRON 0 */6 * * * UTC'),
+    ('REFRESH_ANALYTICS_ROLLUP_TASK', 'started', None, None),
+    ('REFRESH_COST_CACHE_TASK', 'started', None, 'USING CRON 30 */6 * * * UTC'),
+    ('BACKFILL_DOCUMENT_ATTRIBUTES_TASK', 'started', None, '30 MINUTES'),
+    ('PARSE_DOCUMENTS_RECOVERY_TASK', 'started', None, '60 MINUTES'),
+]
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'did', 'do', 'does', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our', 'that', 'the',
+    'their', 'there', 'this', 'to', 'was', 'we', 'were', 'what', 'when', 'where', 'which',
+    'who', 'why', 'will', 'with', 'you', 'your', 'document', 'shown', 'listed', 'stated'
+}
+
+LOCAL_SCHEMA_SQL = f"""
+CREATE SCHEMA IF NOT EXISTS {DATABASE}.{SCHEMA};
+
+CREATE TABLE {DATABASE}.{SCHEMA}.stage_files (
+  relative_path VARCHAR PRIMARY KEY,
+  size BIGINT,
+  last_modified TIMESTAMP,
+  file_url VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.parse_work_queue (
+  file_path VARCHAR PRIMARY KEY,
+  file_size BIGINT,
+  file_url VARCHAR,
+  status VARCHAR DEFAULT 'pending',
+  attempts INTEGER DEFAULT 0,
+  batch_id VARCHAR,
+  document_id VARCHAR,
+  error_message VARCHAR,
+  enqueued_timestamp TIMESTAMP DEFAULT localtimestamp,
+  claimed_timestamp TIMESTAMP,
+  completed_timestamp TIMESTAMP
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.parse_queue_continuations (
+  batch_id VARCHAR,
+  files_processed INTEGER,
+  files_remaining INTEGER,
+  continuation_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+-- Directory stream stand-in: staged files that have not been queued for parsing yet
+CREATE VIEW {DATABASE}.{SCHEMA}.new_documents_stream AS
+SELECT s.relative_path, s.size, s.last_modified, s.file_url, 'INSERT' AS "METADATA$ACTION"
+FROM {DATABASE}.{SCHEMA}.stage_files s
+WHERE s.relative_path NOT IN (SELECT file_path FROM {DATABASE}.{SCHEMA}.parse_work_queue);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.parsed_documents (
+  document_id VARCHAR PRIMARY KEY,
+  file_name VARCHAR NOT NULL,
+  file_path VARCHAR NOT NULL,
+  file_size BIGINT,
+  file_url VARCHAR,
+  document_type VARCHAR,
+  parsed_content JSON,
+  content_text VARCHAR,
+  parse_timestamp TIMESTAMP DEFAULT localtimestamp,
+  status VARCHAR DEFAULT 'parsed'
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.document_classifications (
+  document_id VARCHAR PRIMARY KEY,
+  file_name VARCHAR NOT NULL,
+  file_path VARCHAR NOT NULL,
+  file_size BIGINT,
+  file_url VARCHAR,
+  document_type VARCHAR,
+  parsed_content JSON,
+  document_class VARCHAR,
+  classification_timestamp TIMESTAMP DEFAULT localtimestamp,
+  classification_method VARCHAR,
+  rule_id VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.document_extractions (
+  document_id VARCHAR,
+  file_name VARCHAR,
+  file_path VARCHAR,
+  document_class VARCHAR,
+  attribute_name VARCHAR,
+  attribute_value VARCHAR,
+  confidence_score DOUBLE,
+  extraction_json JSON,
+  extraction_input_mode VARCHAR,
+  extraction_timestamp TIMESTAMP DEFAULT localtimestamp,
+  reviewed_timestamp TIMESTAMP,
+  prompt_hash VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.extraction_prompts (
+  document_class VARCHAR,
+  attribute_name VARCHAR,
+  question_text VARCHAR,
+  prompt_hash VARCHAR,
+  prompt_version INTEGER DEFAULT 1,
+  updated_timestamp TIMESTAMP DEFAULT localtimestamp,
+  PRIMARY KEY (document_class, attribute_name)
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.extraction_settings (
+  document_class VARCHAR PRIMARY KEY,
+  input_mode VARCHAR DEFAULT 'text',
+  max_text_chars INTEGER DEFAULT 100000,
+  comment VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.classification_rules (
+  rule_id VARCHAR PRIMARY KEY,
+  document_class VARCHAR NOT NULL,
+  rule_type VARCHAR NOT NULL,
+  pattern VARCHAR NOT NULL,
+  match_chars INTEGER DEFAULT 2000,
+  confidence DOUBLE NOT NULL,
+  enabled BOOLEAN DEFAULT TRUE,
+  comment VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.classification_sampling_profiles (
+  document_type VARCHAR PRIMARY KEY,
+  sample_mode VARCHAR DEFAULT 'prefix',
+  max_chars INTEGER DEFAULT 8000,
+  edge_pages INTEGER DEFAULT 2,
+  comment VARCHAR
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.chunking_profiles (
+  document_class VARCHAR PRIMARY KEY,
+  chunk_size INTEGER NOT NULL,
+  chunk_overlap INTEGER NOT NULL,
+  separators JSON,
+  text_format VARCHAR DEFAULT 'none',
+  profile_version INTEGER DEFAULT 1,
+  updated_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.document_chunks (
+  chunk_id VARCHAR PRIMARY KEY,
+  document_id VARCHAR NOT NULL,
+  file_name VARCHAR,
+  file_path VARCHAR,
+  document_class VARCHAR,
+  chunk_index INTEGER,
+  chunk_text VARCHAR,
+  chunk_size INTEGER,
+  chunk_profile_class VARCHAR,
+  chunk_profile_version INTEGER,
+  created_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.pipeline_query_log (
+  query_id VARCHAR,
+  document_id VARCHAR,
+  pipeline_stage VARCHAR,
+  logged_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.rechunk_failures (
+  document_id VARCHAR,
+  profile_class VARCHAR,
+  profile_version INTEGER,
+  attempts INTEGER DEFAULT 0,
+  last_attempt_timestamp TIMESTAMP DEFAULT localtimestamp,
+  PRIMARY KEY (document_id, profile_class, profile_version)
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.attribute_backfill_failures (
+  document_id VARCHAR,
+  attribute_name VARCHAR,
+  prompt_hash VARCHAR,
+  attempts INTEGER DEFAULT 0,
+  last_attempt_timestamp TIMESTAMP DEFAULT localtimestamp,
+  PRIMARY KEY (document_id, attribute_name, prompt_hash)
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.extraction_review_audit (
+  review_batch_id VARCHAR,
+  document_id VARCHAR,
+  attribute_name VARCHAR,
+  review_action VARCHAR,
+  previous_value VARCHAR,
+  previous_confidence DOUBLE,
+  new_value VARCHAR,
+  new_confidence DOUBLE,
+  reviewed_by VARCHAR DEFAULT current_user,
+  reviewed_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.batch_qa_results (
+  run_id VARCHAR,
+  document_id VARCHAR,
+  file_name VARCHAR,
+  document_class VARCHAR,
+  question VARCHAR,
+  answer VARCHAR,
+  status VARCHAR,
+  attempts INTEGER,
+  error_message VARCHAR,
+  elapsed_ms INTEGER,
+  model_name VARCHAR,
+  answered_by VARCHAR DEFAULT current_user,
+  answered_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.document_cost_attribution (
+  query_id VARCHAR,
+  document_id VARCHAR,
+  pipeline_stage VARCHAR,
+  function_name VARCHAR,
+  model_name VARCHAR,
+  credits DOUBLE,
+  tokens BIGINT,
+  pages_processed BIGINT,
+  elapsed_ms BIGINT,
+  query_start_time TIMESTAMP,
+  attributed_timestamp TIMESTAMP DEFAULT localtimestamp
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.cost_daily_cache (
+  usage_date DATE,
+  source VARCHAR,
+  service_type VARCHAR,
+  name VARCHAR,
+  credits DOUBLE,
+  tokens BIGINT,
+  call_count BIGINT,
+  cached_timestamp TIMESTAMP DEFAULT localtimestamp,
+  PRIMARY KEY (usage_date, source, service_type, name)
+);
+
+CREATE TABLE {DATABASE}.{SCHEMA}.analytics_daily_rollup (
+  rollup_date DATE,
+  metric VARCHAR,
+  dimension_value VARCHAR,
+  item_count BIGINT,
+  updated_timestamp TIMESTAMP DEFAULT localtimestamp,
+  PRIMARY KEY (rollup_date, metric, dimension_value)
+);
+
+-- Materialized view stand-in
+CREATE VIEW {DATABASE}.{SCHEMA}.extraction_review_queue AS
+SELECT document_id, file_name, document_class, attribute_name, attribute_value, confidence_score, extraction_timestamp
+FROM {DATABASE}.{SCHEMA}.document_extractions
+WHERE reviewed_timestamp IS NULL;
+
+-- Dynamic table stand-in: a view is always current, so REFRESH is a no-op
+CREATE VIEW {DATABASE}.{SCHEMA}.document_processing_summary AS
+WITH parsed_extractions AS (
+    SELECT document_id, attribute_name, attribute_value,
+           TRY_CAST(attribute_value AS JSON) AS attribute_json,
+           confidence_score, extraction_timestamp
+    FROM {DATABASE}.{SCHEMA}.document_extractions
+),
+flattened_extractions AS (
+    SELECT document_id, attribute_name, attribute_value, confidence_score, extraction_timestamp
+    FROM parsed_extractions
+    WHERE attribute_json IS NULL OR json_type(attribute_json) != 'OBJECT'
+    UNION ALL
+    SELECT pe.document_id, k.key, json_extract_string(pe.attribute_json, '/' || k.key),
+           pe.confidence_score, pe.extraction_timestamp
+    FROM parsed_extractions pe, unnest(json_keys(pe.attribute_json)) AS k(key)
+    WHERE json_type(pe.attribute_json) = 'OBJECT'
+)
+SELECT
+    dc.document_id,
+    dc.file_name,
+    dc.file_path,
+    dc.document_type,
+    COALESCE(json_extract_string(TRY_CAST(dc.document_class AS JSON), '$.labels[0]'), dc.document_class) AS document_classification,
+    fe.attribute_name,
+    fe.attribute_value,
+    fe.confidence_score,
+    dc.classification_timestamp,
+    fe.extraction_timestamp
+FROM {DATABASE}.{SCHEMA}.document_classifications dc
+LEFT JOIN flattened_extractions fe ON dc.document_id = fe.document_id;
+
+CREATE VIEW {DATABASE}.{SCHEMA}.document_costs AS
+WITH document_stage_costs AS (
+    SELECT
+        document_id,
+        SUM(credits) AS total_credits,
+        SUM(CASE WHEN pipeline_stage = 'parse' THEN credits ELSE 0 END) AS parse_credits,
+        SUM(CASE WHEN pipeline_stage = 'classify' THEN credits ELSE 0 END) AS classify_credits,
+        SUM(CASE WHEN pipeline_stage = 'extract' THEN credits ELSE 0 END) AS extract_credits,
+        SUM(tokens) AS tokens,
+        SUM(elapsed_ms) AS ai_elapsed_ms,
+        COUNT(DISTINCT query_id) AS ai_queries
+    FROM {DATABASE}.{SCHEMA}.document_cost_attribution
+    GROUP BY document_id
+)
+SELECT
+    pd.document_id,
+    pd.file_name,
+    pd.document_type,
+    COALESCE(json_extract_string(TRY_CAST(dc.document_class AS JSON), '$.labels[0]'), dc.document_class) AS document_class,
+    pd.file_size,
+    CAST(json_extract_string(pd.parsed_content, '$.metadata.pageCount') AS INTEGER) AS page_count,
+    c.total_credits,
+    c.parse_credits,
+    c.classify_credits,
+    c.extract_credits,
+    c.total_credits / NULLIF(CAST(json_extract_string(pd.parsed_content, '$.metadata.pageCount') AS INTEGER), 0) AS credits_per_page,
+    c.total_credits / NULLIF(pd.file_size / 1048576, 0) AS credits_per_mb,
+    c.tokens,
+    c.ai_elapsed_ms,
+    c.ai_queries,
+    pd.parse_timestamp
+FROM document_stage_costs c
+JOIN {DATABASE}.{SCHEMA}.parsed_documents pd ON c.document_id = pd.document_id
+LEFT JOIN {DATABASE}.{SCHEMA}.document_classifications dc ON c.document_id = dc.document_id;
+
+CREATE VIEW {DATABASE}.{SCHEMA}.document_class_costs AS
+SELECT
+    COALESCE(document_class, 'unclassified') AS document_class,
+    COUNT(*) AS documents,
+    SUM(page_count) AS pages,
+    SUM(total_credits) AS total_credits,
+    SUM(parse_credits) AS parse_credits,
+    SUM(classify_credits) AS classify_credits,
+    SUM(extract_credits) AS extract_credits,
+    AVG(total_credits) AS avg_credits_per_document,
+    SUM(total_credits) / NULLIF(SUM(page_count), 0) AS credits_per_page,
+    MAX(total_credits) AS max_document_credits
+FROM {DATABASE}.{SCHEMA}.document_costs
+GROUP BY COALESCE(document_class, 'unclassified');
+
+-- ACCOUNT_USAGE stand-ins: no usage is billed locally
+CREATE SCHEMA IF NOT EXISTS snowflake.account_usage;
+
+CREATE TABLE snowflake.account_usage.metering_history (
+  service_type VARCHAR, name VARCHAR, start_time TIMESTAMP, end_time TIMESTAMP, credits_used DOUBLE
+);
+
+CREATE TABLE snowflake.account_usage.cortex_functions_usage_history (
+  start_time TIMESTAMP, end_time TIMESTAMP, function_name VARCHAR, model_name VARCHAR,
+  warehouse_id BIGINT, token_credits DOUBLE, tokens BIGINT
+);
+
+CREATE TABLE snowflake.account_usage.cortex_search_daily_usage_history (
+  usage_date DATE, database_name VARCHAR, schema_name VARCHAR, service_name VARCHAR,
+  service_id BIGINT, consumption_type VARCHAR, credits DOUBLE, tokens BIGINT, model_name VARCHAR
+);
+"""
+
+# Snowflake SQL macros used by the dashboard, defined in DuckDB
+LOCAL_MACROS_SQL = """
+CREATE MACRO iff(condition, true_value, false_value) AS CASE WHEN condition THEN true_value ELSE false_value END;
+CREATE MACRO nvl(value, default_value) AS COALESCE(value, default_value);
+CREATE MACRO try_parse_json(value) AS TRY_CAST(value AS JSON);
+CREATE MACRO parse_json(value) AS CAST(value AS JSON);
+CREATE MACRO dateadd(part, amount, ts) AS CAST(ts AS TIMESTAMP) + CASE lower(part)
+    WHEN 'second' THEN to_seconds(CAST(amount AS BIGINT))
+    WHEN 'minute' THEN to_minutes(CAST(amount AS BIGINT))
+    WHEN 'hour' THEN to_hours(CAST(amount AS BIGINT))
+    WHEN 'day' THEN to_days(CAST(amount AS INTEGER))
+    WHEN 'week' THEN to_weeks(CAST(amount AS INTEGER))
+    WHEN 'month' THEN to_months(CAST(amount AS INTEGER))
+    WHEN 'year' THEN to_years(CAST(amount AS INTEGER))
+END;
+CREATE MACRO sha2(value, digest_size) AS sha256(value);
+CREATE MACRO startswith(value, prefix) AS starts_with(value, prefix);
+"""
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+LITERAL_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+IDENTIFIER_PATH = re.compile(
+    r"(?<![:\w.$])(?P<base>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?)(?P<path>(?::[A-Za-z_]\w*(?:\[\d+\])*)+)"
+)
+CALL_PATH = re.compile(r"\)(?P<path>(?::[A-Za-z_]\w*(?:\[\d+\])*)+)")
+CALL_STATEMENT = re.compile(r"^CALL\s+(?:\w+\.)*(?P<name>\w+)\s*\((?P<args>.*)\)\s*$", re.IGNORECASE | re.DOTALL)
+CAST_REWRITES = [
+    (re.compile(r"::\s*STRING\b", re.IGNORECASE), "::VARCHAR"),
+    (re.compile(r"::\s*TEXT\b", re.IGNORECASE), "::VARCHAR"),
+    (re.compile(r"::\s*TIMESTAMP_(?:LTZ|NTZ|TZ)\b", re.IGNORECASE), "::TIMESTAMP"),
+    (re.compile(r"::\s*NUMBER\b", re.IGNORECASE), "::DOUBLE"),
+    (re.compile(r"::\s*VARIANT\b", re.IGNORECASE), "::JSON"),
+]
+LOCAL_FUNCTIONS = ('pdf_page_count', 'render_pdf_page_png', 'sample_classification_input')
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [t for t in WORD_PATTERN.findall(str(text or '').lower()) if t not in STOPWORDS]
+
+
+def stable_hash(value):
+    """Process-independent hash (Python's hash() is salted per process)"""
+    return int(hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:12], 16)
+
+
+def snowflake_path_to_json_path(path):
+    """':metadata:pageCount' -> '$.metadata.pageCount'"""
+    return '$' + path.replace(':', '.')
+
+
+def translate_sql(query):
+    """Rewrite the Snowflake SQL used by the dashboard into DuckDB SQL"""
+    literals = []
+
+    def mask(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    sql = STRING_LITERAL.sub(mask, query.strip().rstrip(';'))
+
+    # Unquoted stage references (BUILD_SCOPED_FILE_URL(@stage, ...)) become string arguments
+    sql = re.sub(r"(?<!')@((?:\w+\.){0,2}\w+)", r"'@\1'", sql)
+    sql = re.sub(
+        rf"\b{DATABASE}\.{SCHEMA}\.({'|'.join(LOCAL_FUNCTIONS)})\s*\(", r"\1(", sql, flags=re.IGNORECASE
+    )
+    sql = re.sub(r"\bSNOWFLAKE\.CORTEX\.COMPLETE\s*\(", "cortex_complete(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURRENT_TIMESTAMP\b(?:\s*\(\s*\))?", "localtimestamp", sql, flags=re.IGNORECASE)
+    for pattern, replacement in CAST_REWRITES:
+        sql = pattern.sub(replacement, sql)
+
+    # Semi-structured paths: col:a:b -> json_extract_string(col, '$.a.b'), also after a call f(x):a
+    sql = IDENTIFIER_PATH.sub(
+        lambda m: f"json_extract_string({m.group('base')}, '{snowflake_path_to_json_path(m.group('path'))}')", sql
+    )
+    match = CALL_PATH.search(sql)
+    while match:
+        close = match.start()
+        depth, open_index = 0, close
+        for open_index in range(close, -1, -1):
+            depth += {')': 1, '(': -1}.get(sql[open_index], 0)
+            if depth == 0:
+                break
+        name_match = re.search(r"[\w.]*$", sql[:open_index])
+        start = name_match.start() if name_match else open_index
+        expression = sql[start:close + 1]
+        json_path = snowflake_path_to_json_path(match.group('path'))
+        sql = f"{sql[:start]}json_extract_string({expression}, '{json_path}'){sql[match.end():]}"
+        match = CALL_PATH.search(sql)
+
+    return LITERAL_PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], sql)
+
+
+def parse_call_arguments(args_text, params=None):
+    """Parse procedure arguments: literals ('text', 25, 1.5, TRUE, NULL) or qmark placeholders"""
+    args = []
+    params = iter(params or [])
+    for token in re.findall(r"'(?:[^']|'')*'|[^,\s][^,]*", args_text):
+        token = token.strip()
+        if token == '?':
+            args.append(next(params))
+        elif token.startswith("'"):
+            args.append(token[1:-1].replace("''", "'"))
+        elif token.upper() == 'NULL':
+            args.append(None)
+        elif token.upper() in ('TRUE', 'FALSE'):
+            args.append(token.upper() == 'TRUE')
+        else:
+            args.append(float(token) if '.' in token else int(token))
+    return args
+
+
+class LocalRow(tuple):
+    """Snowpark-style row: index by position or by (case-insensitive) column name"""
+    def __new__(cls, values, fields):
+        row = super().__new__(cls, values)
+        row._fields = [str(f).upper() for f in fields]
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._fields.index(key.upper()))
+        return tuple.__getitem__(self, key)
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+
+class LocalResult:
+    """Snowpark DataFrame stand-in: the statement runs when the result is fetched"""
+    def __init__(self, execute):
+        self._execute = execute
+
+    def to_pandas(self):
+        return self._execute()
+
+    def collect(self):
+        frame = self._execute()
+        columns = list(frame.columns)
+        return [LocalRow(values, columns) for values in frame.itertuples(index=False, name=None)]
+
+
+class LocalBackend(DocumentBackend):
+    """DuckDB backend seeded from demo_docs, with deterministic AI stand-ins"""
+    name = "local"
+
+    def __init__(self, docs_dir=DEMO_DOCS_DIR, database=":memory:", seed=True):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The local backend requires duckdb (pip install duckdb)") from e
+
+        self.docs_dir = os.path.abspath(docs_dir)
+        self.export_dir = os.path.join(tempfile.gettempdir(), 'document_db_export_stage')
+        self.con = duckdb.connect(database)
+        self._lock = threading.RLock()
+        self._procedures = {
+            'parse_new_documents': self.parse_new_documents,
+            'classify_parsed_documents': self.classify_parsed_documents,
+            'extract_attributes_for_classified_documents': self.extract_attributes_for_classified_documents,
+            'chunk_classified_documents': self.chunk_classified_documents,
+            'chunk_document': self.chunk_document,
+            'rechunk_stale_documents': self.rechunk_stale_documents,
+            'backfill_changed_attributes': self.backfill_changed_attributes,
+            'attribute_document_costs': self.attribute_document_costs,
+            'refresh_analytics_rollup': self.refresh_analytics_rollup,
+            'export_processing_summary': self.export_processing_summary,
+            'refresh_cost_daily_cache': self.refresh_cost_daily_cache,
+        }
+
+        with self._lock:
+            self.con.execute(f"ATTACH ':memory:' AS {DATABASE}")
+            self.con.execute("ATTACH ':memory:' AS snowflake")
+            self.con.execute(LOCAL_MACROS_SQL)
+            self.con.execute(LOCAL_SCHEMA_SQL)
+            self._register_functions()
+            self._load_seed_data()
+
+        if seed:
+            self.run_pipeline()
+
+    # ─────────────────────────────────────────────────────────
+    # DocumentBackend interface
+    # ─────────────────────────────────────────────────────────
+    def sql(self, query, params=None):
+        return LocalResult(lambda: self._execute(query, params))
+
+    def _execute(self, query, params=None):
+        """Run one statement and return its result as a DataFrame"""
+        statement = query.strip().rstrip(';').strip()
+        keyword = statement.split(None, 1)[0].upper() if statement else ''
+
+        if keyword == 'CALL':
+            match = CALL_STATEMENT.match(statement)
+            if not match:
+                raise ValueError(f"Unsupported CALL statement: {statement}")
+            result = self.call_procedure(match.group('name'), *parse_call_arguments(match.group('args'), params))
+            if isinstance(result, pd.DataFrame):
+                # Table procedure
+                return result
+            return pd.DataFrame({match.group('name').upper(): [result]})
+        if keyword == 'SHOW':
+            return self._show(statement)
+        if keyword in ('DESCRIBE', 'DESC'):
+            return self._describe(statement)
+        if keyword == 'ALTER':
+            # Tasks, dynamic table refreshes and session settings have no local equivalent
+            return pd.DataFrame({'status': ['Statement executed successfully.']})
+
+        with self._lock:
+            cursor = self.con.execute(translate_sql(statement), params or [])
+            frame = cursor.df() if cursor.description else pd.DataFrame()
+        frame.columns = [str(c).upper() for c in frame.columns]
+        return frame
+
+    def execute_transaction(self, statements):
+        with self._lock:
+            self.con.execute("BEGIN TRANSACTION")
+            try:
+                results = [LocalResult(lambda q=query, p=params: self._execute(q, p)).collect()
+                           for query, params in statements]
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+            self.con.execute("COMMIT")
+        return results
+
+    def call_procedure(self, procedure_name, *args):
+        procedure = self._procedures.get(procedure_name.split('.')[-1].lower())
+        if procedure is None:
+            raise ValueError(f"Procedure {procedure_name} does not exist in the local backend")
+        with self._lock:
+            return procedure(*args)
+
+    def search(self, query, columns, filter=None, limit=5):
+        with self._lock:
+            chunks = self.con.execute(f"""
+                SELECT chunk_id, chunk_text, document_id, file_name, file_path, document_class, chunk_index
+                FROM {DATABASE}.{SCHEMA}.document_chunks
+            """).df()
+        if chunks.empty:
+            return []
+
+        records = [r for r in chunks.to_dict('records') if self._matches_filter(r, filter)]
+        query_terms = set(tokenize(query))
+        chunk_terms = [tokenize(r['chunk_text']) for r in records]
+        document_frequency = {}
+        for terms in chunk_terms:
+            for term in set(terms) & query_terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        scored = []
+        for record, terms in zip(records, chunk_terms):
+            score = 0.0
+            for term in query_terms:
+                tf = terms.count(term)
+                if tf:
+                    idf = math.log(1 + len(records) / document_frequency[term])
+                    score += (1 + math.log(tf)) * idf
+            if score > 0:
+                scored.append((score, record['chunk_id'], record))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [dict({c: record.get(c) for c in columns}, **{'@scores': {'text_match': score}})
+                for score, _, record in scored[:limit]]
+
+    def complete(self, model, prompt):
+        question_match = re.search(r"Question:\s*(.+)", prompt)
+        question = question_match.group(1) if question_match else prompt[:500]
+        question_terms = set(tokenize(question))
+
+        sentences = []
+        for document, content in re.findall(r"Document:\s*(.+?)\s*\(Class:.*?\)\s*Content:\s*(.*?)(?=\n\s*Document:|\n\s*Instructions:|$)",
+                                            prompt, flags=re.DOTALL):
+            for sentence in re.split(r"(?<=[.!?])\s+|\n+", content):
+                overlap = len(question_terms & set(tokenize(sentence)))
+                if overlap and len(sentence.strip()) > 20:
+                    sentences.append((overlap, document.strip(), sentence.strip()))
+        if not sentences:
+            return "I could not find the answer in the provided documents."
+
+        sentences.sort(key=lambda item: -item[0])
+        answer = " ".join(f"{sentence} [{document}]" for _, document, sentence in sentences[:3])
+        return f"Based on the provided documents: {answer}"
+
+    # ─────────────────────────────────────────────────────────
+    # Setup
+    # ─────────────────────────────────────────────────────────
+    def _register_functions(self):
+        """Python stand-ins for the stage functions and Python UDFs"""
+        self.con.create_function('build_scoped_file_url', self._stage_file_path, ['VARCHAR', 'VARCHAR'], 'VARCHAR')
+        self.con.create_function(
+            'get_presigned_url', lambda stage, path, expiry: self._stage_file_path(stage, path),
+            ['VARCHAR', 'VARCHAR', 'BIGINT'], 'VARCHAR'
+        )
+        self.con.create_function('pdf_page_count', self._pdf_page_count, ['VARCHAR'], 'BIGINT')
+        self.con.create_function('render_pdf_page_png', self._render_pdf_page_png, ['VARCHAR', 'BIGINT', 'BIGINT'], 'BLOB')
+        self.con.create_function('cortex_complete', self.complete, ['VARCHAR', 'VARCHAR'], 'VARCHAR')
+
+        with open(PIPELINE_SETUP_SQL, encoding='utf-8') as f:
+            setup_sql = f.read()
+        for name, (handler, argument_types) in SHARED_PYTHON_UDFS.items():
+            match = re.search(
+                rf"^CREATE OR REPLACE FUNCTION {DATABASE}\.{SCHEMA}\.{name}\(.*?^\$\$\n(.*?)^\$\$;",
+                setup_sql, flags=re.MULTILINE | re.DOTALL
+            )
+            namespace = {}
+            exec(match.group(1), namespace)
+            self.con.create_function(name, namespace[handler], argument_types, 'VARCHAR', null_handling='special')
+
+    def _load_seed_data(self):
+        """Run the seed INSERT statements from 02_document_pipeline_setup.sql"""
+        with open(PIPELINE_SETUP_SQL, encoding='utf-8') as f:
+            setup_sql = f.read()
+        for table in SEED_TABLES:
+            match = re.search(
+                rf"^INSERT INTO {DATABASE}\.{SCHEMA}\.{table}\b(?:'(?:[^']|'')*'|[^';])*;",
+                setup_sql, flags=re.MULTILINE
+            )
+            if match:
+                statement = re.sub(r"\bARRAY_CONSTRUCT\s*\(", "list_value(", match.group(0), flags=re.IGNORECASE)
+                self.con.execute(translate_sql(statement))
+        # Version 1 of every seeded prompt
+        self.con.execute(f"UPDATE {DATABASE}.{SCHEMA}.extraction_prompts SET prompt_hash = sha2(question_text, 256)")
+
+    def _stage_file_path(self, stage, relative_path):
+        return os.path.join(self.docs_dir, relative_path)
+
+    def run_pipeline(self):
+        """Process everything in demo_docs: parse, classify, extract and chunk"""
+        return [
+            self.call_procedure('parse_new_documents', 1000),
+            self.call_procedure('classify_parsed_documents'),
+            self.call_procedure('extract_attributes_for_classified_documents'),
+            self.call_procedure('chunk_classified_documents'),
+            self.call_procedure('refresh_analytics_rollup'),
+        ]
+
+    def _show(self, statement):
+        if re.match(r"SHOW\s+TASKS\b", statement, re.IGNORECASE):
+            like = re.search(r"LIKE\s+'([^']*)'", statement, re.IGNORECASE)
+            pattern = like.group(1).lower().replace('%', '.*').replace('_', '.') if like else '.*'
+            rows = [
+                {'name': name, 'database_name': DATABASE.upper(), 'schema_name': SCHEMA.upper(), 'state': state,
+                 'condition': condition, 'schedule': schedule, 'warehouse': None}
+                for name, state, condition, schedule in TASKS
+                if re.fullmatch(pattern, name.lower())
+            ]
+            return pd.DataFrame(rows, columns=['name', 'database_name', 'schema_name', 'state', 'condition', 'schedule', 'warehouse'])
+        return pd.DataFrame()
+
+    def _describe(self, statement):
+        if re.search(r"CORTEX\s+SEARCH\s+SERVICE", statement, re.IGNORECASE):
+            # Local search reads document_chunks directly, so the index is always current
+            return pd.DataFrame([{'name': 'DOCUMENT_SEARCH_SERVICE', 'search_column': 'CHUNK_TEXT',
+                                  'target_lag': '1 hour', 'data_timestamp': datetime.now()}])
+        return pd.DataFrame()
+
+    @staticmethod
+    def _matches_filter(record, search_filter):
+        """Evaluate a Cortex Search filter (@eq, @and, @or, @not) against a chunk"""
+        if not search_filter:
+            return True
+        operator, operand = next(iter(search_filter.items()))
+        if operator == '@eq':
+            column, value = next(iter(operand.items()))
+            actual = record.get(column)
+            if column == 'document_class':
+                return value in (actual, LocalBackend._class_label(actual))
+            return actual == value
+        if operator == '@and':
+            return all(LocalBackend._matches_filter(record, f) for f in operand)
+        if operator == '@or':
+            return any(LocalBackend._matches_filter(record, f) for f in operand)
+        if operator == '@not':
+            return not LocalBackend._matches_filter(record, operand)
+        raise ValueError(f"Unsupported search filter operator: {operator}")
+
+    @staticmethod
+    def _class_label(document_class):
+        """Label from an AI_CLASSIFY JSON result, or the value unchanged"""
+        try:
+            return json.loads(document_class)['labels'][0]
+        except (TypeError, ValueError, KeyError, IndexError):
+            return document_class
+
+    # ─────────────────────────────────────────────────────────
+    # File readers (AI_PARSE_DOCUMENT stand-in)
+    # ─────────────────────────────────────────────────────────
+    def _pdf_page_count(self, file_path):
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            return 1
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def _render_pdf_page_png(self, file_path, page_index, dpi):
+        import io
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            page_index = min(max(page_index or 0, 0), len(pdf) - 1)
+            image = pdf[page_index].render(scale=(dpi or 72) / 72).to_pil()
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG', optimize=True)
+            return buffer.getvalue()
+        finally:
+            pdf.close()
+
+    def _read_document(self, file_path, document_type):
+        """Extract text and a page count from a local file"""
+        if document_type == 'pdf':
+            try:
+                import pypdfium2 as pdfium
+            except ImportError:
+                return '', 1
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                pages = [pdf[i].get_textpage().get_text_range() for i in range(len(pdf))]
+            finally:
+                pdf.close()
+            return '\n\n'.join(p.replace('\r\n', '\n') for p in pages), len(pages)
+
+        if document_type in ('docx', 'pptx'):
+            with zipfile.ZipFile(file_path) as archive:
+                if document_type == 'docx':
+                    parts = ['word/document.xml']
+                else:
+                    parts = sorted(
+                        (n for n in archive.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", n)),
+                        key=lambda n: int(re.search(r"(\d+)\.xml$", n).group(1))
+                    )
+                paragraphs = []
+                for part in parts:
+                    xml = archive.read(part).decode('utf-8', errors='ignore')
+                    for paragraph in re.split(r"</(?:w|a):p>", xml):
+                        text = html.unescape(''.join(re.findall(r"<(?:w|a):t(?:\s[^>]*)?>([^<]*)</(?:w|a):t>", paragraph)))
+                        if text.strip():
+                            paragraphs.append(text.strip())
+            return '\n'.join(paragraphs), len(parts) if document_type == 'pptx' else 1
+
+        if document_type in ('txt', 'html'):
+            with open(file_path, encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+            if document_type == 'html':
+                text = html.unescape(re.sub(r"<[^>]+>", ' ', re.sub(r"(?is)<(script|style).*?</\1>", ' ', text)))
+            return text, 1
+
+        # Images have no local OCR: keep them in the pipeline with a descriptive placeholder
+        return f"Image document {os.path.basename(file_path)}", 1
+
+    # ─────────────────────────────────────────────────────────
+    # Pipeline procedure stand-ins
+    # ─────────────────────────────────────────────────────────
+    def _scan_stage(self):
+        """Refresh the stage directory listing from docs_dir"""
+        rows = []
+        for directory, _, files in os.walk(self.docs_dir):
+            for file_name in files:
+                if os.path.splitext(file_name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                full_path = os.path.join(directory, file_name)
+                relative_path = os.path.relpath(full_path, self.docs_dir).replace(os.sep, '/')
+                stat = os.stat(full_path)
+                rows.append((relative_path, stat.st_size, datetime.fromtimestamp(stat.st_mtime), full_path))
+        self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.stage_files")
+        if rows:
+            self.con.executemany(f"INSERT INTO {DATABASE}.{SCHEMA}.stage_files VALUES (?, ?, ?, ?)", rows)
+
+    def parse_new_documents(self, batch_size=100):
+        self._scan_stage()
+        self.con.execute(f"""
+            INSERT INTO {DATABASE}.{SCHEMA}.parse_work_queue (file_path, file_size, file_url)
+            SELECT relative_path, size, file_url FROM {DATABASE}.{SCHEMA}.new_documents_stream
+        """)
+        batch = self.con.execute(f"""
+            SELECT file_path, file_size, file_url
+            FROM {DATABASE}.{SCHEMA}.parse_work_queue
+            WHERE status = 'pending'
+            ORDER BY enqueued_timestamp, file_path
+            LIMIT ?
+        """, [int(batch_size)]).fetchall()
+
+        processed_count, failed_count = 0, 0
+        for file_path, file_size, file_url in batch:
+            file_name = file_path.split('/')[-1]
+            document_type = SUPPORTED_EXTENSIONS.get(os.path.splitext(file_name)[1].lower(), 'unknown')
+            document_id = f"DOC_LOCAL_{stable_hash(file_path)}"
+            try:
+                content_text, page_count = self._read_document(os.path.join(self.docs_dir, file_path), document_type)
+                parsed_content = {'content': content_text, 'metadata': {'pageCount': page_count}}
+                self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.parsed_documents WHERE document_id = ?", [document_id])
+                self.con.execute(f"""
+                    INSERT INTO {DATABASE}.{SCHEMA}.parsed_documents
+                    (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, content_text)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [document_id, file_name, file_path, file_size, file_url, document_type,
+                      json.dumps(parsed_content), content_text])
+                self.con.execute(f"""
+                    UPDATE {DATABASE}.{SCHEMA}.parse_work_queue
+                    SET status = 'done', attempts = attempts + 1, document_id = ?, completed_timestamp = localtimestamp
+                    WHERE file_path = ?
+                """, [document_id, file_path])
+                processed_count += 1
+            except Exception as e:
+                self.con.execute(f"""
+                    UPDATE {DATABASE}.{SCHEMA}.parse_work_queue
+                    SET status = 'failed', attempts = attempts + 1, error_message = ?, completed_timestamp = localtimestamp
+                    WHERE file_path = ?
+                """, [str(e), file_path])
+                failed_count += 1
+
+        remaining_count = self.con.execute(
+            f"SELECT COUNT(*) FROM {DATABASE}.{SCHEMA}.parse_work_queue WHERE status = 'pending'"
+        ).fetchone()[0]
+        return (f"SUCCESS: Processed {processed_count} files, Failed: {failed_count}, "
+                f"Remaining in queue: {remaining_count}")
+
+    @staticmethod
+    def classify_text(file_path, content_text):
+        """AI_CLASSIFY stand-in: keyword scores over the file path (weighted) and content"""
+        path_text = str(file_path).lower().replace('_', ' ')
+        content = str(content_text or '').lower()
+        best_class, best_score = 'other', 0
+        for document_class in DOCUMENT_CLASSES[:-1]:
+            score = sum(3 * path_text.count(k) + content.count(k) for k in CLASS_KEYWORDS[document_class])
+            if score > best_score:
+                best_class, best_score = document_class, score
+        return best_class
+
+    def classify_parsed_documents(self, rule_confidence_cutoff=0.9):
+        rule_classified = self.con.execute(f"""
+            SELECT
+                pd.document_id,
+                max_by(r.document_class, r.confidence) AS document_class,
+                max_by(r.rule_id, r.confidence) AS rule_id
+            FROM {DATABASE}.{SCHEMA}.parsed_documents pd
+            JOIN {DATABASE}.{SCHEMA}.classification_rules r
+              ON r.enabled
+             AND r.confidence >= ?
+             AND CASE r.rule_type
+                   WHEN 'path_prefix' THEN starts_with(LOWER(pd.file_path), LOWER(r.pattern))
+                   WHEN 'keyword' THEN contains(LOWER(LEFT(pd.content_text, COALESCE(r.match_chars, 2000))), LOWER(r.pattern))
+                   ELSE FALSE
+                 END
+            WHERE pd.status = 'parsed' AND pd.content_text IS NOT NULL AND LENGTH(TRIM(pd.content_text)) > 0
+            GROUP BY pd.document_id
+            HAVING COUNT(DISTINCT r.document_class) = 1
+        """, [float(rule_confidence_cutoff)]).fetchall()
+        rules = {document_id: (document_class, rule_id) for document_id, document_class, rule_id in rule_classified}
+
+        documents = self.con.execute(f"""
+            SELECT
+                pd.document_id, pd.file_name, pd.file_path, pd.file_size, pd.file_url, pd.document_type, pd.parsed_content,
+                sample_classification_input(
+                    pd.content_text,
+                    iff(tp.document_type IS NOT NULL, tp.sample_mode, dp.sample_mode),
+                    iff(tp.document_type IS NOT NULL, tp.max_chars, dp.max_chars),
+                    iff(tp.document_type IS NOT NULL, tp.edge_pages, dp.edge_pages)
+                ) AS classification_input
+            FROM {DATABASE}.{SCHEMA}.parsed_documents pd
+            LEFT JOIN {DATABASE}.{SCHEMA}.classification_sampling_profiles tp ON tp.document_type = pd.document_type
+            LEFT JOIN {DATABASE}.{SCHEMA}.classification_sampling_profiles dp ON dp.document_type = 'default'
+            WHERE pd.status = 'parsed' AND pd.content_text IS NOT NULL AND LENGTH(TRIM(pd.content_text)) > 0
+        """).fetchall()
+
+        for document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, classification_input in documents:
+            if document_id in rules:
+                document_class, rule_id = rules[document_id]
+                method = 'rule'
+            else:
+                document_class, rule_id = self.classify_text(file_path, classification_input), None
+                method = 'ai_classify'
+            self.con.execute(f"""
+                INSERT INTO {DATABASE}.{SCHEMA}.document_classifications
+                (document_id, file_name, file_path, file_size, file_url, document_type, parsed_content, document_class,
+                 classification_method, rule_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [document_id, file_name, file_path, file_size, file_url, document_type, parsed_content,
+                  json.dumps({'labels': [document_class]}), method, rule_id])
+            self.con.execute(
+                f"UPDATE {DATABASE}.{SCHEMA}.parsed_documents SET status = 'classified' WHERE document_id = ?",
+                [document_id]
+            )
+        return (f"Classification completed. Processed: {len(documents)} (rules: {len(rules)}, "
+                f"AI_CLASSIFY: {len(documents) - len(rules)}), Errors: 0")
+
+    @staticmethod
+    def extract_answer(attribute_name, question_text, content_text):
+        """AI_EXTRACT stand-in: the line best matching the prompt, with term overlap as confidence"""
+        terms = set(tokenize(attribute_name.replace('_', ' ') + ' ' + question_text))
+        if not terms:
+            return None, 0.0
+        best_line, best_overlap = None, 0
+        for line in str(content_text or '').splitlines():
+            overlap = len(terms & set(tokenize(line)))
+            if overlap > best_overlap and len(line.strip()) > 2:
+                best_line, best_overlap = line.strip(), overlap
+        if best_line is None:
+            return None, 0.0
+        # "Label: value" lines answer with the value only
+        value = best_line.split(':', 1)[1].strip() if ':' in best_line[:60] else best_line
+        return (value or best_line)[:200], round(min(0.99, 0.3 + 0.7 * best_overlap / len(terms)), 2)
+
+    def _extract_attributes(self, document_id, file_name, file_path, document_class, content_text, prompts,
+                            keep_unchanged_reviews=False):
+        """Extract the prompted attributes of one document, replacing only those attributes' rows.
+
+        With keep_unchanged_reviews, an attribute whose value did not change keeps its review.
+        """
+        answers = {name: self.extract_answer(name, question, content_text) for name, question in prompts}
+        reviewed = {}
+        if keep_unchanged_reviews:
+            reviewed = {name: (value, reviewed_timestamp) for name, value, reviewed_timestamp in self.con.execute(f"""
+                SELECT attribute_name, attribute_value, reviewed_timestamp
+                FROM {DATABASE}.{SCHEMA}.document_extractions
+                WHERE document_id = ?
+            """, [document_id]).fetchall()}
+        extraction_json = json.dumps({
+            'response': {name: value for name, (value, _) in answers.items()},
+            'output_details': {'scores': {name: score for name, (_, score) in answers.items()}}
+        })
+        self.con.execute(f"""
+            DELETE FROM {DATABASE}.{SCHEMA}.document_extractions
+            WHERE document_id = ? AND attribute_name IN ({', '.join('?' for _ in prompts)})
+        """, [document_id] + [name for name, _ in prompts])
+        self.con.executemany(f"""
+            INSERT INTO {DATABASE}.{SCHEMA}.document_extractions
+            (document_id, file_name, file_path, document_class, attribute_name, attribute_value,
+             confidence_score, extraction_json, extraction_input_mode, prompt_hash, reviewed_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'text', ?, ?)
+        """, [[document_id, file_name, file_path, document_class, name, value, score, extraction_json,
+               hashlib.sha256(question.encode('utf-8')).hexdigest(),
+               reviewed[name][1] if name in reviewed and reviewed[name][0] == value else None]
+              for (name, question), (value, score) in zip(prompts, answers.values())])
+
+    def extract_attributes_for_classified_documents(self):
+        documents = self.con.execute(f"""
+            SELECT dc.document_id, dc.file_name, dc.file_path, dc.document_class, pd.content_text
+            FROM {DATABASE}.{SCHEMA}.document_classifications dc
+            LEFT JOIN {DATABASE}.{SCHEMA}.parsed_documents pd ON dc.document_id = pd.document_id
+            WHERE NOT EXISTS (
+              SELECT 1 FROM {DATABASE}.{SCHEMA}.document_extractions de WHERE de.document_id = dc.document_id
+            )
+        """).fetchall()
+
+        processed_count = 0
+        for document_id, file_name, file_path, document_class, content_text in documents:
+            prompts = self.con.execute(f"""
+                SELECT attribute_name, question_text
+                FROM {DATABASE}.{SCHEMA}.extraction_prompts
+                WHERE document_class = ?
+                ORDER BY attribute_name
+            """, [self._class_label(document_class)]).fetchall()
+            if not file_path or not prompts:
+                continue
+
+            self._extract_attributes(document_id, file_name, file_path, document_class, content_text, prompts,
+                                     keep_unchanged_reviews=True)
+            processed_count += 1
+
+        return (f"Extraction completed. Processed: {processed_count} (text input: {processed_count}, "
+                f"file input: 0), Errors: 0")
+
+    def backfill_changed_attributes(self, batch_size=50, max_attempts=3):
+        changed_prompts = self.con.execute(f"""
+            UPDATE {DATABASE}.{SCHEMA}.extraction_prompts
+            SET prompt_hash = sha2(question_text, 256),
+                prompt_version = iff(prompt_hash IS NULL, COALESCE(prompt_version, 1), prompt_version + 1),
+                updated_timestamp = localtimestamp
+            WHERE prompt_hash IS DISTINCT FROM sha2(question_text, 256)
+        """).fetchone()[0]
+
+        stale = self.con.execute(f"""
+            SELECT dc.document_id, dc.file_name, dc.file_path, dc.document_class, ep.attribute_name, ep.question_text
+            FROM {DATABASE}.{SCHEMA}.document_classifications dc
+            JOIN {DATABASE}.{SCHEMA}.extraction_prompts ep
+              ON ep.document_class = LOWER(TRIM(COALESCE(json_extract_string(TRY_CAST(dc.document_class AS JSON), '$.labels[0]'), dc.document_class)))
+            LEFT JOIN {DATABASE}.{SCHEMA}.document_extractions de
+              ON de.document_id = dc.document_id AND de.attribute_name = ep.attribute_name
+            LEFT JOIN {DATABASE}.{SCHEMA}.attribute_backfill_failures bf
+              ON bf.document_id = dc.document_id AND bf.attribute_name = ep.attribute_name AND bf.prompt_hash = ep.prompt_hash
+            WHERE dc.file_path IS NOT NULL AND dc.file_path != ''
+              AND de.prompt_hash IS DISTINCT FROM ep.prompt_hash
+              AND COALESCE(bf.attempts, 0) < ?
+            ORDER BY MAX(COALESCE(bf.attempts, 0)) OVER (PARTITION BY dc.document_id), dc.document_id, ep.attribute_name
+        """, [int(max_attempts)]).fetchall()
+        stale_documents = {}
+        for document_id, file_name, file_path, document_class, attribute_name, question_text in stale:
+            document = stale_documents.setdefault(document_id, (file_name, file_path, document_class, []))
+            document[3].append((attribute_name, question_text))
+
+        batch = list(stale_documents.items())[:int(batch_size)]
+        for document_id, (file_name, file_path, document_class, prompts) in batch:
+            content_text = self.con.execute(
+                f"SELECT content_text FROM {DATABASE}.{SCHEMA}.parsed_documents WHERE document_id = ?", [document_id]
+            ).fetchone()
+            self._extract_attributes(document_id, file_name, file_path, document_class,
+                                     content_text[0] if content_text else None, prompts)
+
+        attribute_count = sum(len(prompts) for _, (_, _, _, prompts) in batch)
+        return (f"Attribute backfill completed. Changed prompts: {changed_prompts}, Documents: {len(batch)} "
+                f"(file input: 0), Attributes: {attribute_count}, Errors: 0, "
+                f"Remaining: {len(stale_documents) - len(batch)}, Skipped after {max_attempts} failures: 0")
+
+    @staticmethod
+    def split_text(text, chunk_size, chunk_overlap, separators):
+        """SPLIT_TEXT_RECURSIVE_CHARACTER stand-in: windows that end on the coarsest separator available"""
+        text = str(text or '')
+        chunks, start = [], 0
+        while start < len(text):
+            end = min(start + chunk_size, len(text))
+            if end < len(text):
+                for separator in separators:
+                    cut = text.rfind(separator, start + chunk_overlap + 1, end) if separator else -1
+                    if cut > start:
+                        end = cut + len(separator)
+                        break
+            chunks.append(text[start:end].strip())
+            if end >= len(text):
+                break
+            start = max(end - chunk_overlap, start + 1)
+        return chunks
+
+    def chunk_document(self, document_id):
+        document = self.con.execute(f"""
+            SELECT dc.file_name, dc.file_path, dc.document_class, pd.content_text
+            FROM {DATABASE}.{SCHEMA}.document_classifications dc
+            JOIN {DATABASE}.{SCHEMA}.parsed_documents pd ON dc.document_id = pd.document_id
+            WHERE dc.document_id = ?
+        """, [document_id]).fetchone()
+        if document is None:
+            return 0
+        file_name, file_path, document_class, content_text = document
+
+        profile = self.con.execute(f"""
+            SELECT document_class, chunk_size, chunk_overlap, separators, profile_version
+            FROM {DATABASE}.{SCHEMA}.chunking_profiles
+            WHERE document_class IN (LOWER(TRIM(?)), 'default')
+            ORDER BY iff(document_class = 'default', 1, 0)
+            LIMIT 1
+        """, [self._class_label(document_class)]).fetchone()
+        profile_class, chunk_size, chunk_overlap, separators, profile_version = profile or ('default', 1000, 200, None, 1)
+        # The seed statements keep Snowflake's escaped separators ('\n'); unescape them for Python
+        separators = [s.encode().decode('unicode_escape') for s in json.loads(separators or '[]')] or ['\n\n', '\n', ' ', '']
+
+        chunks = [c for c in self.split_text(content_text, chunk_size, chunk_overlap, separators) if len(c) > 50]
+        self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.document_chunks WHERE document_id = ?", [document_id])
+        if chunks:
+            self.con.executemany(f"""
+                INSERT INTO {DATABASE}.{SCHEMA}.document_chunks
+                (chunk_id, document_id, file_name, file_path, document_class, chunk_index, chunk_text, chunk_size,
+                 chunk_profile_class, chunk_profile_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [[f"{document_id}_CHUNK_{i}", document_id, file_name, file_path, document_class, i, chunk, len(chunk),
+                   profile_class, profile_version] for i, chunk in enumerate(chunks)])
+        return len(chunks)
+
+    def chunk_classified_documents(self):
+        document_ids = [r[0] for r in self.con.execute(f"""
+            SELECT dc.document_id
+            FROM {DATABASE}.{SCHEMA}.document_classifications dc
+            WHERE dc.file_path IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {DATABASE}.{SCHEMA}.document_chunks ch WHERE ch.document_id = dc.document_id)
+        """).fetchall()]
+        chunk_count = sum(self.chunk_document(document_id) for document_id in document_ids)
+        return f"Chunking completed. Documents: {len(document_ids)}, Chunks: {chunk_count}, Errors: 0"
+
+    def rechunk_stale_documents(self, batch_size=25, max_attempts=3):
+        stale = self.con.execute(f"""
+            WITH current_chunks AS (
+                SELECT document_id, ANY_VALUE(document_class) AS document_class,
+                       MIN(chunk_profile_class) AS profile_class, MIN(chunk_profile_version) AS profile_version
+                FROM {DATABASE}.{SCHEMA}.document_chunks
+                GROUP BY document_id
+            )
+            , stale_documents AS (
+                SELECT cc.document_id,
+                       COALESCE(cp.document_class, 'default') AS profile_class,
+                       COALESCE(cp.profile_version, dp.profile_version) AS profile_version
+                FROM current_chunks cc
+                LEFT JOIN {DATABASE}.{SCHEMA}.chunking_profiles cp
+                  ON cp.document_class = LOWER(TRIM(COALESCE(json_extract_string(TRY_CAST(cc.document_class AS JSON), '$.labels[0]'), cc.document_class)))
+                JOIN {DATABASE}.{SCHEMA}.chunking_profiles dp ON dp.document_class = 'default'
+                WHERE cc.profile_class IS DISTINCT FROM COALESCE(cp.document_class, 'default')
+                   OR cc.profile_version IS DISTINCT FROM COALESCE(cp.profile_version, dp.profile_version)
+            )
+            SELECT sd.document_id, sd.profile_class, sd.profile_version, COALESCE(rf.attempts, 0) AS failed_attempts
+            FROM stale_documents sd
+            LEFT JOIN {DATABASE}.{SCHEMA}.rechunk_failures rf
+              ON rf.document_id = sd.document_id AND rf.profile_class = sd.profile_class
+             AND rf.profile_version = sd.profile_version
+            ORDER BY failed_attempts, sd.document_id
+        """).fetchall()
+        skipped_count = sum(1 for row in stale if row[3] >= int(max_attempts))
+        stale = [row for row in stale if row[3] < int(max_attempts)]
+        batch = stale[:int(batch_size)]
+
+        chunk_count = error_count = 0
+        for document_id, profile_class, profile_version, _ in batch:
+            try:
+                chunk_count += self.chunk_document(document_id)
+                self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.rechunk_failures WHERE document_id = ?", [document_id])
+            except Exception:
+                error_count += 1
+                self.con.execute(f"""
+                    INSERT INTO {DATABASE}.{SCHEMA}.rechunk_failures (document_id, profile_class, profile_version, attempts)
+                    VALUES (?, ?, ?, 1)
+                    ON CONFLICT DO UPDATE SET attempts = attempts + 1, last_attempt_timestamp = current_localtimestamp()
+                """, [document_id, profile_class, profile_version])
+        return (f"Re-chunking completed. Documents: {len(batch) - error_count}, Chunks: {chunk_count}, "
+                f"Errors: {error_count}, Remaining: {len(stale) - len(batch) + error_count}, "
+                f"Skipped after {max_attempts} failures: {skipped_count}")
+
+    def attribute_document_costs(self, lookback_days=3):
+        # AI stand-ins are free, so there is no usage to attribute
+        return "Cost attribution completed. Query usage rows merged: 0"
+
+    def refresh_cost_daily_cache(self, lookback_days=3):
+        # Same refresh as the Snowflake procedure, over the (empty) ACCOUNT_USAGE stand-ins
+        from_date = self.con.execute(f"""
+            SELECT COALESCE(MAX(usage_date) - CAST(? AS INTEGER), current_date - 365)
+            FROM {DATABASE}.{SCHEMA}.cost_daily_cache
+        """, [lookback_days]).fetchone()[0]
+        self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.cost_daily_cache WHERE usage_date >= ?", [from_date])
+        self.con.execute(f"""
+            INSERT INTO {DATABASE}.{SCHEMA}.cost_daily_cache
+              (usage_date, source, service_type, name, credits, tokens, call_count)
+            SELECT CAST(start_time AS DATE), 'metering', service_type, iff(service_type = 'AI_SERVICES', '', name),
+                   SUM(credits_used), NULL, COUNT(*)
+            FROM snowflake.account_usage.metering_history
+            WHERE start_time >= $from_date
+              AND ((service_type = 'SERVERLESS_TASK'
+                    AND upper(split_part(name, '.', -1)) IN ({', '.join(f"'{task[0]}'" for task in TASKS)}))
+                   OR service_type = 'AI_SERVICES')
+            GROUP BY 1, 2, 3, 4
+            UNION ALL
+            SELECT CAST(start_time AS DATE), 'cortex_functions', 'AI_SERVICES', function_name,
+                   SUM(token_credits), SUM(tokens), COUNT(*)
+            FROM snowflake.account_usage.cortex_functions_usage_history
+            WHERE start_time >= $from_date AND regexp_matches(upper(function_name), 'PARSE_DOCUMENT|CLASSIFY|EXTRACT')
+            GROUP BY 1, 2, 3, 4
+            UNION ALL
+            SELECT usage_date, 'cortex_search', 'CORTEX_SEARCH', service_name, SUM(credits), SUM(tokens), NULL
+            FROM snowflake.account_usage.cortex_search_daily_usage_history
+            WHERE usage_date >= $from_date AND upper(service_name) LIKE '%DOCUMENT_SEARCH_SERVICE%'
+            GROUP BY 1, 2, 3, 4
+        """, {'from_date': from_date})
+        cached_rows = self.con.execute(
+            f"SELECT COUNT(*) FROM {DATABASE}.{SCHEMA}.cost_daily_cache WHERE usage_date >= ?", [from_date]
+        ).fetchone()[0]
+        return f"Cost cache refresh completed. Days from {from_date}, rows cached: {cached_rows}"
+
+    def refresh_analytics_rollup(self, full_rebuild=False):
+        # No streams locally: every refresh recomputes the rollup, which is cheap over demo_docs
+        self.con.execute(f"DELETE FROM {DATABASE}.{SCHEMA}.analytics_daily_rollup")
+        self.con.execute(f"""
+            INSERT INTO {DATABASE}.{SCHEMA}.analytics_daily_rollup (rollup_date, metric, dimension_value, item_count)
+            SELECT CAST(parse_timestamp AS DATE), 'documents_by_type', COALESCE(document_type, 'unknown'), COUNT(*)
+            FROM {DATABASE}.{SCHEMA}.parsed_documents
+            GROUP BY 1, 2, 3
+            UNION ALL
+            SELECT CAST(parse_timestamp AS DATE), 'documents_by_status', COALESCE(status, 'unknown'), COUNT(*)
+            FROM {DATABASE}.{SCHEMA}.parsed_documents
+            GROUP BY 1, 2, 3
+            UNION ALL
+            SELECT CAST(classification_timestamp AS DATE), 'classifications_by_class',
+                   COALESCE(json_extract_string(TRY_CAST(document_class AS JSON), '$.labels[0]'), document_class, 'unclassified'),
+                   COUNT(*)
+            FROM {DATABASE}.{SCHEMA}.document_classifications
+            GROUP BY 1, 2, 3
+            UNION ALL
+            SELECT CAST(extraction_timestamp AS DATE), 'extractions_by_attribute', attribute_name, COUNT(*)
+            FROM {DATABASE}.{SCHEMA}.document_extractions
+            GROUP BY 1, 2, 3
+        """)
+        row_count = self.con.execute(f"SELECT COUNT(*) FROM {DATABASE}.{SCHEMA}.analytics_daily_rollup").fetchone()[0]
+        if full_rebuild:
+            return f"Analytics rollup rebuilt. Rows: {row_count}"
+        return f"Analytics rollup completed. Rows merged: {row_count}"
+
+    def export_processing_summary(self, export_format='parquet', document_class=None, start_date=None, end_date=None):
+        # export_stage is a directory under the temp dir; the download URLs are local file paths
+        export_format = (export_format or 'parquet').lower()
+        if export_format not in ('parquet', 'csv'):
+            raise ValueError("export_format must be parquet or csv")
+        filters, params = [], []
+        if document_class is not None:
+            filters.append("document_classification = ?")
+            params.append(document_class)
+        if start_date is not None:
+            filters.append("classification_timestamp >= CAST(? AS DATE)")
+            params.append(str(start_date))
+        if end_date is not None:
+            filters.append("classification_timestamp < CAST(? AS DATE) + INTERVAL 1 DAY")
+            params.append(str(end_date))
+        summary_sql = f"""
+            SELECT document_id, file_name, file_path, document_type, document_classification, attribute_name,
+                   attribute_value, confidence_score, classification_timestamp, extraction_timestamp
+            FROM {DATABASE}.{SCHEMA}.document_processing_summary
+            WHERE {' AND '.join(filters) or 'TRUE'}
+        """
+        summary = self.con.sql(summary_sql, params=params)
+
+        export_path = f"processing_summary/{datetime.now():%Y%m%d_%H%M%S%f}/"
+        os.makedirs(os.path.join(self.export_dir, export_path), exist_ok=True)
+        if export_format == 'parquet':
+            file_name = f"{export_path}data_0_0_0.snappy.parquet"
+            summary.write_parquet(os.path.join(self.export_dir, file_name), compression='snappy')
+        else:
+            file_name = f"{export_path}data_0_0_0.csv.gz"
+            summary.write_csv(os.path.join(self.export_dir, file_name), header=True, compression='gzip')
+        file_path = os.path.join(self.export_dir, file_name)
+        row_count = self.con.execute(f"SELECT COUNT(*) FROM ({summary_sql})", params).fetchone()[0]
+        return pd.DataFrame([{'FILE_NAME': file_name, 'FILE_SIZE': os.path.getsize(file_path),
+                              'ROW_COUNT': row_count, 'DOWNLOAD_URL': file_path}])
@@ -0,0 +1,224 @@
+"""
+Per-rerun query tracing for the Document AI dashboard.
+
+TracingBackend wraps the app's backend and records every SQL query, procedure call, search and
+completion it issues; trace_cache records hits and misses of st.cache_data functions and
+timed_import the cost of importing the app's modules. start_rerun() begins a QueryTracer for the
+current Streamlit rerun, so slow interactions, interactions that issue too many queries and slow
+cold starts can be found from the sidebar debug panel or the JSON-lines export.
+"""
+import contextvars
+import functools
+import hashlib
+import importlib
+import json
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from document_backend import DocumentBackend
+
+SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+UNTIMED_KINDS = ('cache', 'import')  # Events that are not backend calls
+
+# Tracer of the rerun running in this context (each Streamlit rerun runs in its own thread)
+_current_tracer = contextvars.ContextVar('query_tracer', default=None)
+
+
+def fingerprint_sql(query):
+    """Normalize a statement (literals -> ?, whitespace collapsed) and hash it.
+
+    Queries that differ only in their literal values (document IDs, dates, limits) share a fingerprint.
+    """
+    normalized = SQL_COMMENT.sub(' ', str(query))
+    normalized = SQL_STRING_LITERAL.sub('?', normalized)
+    normalized = SQL_NUMBER.sub('?', normalized)
+    normalized = ' '.join(normalized.split()).upper()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+
+def result_bytes(value):
+    """Approximate in-memory size of a query result"""
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(result_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class QueryTracer:
+    """Queries, backend calls and cache lookups recorded during one Streamlit rerun"""
+    def __init__(self, page=None):
+        self.rerun_id = uuid.uuid4().hex[:8]
+        self.page = page
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.events = []
+        self.query_count = 0
+
+    def record(self, kind, name, duration_ms, rows=None, result_bytes=None, cache=None, sql=None, error=None):
+        if kind not in UNTIMED_KINDS:
+            self.query_count += 1
+        fingerprint, normalized = fingerprint_sql(sql) if sql else (None, None)
+        self.events.append({
+            'rerun_id': self.rerun_id,
+            'page': self.page,
+            'seq': len(self.events),
+            'offset_ms': round((time.perf_counter() - self._start) * 1000 - duration_ms, 1),
+            'kind': kind,
+            'name': name,
+            'fingerprint': fingerprint,
+            'sql': normalized[:500] if normalized else None,
+            'duration_ms': round(duration_ms, 1),
+            'rows': rows,
+            'bytes': result_bytes,
+            'cache': cache,
+            'error': error,
+        })
+
+    def timed(self, kind, name, func, sql=None, count_rows=True):
+        """Run func() and record its duration, result size and any error"""
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            self.record(kind, name, (time.perf_counter() - start) * 1000, sql=sql, error=str(e)[:300])
+            raise
+        duration_ms = (time.perf_counter() - start) * 1000
+        rows = len(result) if count_rows and hasattr(result, '__len__') else None
+        self.record(kind, name, duration_ms, rows=rows, result_bytes=result_bytes(result), sql=sql)
+        return result
+
+    def summary(self):
+        queries = [e for e in self.events if e['kind'] not in UNTIMED_KINDS]
+        lookups = [e for e in self.events if e['kind'] == 'cache']
+        imports = [e for e in self.events if e['kind'] == 'import']
+        return {
+            'rerun_id': self.rerun_id,
+            'page': self.page,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'rerun_ms': round((time.perf_counter() - self._start) * 1000, 1),
+            'queries': len(queries),
+            'query_ms': round(sum(e['duration_ms'] for e in queries), 1),
+            'rows': sum(e['rows'] or 0 for e in queries),
+            'bytes': sum(e['bytes'] or 0 for e in queries),
+            'cache_hits': sum(1 for e in lookups if e['cache'] == 'hit'),
+            'cache_misses': sum(1 for e in lookups if e['cache'] == 'miss'),
+            'errors': sum(1 for e in queries if e['error']),
+            'import_ms': round(sum(e['duration_ms'] for e in imports), 1),
+            'cold_imports': sum(1 for e in imports if e['cache'] == 'miss'),
+        }
+
+
+def start_rerun(page=None):
+    """Start a tracer for the rerun running in the current context"""
+    tracer = QueryTracer(page)
+    _current_tracer.set(tracer)
+    return tracer
+
+
+def current_tracer():
+    """Tracer of the current rerun, or None outside a traced rerun"""
+    return _current_tracer.get()
+
+
+def timed(kind, name, func, sql=None, count_rows=True):
+    """Run func(), recording it in the current tracer if there is one"""
+    tracer = current_tracer()
+    if tracer is None:
+        return func()
+    return tracer.timed(kind, name, func, sql=sql, count_rows=count_rows)
+
+
+def trace_cache(func):
+    """Wrap an st.cache_data function: a call that issued no queries was served from the cache"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracer = current_tracer()
+        if tracer is None:
+            return func(*args, **kwargs)
+        queries_before = tracer.query_count
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        tracer.record('cache', func.__name__, (time.perf_counter() - start) * 1000,
+                      cache='miss' if tracer.query_count > queries_before else 'hit')
+        return result
+    if hasattr(func, 'clear'):
+        wrapper.clear = func.clear
+    return wrapper
+
+
+def record_cache_lookup(name, hit):
+    """Record a lookup in an app-managed cache (e.g. the page preview LRU)"""
+    tracer = current_tracer()
+    if tracer is not None:
+        tracer.record('cache', name, 0.0, cache='hit' if hit else 'miss')
+
+
+def timed_import(module_name):
+    """Import a module, recording how long it took; a miss is its first (cold) import in this process"""
+    already_imported = module_name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    tracer = current_tracer()
+    if tracer is not None:
+        tracer.record('import', module_name, (time.perf_counter() - start) * 1000,
+                      cache='hit' if already_imported else 'miss')
+    return module
+
+
+def events_to_jsonl(events):
+    """One JSON object per line"""
+    return '\n'.join(json.dumps(e, default=str) for e in events) + ('\n' if events else '')
+
+
+class TracedResult:
+    """Lazy query result whose execution (to_pandas/collect) is recorded by the current tracer"""
+    def __init__(self, result, query):
+        self._result = result
+        self._query = query
+
+    def to_pandas(self):
+        return timed('query', 'to_pandas', self._result.to_pandas, sql=self._query)
+
+    def collect(self):
+        return timed('query', 'collect', self._result.collect, sql=self._query)
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+
+class TracingBackend(DocumentBackend):
+    """Backend wrapper that records every call in the current rerun's QueryTracer"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+
+    def sql(self, query, params=None):
+        return TracedResult(self.backend.sql(query, params=params), query)
+
+    def execute_transaction(self, statements):
+        return timed(
+            'transaction', f"{len(statements)} statements", lambda: self.backend.execute_transaction(statements),
+            sql=';\n'.join(query for query, _ in statements), count_rows=False
+        )
+
+    def call_procedure(self, procedure_name, *args):
+        return timed(
+            'call', procedure_name, lambda: self.backend.call_procedure(procedure_name, *args),
+            sql=f"CALL {procedure_name}({', '.join('?' for _ in args)})", count_rows=False
+        )
+
+    def search(self, query, columns, filter=None, limit=5):
+        return timed(
+            'search', 'document_search_service', lambda: self.backend.search(query, columns, filter=filter, limit=limit)
+        )
+
+    def complete(self, model, prompt):
+        return timed('complete', model, lambda: self.backend.complete(model, prompt), count_rows=False)